@@ -0,0 +1,289 @@
+"""
+Headless HTTP/WebSocket service for the PO agents
+
+One process serves many conversations: the DB engine, LLM clients and caches
+are process-wide singletons and conversation state lives in the state store,
+so any worker can serve any turn; the store's conversation lock keeps two
+workers from running turns of one conversation at once. Agent code is synchronous; turns run in a
+thread pool with a concurrency bound per backend.
+
+Run with: uvicorn api.server:app --host 0.0.0.0 --port 8000 --workers 4
+"""
+import asyncio
+import os
+import tempfile
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from backend.agent import POAgent
+from backend.database import replica_status
+from backend.po_export import iter_encoded
+from backend.po_import import import_pos
+from backend.po_reader import get_po_reader
+from backend.profiler import profile_turn
+from backend.query_stats import index_candidates, query_stats, slow_queries
+from backend.state_store import ConversationBusy, get_state_store
+from backend.tracing import span
+from backend.warmup import start_warmup, warmup_status
+from langchain_agent.agent import LangChainPOAgent
+from langchain_agent.dispatcher import dispatch_stats
+from smart_backend.smart_agent import SmartPOAgent
+
+load_dotenv()
+
+BACKENDS = ("po", "langchain")
+
+# Max turns in flight per backend in this worker (LLM/DB bound work)
+CONCURRENCY = {
+    "po": int(os.getenv("API_MAX_CONCURRENCY_PO", "8")),
+    "langchain": int(os.getenv("API_MAX_CONCURRENCY_LANGCHAIN", "4")),
+    "smart": int(os.getenv("API_MAX_CONCURRENCY_SMART", "4")),
+    "import": int(os.getenv("API_MAX_CONCURRENCY_IMPORT", "1")),
+}
+# Uploads above this size are spooled to disk
+IMPORT_SPOOL_BYTES = 8 * 1024 * 1024
+
+WELCOME = {
+    "po": "👋 Hi! I'll help you create an **Independent Purchase Order**. Type 'start' or just say 'Create PO' to begin!",
+    "langchain": "👋 **Welcome to the LangChain PO Agent!** Ask about suppliers, materials or POs, or create a new PO.",
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Enough threads for every backend to reach its bound, plus state store I/O
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=sum(CONCURRENCY.values()) + 4, thread_name_prefix="agent-turn")
+    )
+    # Every backend is served here, so warm all of them
+    start_warmup("api")
+    yield
+
+
+app = FastAPI(title="SupplierX PO Agent API", lifespan=lifespan)
+state_store = get_state_store()
+smart_agent = SmartPOAgent()
+
+_semaphores: Dict[str, asyncio.Semaphore] = {}
+# Weak values: a lock lives only while some turn holds or waits on it
+_conversation_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+class CreateConversation(BaseModel):
+    backend: str = "po"
+    # Creator of the POs, for the per-user defaults (po backend)
+    user: Optional[str] = None
+
+
+class Message(BaseModel):
+    text: str
+    # Write a sampling profile of this turn to PROFILE_DIR (only with PROFILE_ON_REQUEST=true)
+    profile: bool = False
+
+
+class RecommendationRequest(BaseModel):
+    query: str
+
+
+class CreatePORequest(BaseModel):
+    recommendation: Dict[str, Any]
+    quantity: int
+    po_type: str = "Regular Purchase"
+    purch_org: Optional[Dict[str, Any]] = None
+    purch_group: Optional[Dict[str, Any]] = None
+
+
+def _semaphore(backend: str) -> asyncio.Semaphore:
+    # Created lazily so they bind to the running event loop
+    if backend not in _semaphores:
+        _semaphores[backend] = asyncio.Semaphore(CONCURRENCY[backend])
+    return _semaphores[backend]
+
+
+def _load_conversation(conversation_id: str) -> Dict:
+    conversation = state_store.load(conversation_id)
+    if conversation is None:
+        raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
+    # Conversations started in the Streamlit apps carry no backend tag
+    conversation.setdefault("backend", "langchain" if "history" in conversation else "po")
+    return conversation
+
+
+def _run_turn(conversation_id: str, conversation: Dict, text: str, profile: bool = False) -> str:
+    """Restore the agent, process one message and write its state back (sync)"""
+    step = conversation.get("agent", {}).get("step", "start") if conversation["backend"] == "po" else "langchain"
+    with profile_turn("api", conversation_id, step, enabled=profile), \
+            span("api.turn", new_trace=True, conversation_id=conversation_id, backend=conversation["backend"]):
+        return _process(conversation, text)
+
+
+def _process(conversation: Dict, text: str) -> str:
+    if conversation["backend"] == "langchain":
+        agent = LangChainPOAgent(state=conversation.get("history"))
+        response = agent.process_message(text)
+        conversation["history"] = agent.export_state()
+    else:
+        agent = POAgent(state=conversation.get("agent"))
+        response = agent.process_message(text)
+        conversation["agent"] = agent.export_state()
+        conversation["step"] = agent.state["step"]
+    return response
+
+
+async def process_turn(conversation_id: str, text: str, profile: bool = False) -> Dict:
+    # Turns of one conversation are serialized (in this worker by the asyncio lock,
+    # across workers by the state store lock); different conversations run concurrently
+    lock = _conversation_locks.get(conversation_id)
+    if lock is None:
+        lock = _conversation_locks[conversation_id] = asyncio.Lock()
+    async with lock:
+        try:
+            token = await asyncio.to_thread(state_store.acquire, conversation_id)
+        except ConversationBusy as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        try:
+            conversation = _load_conversation(conversation_id)
+            async with _semaphore(conversation["backend"]):
+                response = await asyncio.to_thread(_run_turn, conversation_id, conversation, text, profile)
+
+            messages = conversation.setdefault("messages", [])
+            messages.append({"role": "user", "content": text})
+            messages.append({"role": "assistant", "content": response})
+            await asyncio.to_thread(state_store.save, conversation_id, conversation)
+        finally:
+            await asyncio.to_thread(state_store.release, conversation_id, token)
+
+    return {"conversation_id": conversation_id, "response": response, "step": conversation.get("step")}
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "replicas": replica_status(), "dispatch": dispatch_stats(),
+            "po_cache": get_po_reader().stats(), "warmup": warmup_status()}
+
+
+@app.get("/query-stats")
+async def get_query_stats(limit: int = 50, source: Optional[str] = None):
+    """Per-statement stats of this process, slow-query log and index candidates"""
+    stats = query_stats(source=source)
+    return {"statements": stats[:limit], "slow": slow_queries(limit), "index_candidates": index_candidates(stats)}
+
+
+@app.post("/conversations")
+async def create_conversation(request: CreateConversation):
+    if request.backend not in BACKENDS:
+        raise HTTPException(status_code=400, detail=f"backend must be one of {', '.join(BACKENDS)}")
+
+    conversation_id = uuid.uuid4().hex
+    welcome = {"role": "assistant", "content": WELCOME[request.backend]}
+    conversation = {"backend": request.backend, "messages": [welcome]}
+    if request.backend == "po":
+        conversation["agent"] = POAgent(user=request.user).export_state()
+    else:
+        conversation["history"] = LangChainPOAgent().export_state()
+    await asyncio.to_thread(state_store.save, conversation_id, conversation)
+    return {"conversation_id": conversation_id, "backend": request.backend, "messages": [welcome]}
+
+
+@app.get("/conversations/{conversation_id}")
+async def get_conversation(conversation_id: str):
+    conversation = await asyncio.to_thread(_load_conversation, conversation_id)
+    return {
+        "conversation_id": conversation_id,
+        "backend": conversation["backend"],
+        "step": (conversation.get("agent") or {}).get("step"),
+        "messages": conversation.get("messages", []),
+    }
+
+
+@app.delete("/conversations/{conversation_id}")
+async def delete_conversation(conversation_id: str):
+    await asyncio.to_thread(state_store.delete, conversation_id)
+    return {"deleted": conversation_id}
+
+
+@app.post("/conversations/{conversation_id}/messages")
+async def post_message(conversation_id: str, message: Message):
+    return await process_turn(conversation_id, message.text, message.profile)
+
+
+@app.websocket("/ws/conversations/{conversation_id}")
+async def conversation_socket(websocket: WebSocket, conversation_id: str):
+    """Send {"text": ..., "profile": false}, receive {"response": ..., "step": ...} per turn"""
+    await websocket.accept()
+    try:
+        while True:
+            raw = await websocket.receive_text()
+            try:
+                # Invalid JSON, a non-object or a missing "text" gets an error reply, not a closed socket
+                message = Message.model_validate_json(raw)
+            except ValidationError as e:
+                await websocket.send_json({"error": f"Invalid message: {e.errors()[0]['msg']}"})
+                continue
+            try:
+                await websocket.send_json(await process_turn(conversation_id, message.text, message.profile))
+            except HTTPException as e:
+                await websocket.send_json({"error": e.detail})
+    except WebSocketDisconnect:
+        pass
+
+
+@app.post("/recommendations")
+async def recommendations(request: RecommendationRequest):
+    async with _semaphore("smart"):
+        intent = await asyncio.to_thread(smart_agent.parse_intent, request.query)
+        recs: List[Dict] = await asyncio.to_thread(smart_agent.get_recommendations, intent)
+    return {"intent": intent, "recommendations": recs}
+
+
+@app.post("/purchase-orders")
+async def create_purchase_order(request: CreatePORequest):
+    async with _semaphore("smart"):
+        return await asyncio.to_thread(
+            smart_agent.create_po,
+            request.recommendation,
+            request.quantity,
+            po_type=request.po_type,
+            purch_org=request.purch_org,
+            purch_group=request.purch_group,
+        )
+
+
+@app.post("/imports")
+async def import_purchase_orders(request: Request, format: str = "csv", dry_run: bool = False):
+    """Raw CSV/XLSX request body; returns the import report"""
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_BYTES) as upload:
+        async for chunk in request.stream():
+            upload.write(chunk)
+        upload.seek(0)
+        async with _semaphore("import"):
+            try:
+                return await asyncio.to_thread(import_pos, upload, format, dry_run=dry_run)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/exports/purchase-orders")
+async def export_purchase_orders(format: str = "csv", date_from: Optional[str] = None, date_to: Optional[str] = None,
+                                 supplier: Optional[str] = None, status: Optional[str] = None):
+    """POs with line items expanded, streamed as CSV or JSONL"""
+    if format not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="format must be csv or jsonl (use export_pos.py for parquet)")
+    chunks = iter_encoded(format, date_from=date_from, date_to=date_to, supplier=supplier, status=status)
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(chunks, media_type=media_type,
+                             headers={"Content-Disposition": f"attachment; filename=purchase_orders.{format}"})
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run("api.server:app", host="0.0.0.0", port=int(os.getenv("API_PORT", "8000")))
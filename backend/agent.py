@@ -2,16 +2,29 @@ import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 from backend.llm import get_llm
+from backend.intent_router import YES_NO_VALUES, get_intent_router
+from backend.line_items import normalize_items, parse_line_items
+from backend.po_defaults import predict as predict_defaults
+from backend.tracing import span
 from backend.tools import POTools
 
-from backend.sql_agent import SQLAgent
+from backend.sql_agent import get_sql_agent
 
 class POAgent:
-    def __init__(self):
+    def __init__(self, state: Optional[Dict] = None, user: Optional[str] = None):
+        # Clients are shared; the only per-conversation data is self.state,
+        # which is plain JSON so it can live in a state store between turns
         self.llm = get_llm()
         self.tools = POTools()
-        self.sql_agent = SQLAgent()
-        self.state = {
+        self.sql_agent = get_sql_agent()
+        self.state = state or self._new_state()
+        if user:
+            # Who creates the PO, for the per-user defaults
+            self.state["user"] = user
+
+    @staticmethod
+    def _new_state() -> Dict:
+        return {
             "step": "start",
             "po_mode": "independent", # Default to independent
             "header": {
@@ -31,6 +44,10 @@ class POAgent:
             "history": []
         }
 
+    def export_state(self) -> Dict:
+        """Return the serializable conversation state"""
+        return self.state
+
     def extract_entities(self, user_input: str) -> Dict:
         """Extract PO entities from natural language using Bedrock"""
         prompt = f"""
@@ -44,6 +61,7 @@ class POAgent:
         - material: name of material
         - quantity: number
         - po_type: "Standard", "Service", etc.
+        - line_items: list of {{"material", "quantity", "price"}} when several items are given
         
         User Input: "{user_input}"
         
@@ -53,7 +71,11 @@ class POAgent:
             "supplier": "Avians",
             "plant": "Noida",
             "material": "MS Pipe",
-            "quantity": "50"
+            "quantity": "50",
+            "line_items": [
+                {{"material": "MS Pipe", "quantity": 50, "price": null}},
+                {{"material": "Steel Rod", "quantity": 10, "price": 250}}
+            ]
         }}
         """
         
@@ -80,18 +102,29 @@ class POAgent:
 
     def process_message(self, user_input: str) -> str:
         """Process user message and return bot response"""
-        
+        step = self.state["step"]
+        with span(f"po.step {step}", step=step) as current:
+            response = self._process_message(user_input)
+            current.set(next_step=self.state["step"])
+            return response
+
+    def _process_message(self, user_input: str) -> str:
         # Global Question Detection (Escape Hatch)
         # If the user asks a question, answer it and repeat the current step's prompt
-        question_indicators = ["how", "what", "show", "list", "give", "count", "tell", "where"]
-        is_question = any(user_input.lower().startswith(w) for w in question_indicators) or "?" in user_input
-        
-        if is_question and self.state["step"] != "start":
-            answer = self.sql_agent.answer_question(user_input)
-            if "couldn't generate" not in answer:
-                # Return answer + reminder of current step
-                current_prompt = self._get_current_step_prompt()
-                return f"{answer}\n\n---\n(Resuming...)\n{current_prompt}"
+        if self.state["step"] != "start":
+            route = get_intent_router().route(user_input, self.state["step"])
+            if route["intent"] == "show_options":
+                # The frontend lists the options under the step prompt
+                return self._get_current_step_prompt()
+            if route["intent"] == "question":
+                answer = self.sql_agent.answer_question(user_input)
+                if "couldn't generate" not in answer:
+                    # Return answer + reminder of current step
+                    current_prompt = self._get_current_step_prompt()
+                    return f"{answer}\n\n---\n(Resuming...)\n{current_prompt}"
+            elif route["value"] is not None:
+                # e.g. "give 50 units" at the quantity step -> "50"
+                user_input = route["value"]
 
         step = self.state["step"]
         
@@ -108,6 +141,13 @@ class POAgent:
                 self.state["step"] = "header_supplier"
                 self.state["extracted"] = entities # Store for later steps
                 
+                # Items named up front are resolved together once the header is done
+                items = normalize_items(entities.get("line_items"))
+                if not items and entities.get("material"):
+                    items = normalize_items([entities])
+                if items:
+                    self.state["pending_items"] = items
+                
                 # Auto-fill Supplier if found
                 if entities.get("supplier"):
                     suppliers = self.tools.search_suppliers(entities["supplier"])
@@ -126,7 +166,9 @@ class POAgent:
                 if self.state["step"] == "header_type":
                     return f"Supplier **{self.state['header']['supplier']['name']}** selected.\n\nSelect **PO Type**:"
                 elif self.state["step"] == "header_currency":
-                     return f"Supplier **{self.state['header']['supplier']['name']}** and Type **{self.state['header']['po_type']}** selected.\n\nSelect **Currency**:"
+                     selected = f"Supplier **{self.state['header']['supplier']['name']}** and Type **{self.state['header']['po_type']}** selected."
+                     offer = self._offer_defaults()
+                     return f"{selected}\n\n{offer}" if offer else f"{selected}\n\nSelect **Currency**:"
                 
                 return "Let's create an Independent PO.\n\nFirst, **which Supplier** is this for? (Type name to search)"
             else:
@@ -153,7 +195,25 @@ class POAgent:
             
             self.state["header"]["po_type"] = po_type
             self.state["step"] = "header_currency"
-            return "What **Currency** should be used? (e.g., INR, USD)"
+            return self._offer_defaults() or "What **Currency** should be used? (e.g., INR, USD)"
+
+        elif step == "accept_defaults":
+            suggested = self.state.pop("suggested_defaults", {})
+            first_word = user_input.lower().split()[0].strip(".,!") if user_input.split() else ""
+            if not (self._is_yes(user_input) or first_word in ("accept", "use")):
+                self.state["step"] = "header_currency"
+                return "OK, let's pick them one by one.\n\nWhat **Currency** should be used? (e.g., INR, USD)"
+
+            self.state["header"]["currency"] = suggested["currency"]
+            self.state["header"]["validity_date"] = (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d")
+            self.state["org_data"]["plant"] = suggested["plant"]
+            self.state["org_data"]["purchase_org"] = suggested["purchase_org"]
+            self.state["org_data"]["purchase_group"] = suggested["purchase_group"]
+            if suggested.get("payment_term"):
+                self.state.setdefault("optional", {})["payment_term"] = suggested["payment_term"]
+            self.state["step"] = "optional_fields"
+            return ("Usual settings applied.\n\nDo you want to add **optional fields** (Projects, Payment Terms, "
+                    "Inco Terms)? Type 'yes' or 'skip'.")
 
         elif step == "header_currency":
             self.state["header"]["currency"] = user_input.upper()
@@ -192,9 +252,8 @@ class POAgent:
         # --- STEP 2.5: OPTIONAL FIELDS ---
         elif step == "optional_fields":
             if "skip" in user_input.lower():
-                self.state["step"] = "item_material"
-                return "--- Line Item 1 ---\n\nWhat **Material/Service** do you want to add?"
-            elif "yes" in user_input.lower():
+                return self._start_line_items()
+            elif self._is_yes(user_input):
                 self.state["step"] = "optional_project"
                 return "Enter **Project Name** (or type 'skip'):"
             else:
@@ -202,9 +261,11 @@ class POAgent:
 
         elif step == "optional_project":
             if "skip" not in user_input.lower():
-                self.state["optional"] = {"project": user_input}
+                # Keeps a payment term filled in from the usual settings
+                self.state.setdefault("optional", {})["project"] = user_input
             self.state["step"] = "optional_payment"
-            return "Enter **Payment Term** (or type 'skip'):"
+            current = self.state.get("optional", {}).get("payment_term")
+            return f"Enter **Payment Term** (or type 'skip'{f' to keep {current}' if current else ''}):"
 
         elif step == "optional_payment":
             if "skip" not in user_input.lower():
@@ -219,8 +280,7 @@ class POAgent:
                 if "optional" not in self.state:
                     self.state["optional"] = {}
                 self.state["optional"]["inco_term"] = user_input
-            self.state["step"] = "item_material"
-            return "--- Line Item 1 ---\n\nWhat **Material/Service** do you want to add?"
+            return self._start_line_items()
 
         # --- STEP 3: LINE ITEMS ---
         elif step == "item_material":
@@ -228,23 +288,17 @@ class POAgent:
             if "initial_details" in self.state and not user_input:
                 user_input = self.state.pop("initial_details") # Use and remove
             
+            # Several items (or "20 MS Pipe at 100") in one message / pasted table
+            items = parse_line_items(user_input)
+            if len(items) > 1 or (items and items[0]["quantity"] is not None):
+                return self._queue_line_items(items)
+            
             # Custom handling for material to store in current_item
             materials = self.tools.search_materials(user_input)
             if not materials:
                 return f"I couldn't find any material matching '{user_input}'. Try 'MS Pipe' or 'Steel'."
             
-            # Try exact match first (case-insensitive)
-            selected = next((m for m in materials if m['name'].lower() == user_input.lower()), None)
-            
-            # If no exact match, check partial matches
-            if not selected:
-                partial_matches = [m for m in materials if user_input.lower() in m['name'].lower()]
-                if len(partial_matches) == 1:
-                    selected = partial_matches[0]
-            
-            # If still no match but only 1 result total, auto-select
-            if not selected and len(materials) == 1:
-                selected = materials[0]
+            selected = self._pick_material(user_input, materials)
             
             if selected:
                 self.state["current_item"]["material"] = selected
@@ -254,10 +308,31 @@ class POAgent:
                 # Multiple matches - frontend will show buttons
                 return f"I found multiple matches for '{user_input}'. Please select one."
 
+        elif step == "item_resolve":
+            item = self.state["item_queue"][0]
+            if "skip" in user_input.lower():
+                self.state["item_queue"].pop(0)
+                return self._drain_item_queue([f"Skipped **{item['query']}**."])
+            
+            candidates = item["candidates"]
+            if user_input.strip().isdigit() and 1 <= int(user_input) <= len(candidates):
+                selected = candidates[int(user_input) - 1]
+            else:
+                selected = self._pick_material(user_input, candidates)
+            if not selected:
+                return f"Please pick one of the listed materials for **{item['query']}** (or type 'skip')."
+            item["material"] = selected
+            return self._drain_item_queue()
+
         elif step == "item_qty":
             try:
                 qty = float(user_input)
                 self.state["current_item"]["quantity"] = qty
+                if self.state["current_item"].get("price") is not None:
+                    # Price came with the item list
+                    item = self._add_line_item(self.state.pop("current_item"))
+                    self.state["current_item"] = {}
+                    return self._drain_item_queue([f"Item added! Total: {item['total']}"])
                 self.state["step"] = "item_price"
                 return "Enter **Unit Price**:"
             except:
@@ -268,19 +343,20 @@ class POAgent:
                 price = float(user_input)
                 item = self.state["current_item"]
                 item["price"] = price
-                item["total"] = item["quantity"] * price
                 
                 # Add to list
-                self.state["line_items"].append(item)
+                item = self._add_line_item(item)
                 self.state["current_item"] = {} # Reset
                 
+                if self.state.get("item_queue"):
+                    return self._drain_item_queue([f"Item added! Total: {item['total']}"])
                 self.state["step"] = "add_more_check"
                 return f"Item added! Total: {item['total']}\n\nDo you want to **add another item**? (yes/no)"
             except:
                 return "Please enter a valid price."
 
         elif step == "add_more_check":
-            if "yes" in user_input.lower():
+            if self._is_yes(user_input):
                 self.state["step"] = "item_material"
                 return f"--- Line Item {len(self.state['line_items']) + 1} ---\n\nWhat **Material**?"
             else:
@@ -296,7 +372,7 @@ class POAgent:
 
         # --- STEP 4: CONFIRM ---
         elif step == "confirm":
-            if "yes" in user_input.lower() or "create" in user_input.lower():
+            if self._is_yes(user_input) or "create" in user_input.lower():
                 # Save to DB
                 optional = self.state.get("optional", {})
                 po_data = {
@@ -316,6 +392,7 @@ class POAgent:
                     "payment_term_code": optional.get("payment_term"),
                     "inco_term_code": optional.get("inco_term"),
                     "remarks": self.state.get("remarks"),
+                    "created_by": self.state.get("user"),
                     "line_items": self.state["line_items"],
                     "total_amount": sum(i["total"] for i in self.state["line_items"])
                 }
@@ -329,6 +406,123 @@ class POAgent:
 
         return "I didn't understand. Please try again."
 
+    @staticmethod
+    def _is_yes(user_input: str) -> bool:
+        """True for "yes" anywhere, or a message starting with y/ok/okay/sure ("ok, add another")"""
+        lowered = user_input.lower()
+        first_word = lowered.split()[0].strip(".,!") if lowered.split() else ""
+        return "yes" in lowered or YES_NO_VALUES.get(first_word) == "yes"
+
+    def _offer_defaults(self) -> Optional[str]:
+        """Offer the supplier's usual currency and org data as one step (needs enough PO history)"""
+        supplier = self.state["header"]["supplier"] or {}
+        predicted = predict_defaults(supplier.get("id"), self.state.get("user"))
+        # Only worth a step when it replaces all four questions
+        if not all(field in predicted for field in ("currency", "plant", "purchase_org", "purchase_group")):
+            return None
+
+        self.state["suggested_defaults"] = {field: guess["value"] for field, guess in predicted.items()}
+        self.state["step"] = "accept_defaults"
+        return self._defaults_prompt()
+
+    def _defaults_prompt(self) -> str:
+        d = self.state["suggested_defaults"]
+        lines = [
+            f"- **Currency:** {d['currency']}",
+            f"- **Plant:** {d['plant']['name']}",
+            f"- **Purch Org:** {d['purchase_org']['name']} ({d['purchase_org'].get('code') or 'N/A'})",
+            f"- **Purch Group:** {d['purchase_group']['name']} ({d['purchase_group'].get('code') or 'N/A'})",
+        ]
+        if d.get("payment_term"):
+            lines.append(f"- **Payment Term:** {d['payment_term']}")
+        return (f"Your usual settings for **{self.state['header']['supplier']['name']}**:\n" + "\n".join(lines)
+                + "\n\nUse them? Type 'yes', or 'no' to choose each one.")
+
+    def _start_line_items(self) -> str:
+        """Enter the line item steps, resolving items given up front in one go"""
+        pending = self.state.pop("pending_items", None)
+        if pending:
+            return self._queue_line_items(pending)
+        self.state["step"] = "item_material"
+        return "--- Line Item 1 ---\n\nWhat **Material/Service** do you want to add?"
+
+    def _queue_line_items(self, items: List[Dict]) -> str:
+        """Resolve all materials in one lookup, then add items until one needs input"""
+        candidates = self.tools.resolve_materials([i["material"] for i in items])
+        queue = []
+        for item in items:
+            matches = candidates.get(item["material"], [])
+            selected = self._pick_material(item["material"], matches)
+            queue.append({
+                "query": item["material"],
+                "material": selected,
+                "candidates": [] if selected else matches,
+                "quantity": item["quantity"],
+                "price": item["price"]
+            })
+        self.state["item_queue"] = queue
+        return self._drain_item_queue([f"Got {len(items)} line items."])
+
+    def _drain_item_queue(self, notes: Optional[List[str]] = None) -> str:
+        """Add queued items; stop at the first one that is ambiguous or incomplete"""
+        notes = notes or []
+        queue = self.state.get("item_queue", [])
+        while queue:
+            item = queue[0]
+            if not item["material"]:
+                if not item["candidates"]:
+                    notes.append(f"⚠️ No material matches **{item['query']}**, skipped.")
+                    queue.pop(0)
+                    continue
+                self.state["step"] = "item_resolve"
+                choices = "\n".join(f"{n}. {m['name']} ({m.get('code', '')})" for n, m in enumerate(item["candidates"], 1))
+                notes.append(f"Which material did you mean for **{item['query']}**?\n\n{choices}\n\n(or type 'skip')")
+                return "\n\n".join(notes)
+
+            # Fall back to the master price when none was given
+            price = item["price"] if item["price"] is not None else (float(item["material"].get("price") or 0) or None)
+            queue.pop(0)
+            if item["quantity"] is None:
+                self.state["current_item"] = {"material": item["material"], "price": price}
+                self.state["step"] = "item_qty"
+                notes.append(f"Selected: **{item['material']['name']}**\n\nEnter **Quantity**:")
+                return "\n\n".join(notes)
+            if price is None:
+                self.state["current_item"] = {"material": item["material"], "quantity": item["quantity"]}
+                self.state["step"] = "item_price"
+                notes.append(f"Selected: **{item['material']['name']}** × {item['quantity']}\n\nEnter **Unit Price**:")
+                return "\n\n".join(notes)
+
+            added = self._add_line_item({"material": item["material"], "quantity": item["quantity"], "price": price})
+            notes.append(f"✅ {added['material']['name']}: {added['quantity']} × {added['price']} = {added['total']}")
+
+        self.state.pop("item_queue", None)
+        self.state["step"] = "add_more_check"
+        notes.append(f"{len(self.state['line_items'])} item(s) on this PO. Do you want to **add another item**? (yes/no)")
+        return "\n\n".join(notes)
+
+    def _add_line_item(self, item: Dict) -> Dict:
+        item["total"] = item["quantity"] * item["price"]
+        self.state["line_items"].append(item)
+        return item
+
+    @staticmethod
+    def _pick_material(query: str, materials: List[Dict]) -> Optional[Dict]:
+        """Exact name match, else the only partial match, else the only result"""
+        # Try exact match first (case-insensitive)
+        selected = next((m for m in materials if m['name'].lower() == query.lower()), None)
+        
+        # If no exact match, check partial matches
+        if not selected:
+            partial_matches = [m for m in materials if query.lower() in m['name'].lower()]
+            if len(partial_matches) == 1:
+                selected = partial_matches[0]
+        
+        # If still no match but only 1 result total, auto-select
+        if not selected and len(materials) == 1:
+            selected = materials[0]
+        return selected
+
     def _handle_selection(self, user_input, search_func, state_category, state_key, next_step, success_msg):
         """Helper to handle search-and-select logic"""
         results = search_func(user_input)
@@ -395,6 +589,8 @@ class POAgent:
             return "Selected: **{name}**\n\nSelect **PO Type**:".format(name=self.state["header"]["supplier"]["name"])
         elif step == "header_currency":
             return "What **Currency** should be used? (e.g., INR, USD)"
+        elif step == "accept_defaults":
+            return self._defaults_prompt()
         elif step == "org_plant":
             return f"Currency set to **{self.state['header']['currency']}**.\n\nNow, which **Plant** is this for?"
         elif step == "org_purch_org":
@@ -411,6 +607,10 @@ class POAgent:
             return "Enter **Inco Term** (or type 'skip'):"
         elif step == "item_material":
             return f"--- Line Item {len(self.state['line_items']) + 1} ---\n\nWhat **Material/Service** do you want to add?"
+        elif step == "item_resolve":
+            item = self.state["item_queue"][0]
+            choices = "\n".join(f"{n}. {m['name']}" for n, m in enumerate(item["candidates"], 1))
+            return f"Which material did you mean for **{item['query']}**?\n\n{choices}\n\n(or type 'skip')"
         elif step == "item_qty":
             return f"Selected: **{self.state['current_item']['material']['name']}**\n\nEnter **Quantity**:"
         elif step == "item_price":
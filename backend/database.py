@@ -1,8 +1,13 @@
 import os
+import random
+import threading
+import time
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
-from sqlalchemy.orm import sessionmaker
-import pymysql
+
+from backend import query_stats
+from backend.tracing import instrument_engine
 
 # Load environment variables
 load_dotenv()
@@ -14,16 +19,172 @@ MYSQL_PASSWORD = os.getenv("MYSQL_PASSWORD")
 # print(f"DEBUG: DB Host: {MYSQL_HOST}, User: {MYSQL_USER}, Password: {MYSQL_PASSWORD[:2]}***{MYSQL_PASSWORD[-2:] if MYSQL_PASSWORD else ''}")
 MYSQL_DB = os.getenv("MYSQL_DB")
 
-# Create database URL
-DATABASE_URL = f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}/{MYSQL_DB}"
+# Create database URL (DATABASE_URL overrides, e.g. an embedded DB for benchmarks)
+DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{MYSQL_HOST}/{MYSQL_DB}"
+
+# Read replicas: full URLs, or hosts sharing the primary's credentials
+DATABASE_REPLICA_URLS = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()] or [
+    f"mysql+pymysql://{MYSQL_USER}:{MYSQL_PASSWORD}@{host.strip()}/{MYSQL_DB}"
+    for host in os.getenv("MYSQL_REPLICA_HOSTS", "").split(",") if host.strip()
+]
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_CHECK_INTERVAL = float(os.getenv("REPLICA_CHECK_INTERVAL", "15"))
+
+# SQLAlchemy (and the pymysql driver) are only imported when the engine is first needed
+_engine = None
+_session_factory = None
+_engine_lock = threading.Lock()
+
+def get_engine():
+    """Get or create the SQLAlchemy engine for the primary (writes, read-your-writes)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                from sqlalchemy import create_engine
+                _engine = create_engine(DATABASE_URL, echo=False)
+                instrument_engine(_engine)
+                query_stats.attach(_engine)
+    return _engine
+
+get_write_engine = get_engine
+
+class ReplicaPool:
+    """Read replicas with periodic health and replication-lag checks"""
+
+    def __init__(self, urls: List[str], max_lag: float, check_interval: float):
+        self.urls = urls
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.replicas: List[Dict] = []
+        self._lock = threading.Lock()
+        self._checker = None
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._checker is not None:
+                return
+            from sqlalchemy import create_engine
+            self.replicas = [
+                {"url": url, "engine": create_engine(url, echo=False, pool_pre_ping=True),
+                 "healthy": False, "lag": None}
+                for url in self.urls
+            ]
+            for replica in self.replicas:
+                instrument_engine(replica["engine"])
+                query_stats.attach(replica["engine"])
+            # First check runs inline so the very first read can already use a replica
+            self.check_all()
+            self._checker = threading.Thread(target=self._check_loop, name="replica-health", daemon=True)
+            self._checker.start()
+
+    def _check_loop(self):
+        while True:
+            time.sleep(self.check_interval)
+            self.check_all()
+
+    def check_all(self):
+        for replica in self.replicas:
+            try:
+                with replica["engine"].connect() as conn:
+                    lag = self._replication_lag(conn)
+                replica["lag"] = lag
+                replica["healthy"] = lag is not None and lag <= self.max_lag
+            except Exception as e:
+                if replica["healthy"]:
+                    print(f"[WARN] Replica {replica['engine'].url.host} unhealthy: {e}")
+                replica["healthy"] = False
+                replica["lag"] = None
+
+    @staticmethod
+    def _replication_lag(conn) -> Optional[float]:
+        """Seconds behind the primary, None if replication is not running"""
+        for statement, column in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"),
+                                  ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+            try:
+                row = conn.execute(text(statement)).mappings().fetchone()
+            except Exception:
+                continue
+            if row is None:
+                # Not configured as a replica (e.g. a read-only copy); treat as current
+                return 0.0
+            return float(row[column]) if row.get(column) is not None else None
+        return None
+
+    def pick(self):
+        """Engine of a healthy replica (random for spread), None if there is none"""
+        self._ensure_started()
+        healthy = [r for r in self.replicas if r["healthy"]]
+        return random.choice(healthy)["engine"] if healthy else None
+
+    def status(self) -> List[Dict]:
+        return [{"host": r["engine"].url.host, "healthy": r["healthy"], "lag": r["lag"]} for r in self.replicas]
+
+_replica_pool = ReplicaPool(DATABASE_REPLICA_URLS, REPLICA_MAX_LAG_SECONDS, REPLICA_CHECK_INTERVAL) if DATABASE_REPLICA_URLS else None
+
+# Read-your-writes: reads in the same context, or for a key just written,
+# go to the primary until replicas have had time to catch up
+_last_write_at: ContextVar[float] = ContextVar("last_write_at", default=0.0)
+_recent_writes: Dict[str, float] = {}
+_recent_writes_lock = threading.Lock()
+
+def has_replicas() -> bool:
+    return _replica_pool is not None
+
+def record_write(key: Optional[str] = None):
+    """Note a write so follow-up reads (for key, or in this context) use the primary"""
+    now = time.time()
+    _last_write_at.set(now)
+    if key:
+        with _recent_writes_lock:
+            _recent_writes[key] = now
+            for stale in [k for k, t in _recent_writes.items() if now - t > REPLICA_MAX_LAG_SECONDS]:
+                _recent_writes.pop(stale, None)
+
+def get_read_engine(key: Optional[str] = None, keys: Iterable[str] = ()):
+    """Engine for reads: a healthy replica, or the primary when freshness matters
+
+    `keys` is for batch reads: the primary is used if any of them was just written.
+    """
+    if _replica_pool is None:
+        return get_engine()
+
+    now = time.time()
+    if now - _last_write_at.get() <= REPLICA_MAX_LAG_SECONDS:
+        return get_engine()
+    keys = [key, *keys] if key else keys
+    with _recent_writes_lock:
+        fresh = any(now - _recent_writes.get(k, 0.0) <= REPLICA_MAX_LAG_SECONDS for k in keys)
+    if fresh:
+        return get_engine()
+    return _replica_pool.pick() or get_engine()
+
+def replica_status() -> List[Dict]:
+    return _replica_pool.status() if _replica_pool else []
+
+def text(query: str):
+    """sqlalchemy.text(), imported on first use"""
+    from sqlalchemy import text as sa_text
+    return sa_text(query)
+
+def __getattr__(name):
+    # Keeps `from backend.database import engine` working for scripts
+    if name == "engine":
+        return get_engine()
+    if name == "SessionLocal":
+        return _get_session_factory()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Create engine
-engine = create_engine(DATABASE_URL, echo=False)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def _get_session_factory():
+    global _session_factory
+    if _session_factory is None:
+        from sqlalchemy.orm import sessionmaker
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory
 
 def get_db():
     """Get database session"""
-    db = SessionLocal()
+    db = _get_session_factory()()
     try:
         yield db
     finally:
@@ -32,7 +193,7 @@ def get_db():
 def test_connection():
     """Test database connection"""
     try:
-        with engine.connect() as conn:
+        with get_engine().connect() as conn:
             result = conn.execute(text("SELECT 1"))
             print("✅ Database connection successful!")
             return True
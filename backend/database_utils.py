@@ -1,10 +1,9 @@
-from sqlalchemy import text
-from backend.database import get_db, engine
+from backend.database import get_read_engine, text
 
 def get_purchase_groups():
     """Fetch all purchase groups from database"""
     try:
-        with engine.connect() as conn:
+        with get_read_engine().connect() as conn:
             result = conn.execute(text("SELECT id, code, name FROM purchase_groups WHERE status = '1'"))
             groups = [{"id": row[0], "code": row[1], "name": row[2]} for row in result]
             return groups
@@ -15,7 +14,7 @@ def get_purchase_groups():
 def get_suppliers_from_db(limit=10):
     """Fetch suppliers directly from database"""
     try:
-        with engine.connect() as conn:
+        with get_read_engine().connect() as conn:
             query = text(f"SELECT id, company_name, email, phone_no FROM public_suppliers LIMIT {limit}")
             result = conn.execute(query)
             suppliers = [
@@ -30,7 +29,7 @@ def get_suppliers_from_db(limit=10):
 def get_payment_terms_from_db():
     """Fetch payment terms from database"""
     try:
-        with engine.connect() as conn:
+        with get_read_engine().connect() as conn:
             result = conn.execute(text("SELECT id, code, name FROM payment_terms"))
             terms = [{"id": row[0], "code": row[1], "name": row[2]} for row in result]
             return terms
@@ -41,7 +40,7 @@ def get_payment_terms_from_db():
 def get_inco_terms_from_db():
     """Fetch inco terms from database"""
     try:
-        with engine.connect() as conn:
+        with get_read_engine().connect() as conn:
             result = conn.execute(text("SELECT id, code, name FROM inco_term"))
             terms = [{"id": row[0], "code": row[1], "name": row[2]} for row in result]
             return terms
@@ -0,0 +1,192 @@
+"""
+Intent router for chat turns
+
+Decides whether a message is a data question (SQL agent / chain), an answer
+to the current PO step, or a request to see the current step's options.
+A local scorer over the step and the text handles the clear cases; only
+low-confidence messages are sent to the LLM.
+
+Intents:
+- "question":     data question, answered by SQLAgent / SQLChain
+- "step_input":   answer to the current step (or, without a step, a request for the agent)
+- "show_options": "show me the suppliers" while the supplier step is open
+"""
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+INTENTS = ("question", "step_input", "show_options")
+
+WH_WORDS = ("what", "which", "who", "whom", "whose", "when", "where", "why", "how")
+AUX_WORDS = ("is", "are", "was", "were", "do", "does", "did", "can", "could", "will", "would", "has", "have", "should")
+REQUEST_VERBS = ("show", "list", "give", "tell", "display", "find", "get")
+ACTION_VERBS = ("create", "raise", "make", "start", "new", "add", "search", "select", "use", "set", "change",
+                "cancel", "skip", "yes", "no", "ok", "okay", "sure")
+ANALYTIC = re.compile(
+    r"\b(?:how many|how much|total|count|sum|average|avg|spend|spent|top \d*|most|least|per|trend|"
+    r"last (?:week|month|quarter|year)|this (?:week|month|quarter|year)|status of|history|compare)\b"
+)
+DATA_NOUNS = re.compile(r"\b(?:suppliers|vendors|plants|materials|pos|orders|purchase orders|items)\b")
+NUMBER = re.compile(r"-?\d+(?:[.,]\d+)?")
+DEICTIC = re.compile(r"\b(?:this po|for this|options|choices|available|all|the list)\b")
+CREATE_PO = re.compile(r"\b(?:a|new|another) (?:po|purchase order)\b")
+# Words that may surround the step entity in "show me the suppliers for this PO"
+FILLER = {"me", "the", "a", "for", "this", "po", "are", "is", "there", "all", "available", "options", "choices",
+          "of", "please", "list", "can", "i", "see", "you", "do", "we", "have", "pls"}
+
+# What each step expects, and the words that name its entity
+NUMERIC_STEPS = ("item_qty", "item_price")
+YES_NO_STEPS = ("optional_fields", "add_more_check", "confirm", "accept_defaults")
+SKIPPABLE_STEPS = ("optional_project", "optional_payment", "optional_inco", "remarks")
+STEP_ENTITIES = {
+    "header_supplier": r"suppliers?|vendors?",
+    "header_type": r"(?:po )?types?",
+    "header_currency": r"currenc(?:y|ies)",
+    "org_plant": r"plants?",
+    "org_purch_org": r"(?:purchas(?:e|ing) )?org(?:anization)?s?",
+    "org_purch_group": r"(?:purchas(?:e|ing) )?groups?",
+    "item_material": r"materials?|items?|services?",
+}
+YES_NO_VALUES = {"y": "yes", "n": "no", "ok": "yes", "okay": "yes", "sure": "yes"}
+PO_TYPES = ("asset", "service", "regular purchase", "internal order material", "internal order service",
+            "network", "network service", "cost center material")
+
+LLM_PROMPT = """Classify the user's message in a purchase order chat.
+Current step: {step}
+Message: "{text}"
+
+Answer with exactly one word:
+- question: the user asks for information from the database
+- step_input: the user answers the current step or asks the assistant to do something
+- show_options: the user wants to see the choices for the current step
+"""
+
+
+class IntentRouter:
+    """Local confidence-scored intent classifier with an LLM fallback"""
+
+    def __init__(self, threshold: Optional[float] = None, llm_fallback: Optional[bool] = None):
+        self.threshold = threshold or float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.7"))
+        if llm_fallback is None:
+            llm_fallback = os.getenv("ROUTER_LLM_FALLBACK", "true").lower() == "true"
+        self.llm_fallback = llm_fallback
+        self.stats = Counter()
+
+    def route(self, text: str, step: Optional[str] = None, allow_llm: bool = True) -> Dict:
+        """Returns {"intent", "confidence", "source", "value"}"""
+        decision = self.score(text, step)
+        if decision["confidence"] < self.threshold and allow_llm and self.llm_fallback:
+            llm_intent = self._ask_llm(text, step)
+            if llm_intent:
+                decision.update(intent=llm_intent, source="llm")
+
+        self.stats[decision["source"]] += 1
+        self.stats[decision["intent"]] += 1
+        print(f"[ROUTER] {decision['intent']} conf={decision['confidence']:.2f} via {decision['source']} (step={step})")
+        return decision
+
+    def score(self, text: str, step: Optional[str] = None) -> Dict:
+        """Local decision only: intent, confidence and the step value if one was recognised"""
+        lowered = " ".join(text.lower().strip().split())
+        words = re.findall(r"[a-z0-9']+", lowered)
+        first = words[0] if words else ""
+        value = self._step_value(lowered, step)
+
+        # Asking for the open step's options
+        entity = STEP_ENTITIES.get(step or "")
+        if entity and re.search(rf"\b(?:{entity})\b", lowered) and not ANALYTIC.search(lowered):
+            rest = set(re.findall(r"[a-z0-9']+", re.sub(rf"\b(?:{entity})\b", " ", lowered)))
+            rest -= FILLER | set(REQUEST_VERBS) | set(WH_WORDS)
+            # Anything left (a name, "located", "did we use") makes it a question or a search
+            if not rest and (first in REQUEST_VERBS + WH_WORDS or DEICTIC.search(lowered)):
+                return self._decision("show_options", 0.9, value)
+
+        # Log-odds that this is a data question
+        logit = -1.0
+        cue = False
+        if lowered.endswith("?"):
+            logit += 2.5
+        elif "?" in lowered:
+            logit += 1.5
+        if first in WH_WORDS:
+            logit += 2.0
+            cue = True
+        elif first in AUX_WORDS and len(words) > 2:
+            logit += 1.5
+            cue = True
+        elif first in REQUEST_VERBS:
+            # Without an open step there is no step answer to confuse it with
+            logit += 1.5 if step is None else 0.5
+            cue = True
+        elif first in ACTION_VERBS:
+            logit -= 2.0
+        if ANALYTIC.search(lowered):
+            logit += 1.5
+            cue = True
+        if CREATE_PO.search(lowered):
+            logit -= 2.0
+        if DATA_NOUNS.search(lowered):
+            logit += 0.5
+        if value is not None:
+            logit -= 4.0
+        elif len(words) <= 3 and "?" not in lowered and not cue:
+            logit -= 1.5
+
+        probability = 1 / (1 + math.exp(-logit))
+        if probability >= 0.5:
+            return self._decision("question", probability, value)
+        return self._decision("step_input", 1 - probability, value)
+
+    @staticmethod
+    def _step_value(lowered: str, step: Optional[str]) -> Optional[str]:
+        """The answer the current step expects, if the message contains one"""
+        if step in NUMERIC_STEPS:
+            numbers = NUMBER.findall(lowered)
+            if len(numbers) == 1 and len(lowered.split()) <= 4:
+                return numbers[0].replace(",", "")
+        elif step in YES_NO_STEPS:
+            # Only a bare answer; "no, change the supplier" goes to the step whole
+            match = re.fullmatch(r"(yes|y|no|n|skip|create|ok|okay|sure)[.!]*", lowered)
+            if match:
+                return YES_NO_VALUES.get(match.group(1), match.group(1))
+        elif step in SKIPPABLE_STEPS:
+            if re.fullmatch(r"(?:skip|no|none|n/a|-)\.?", lowered):
+                return "skip"
+        elif step == "header_currency":
+            if re.fullmatch(r"[a-z]{3}", lowered):
+                return lowered.upper()
+        elif step == "header_type":
+            if lowered in PO_TYPES:
+                return lowered.title()
+        return None
+
+    @staticmethod
+    def _decision(intent: str, confidence: float, value: Optional[str]) -> Dict:
+        return {"intent": intent, "confidence": round(confidence, 3), "source": "local", "value": value}
+
+    def _ask_llm(self, text: str, step: Optional[str]) -> Optional[str]:
+        from backend.llm import get_llm
+
+        answer = get_llm().invoke(LLM_PROMPT.format(step=step or "none", text=text)).strip().lower()
+        for intent in INTENTS:
+            if intent in answer:
+                return intent
+        print(f"[WARN] Router LLM fallback gave no intent: {answer[:80]}")
+        return None
+
+
+# Singleton instance
+_intent_router = None
+
+def get_intent_router() -> IntentRouter:
+    """Get or create the intent router singleton"""
+    global _intent_router
+    if _intent_router is None:
+        _intent_router = IntentRouter()
+    return _intent_router
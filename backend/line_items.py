@@ -0,0 +1,187 @@
+"""
+Line item extraction from a single message
+
+Recognises several items in one message without an LLM call:
+- pasted tables (tab, pipe, semicolon or comma separated, header optional)
+      Material | Qty | Price
+      MS Pipe  | 20  | 100
+- enumerations, one item per line or separated by ";" / "," / "and"
+      20 MS Pipe at 100, 5 x Steel Rod @ 250 and Bolts x 100
+
+Each item is {"material": str, "quantity": float|None, "price": float|None}.
+
+stored_line_items() reads the line_items JSON of a saved PO back into flat
+rows, whichever agent wrote it.
+"""
+import json
+import re
+from typing import Dict, List, Optional
+
+NUMBER = r"\d+(?:,\d{3})*(?:\.\d+)?"
+UNITS = r"(?:x|units?|pcs|pieces|nos|no\.?|ea|each|kg|kgs|m|mtrs?|meters?|tons?|mt|ltrs?|litres?|liters?|boxes|box|sets?)"
+CURRENCY = r"(?:rs\.?|inr|usd|eur|₹|\$|€)"
+PRICE_TAIL = rf"(?:\s*(?:at|@|for|price|rate|,|-)\s*{CURRENCY}?\s*(?P<price>{NUMBER})\s*(?:{CURRENCY}|each|ea|per\s+\w+|/\s*\w+)?)?"
+
+# "20 MS Pipe at 100", "20 units of MS Pipe @ 100"
+QTY_FIRST = re.compile(
+    rf"^(?P<qty>{NUMBER})(?:\s*(?P<unit>{UNITS})\.?)?\s+(?P<of>of\s+)?(?P<material>.+?){PRICE_TAIL}$", re.IGNORECASE
+)
+# "MS Pipe x 20 @ 100", "MS Pipe - 20 - 100", "MS Pipe: 20", "MS Pipe qty 20"
+# The separator must stand apart from the material, so codes and names such as
+# "RM-2001", "M:100", "Box 10" or "Cable 2x1.5" stay whole
+MATERIAL_FIRST_SEPARATOR = r"(?:\s+x\s*|\s*×\s*|\s+[-:]\s*|:\s+|\s+(?:qty|quantity)\b\s*:?\s*)"
+MATERIAL_FIRST = re.compile(
+    rf"^(?P<material>.+?){MATERIAL_FIRST_SEPARATOR}(?P<qty>{NUMBER})\s*(?:{UNITS}\.?)?{PRICE_TAIL}$", re.IGNORECASE
+)
+LEAD_IN = re.compile(r"^(?:please\s+)?(?:add|order|items?|line\s+items?|materials?)\b\s*:?\s*", re.IGNORECASE)
+BULLET = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s+")
+CHUNK_SPLIT = re.compile(r"\n|;|,\s*(?=\d|[a-z])(?!\d{3}\b)|\s+and\s+", re.IGNORECASE)
+TABLE_SEPARATORS = ("\t", "|", ";", ",")
+HEADER_WORDS = {
+    "material": re.compile(r"material|item|description|product|service|name", re.IGNORECASE),
+    "quantity": re.compile(r"qty|quantity|units|count", re.IGNORECASE),
+    "price": re.compile(r"price|rate|cost|amount", re.IGNORECASE),
+}
+
+
+def parse_line_items(text: str) -> List[Dict]:
+    """All items in the message, or [] if it is not a list of items"""
+    text = text.strip()
+    if not text:
+        return []
+    return _parse_table(text) or _parse_enumeration(text)
+
+
+def normalize_items(items) -> List[Dict]:
+    """Clean items coming from the LLM (strings for numbers, missing keys)"""
+    normalized = []
+    for item in items or []:
+        if isinstance(item, dict) and str(item.get("material") or "").strip():
+            normalized.append({
+                "material": str(item["material"]).strip(),
+                "quantity": _number(item.get("quantity")),
+                "price": _number(item.get("price")),
+            })
+    return normalized
+
+
+def stored_line_items(raw) -> List[Dict]:
+    """Flat rows (line_no, material_id/name/code, quantity, price, total) from a PO's line_items column"""
+    items = raw or []
+    if isinstance(items, (str, bytes)):
+        try:
+            items = json.loads(items)
+        except ValueError:
+            return []
+    if not isinstance(items, list):
+        return []
+
+    rows = []
+    for item in (i for i in items if isinstance(i, dict)):
+        # Chat POs nest the material; SmartPOAgent POs flatten it
+        material = item.get("material")
+        if not isinstance(material, dict):
+            material = {"name": material} if material else {}
+        quantity, price, total = item.get("quantity"), item.get("price"), item.get("total")
+        if total is None and _number(quantity) is not None and _number(price) is not None:
+            total = _number(quantity) * _number(price)
+        rows.append({
+            "line_no": len(rows) + 1,
+            "material_id": material.get("id", item.get("material_id")),
+            "material_name": material.get("name", item.get("material_name")),
+            "material_code": material.get("code", item.get("material_code")),
+            "quantity": quantity,
+            "price": price,
+            "total": total,
+        })
+    return rows
+
+
+def _parse_table(text: str) -> List[Dict]:
+    lines = [l for l in text.splitlines() if l.strip() and not re.fullmatch(r"[\s|:+-]+", l)]
+    if len(lines) < 2:
+        return []
+    separator = next((s for s in TABLE_SEPARATORS if all(s in l for l in lines)), None)
+    if separator is None:
+        return []
+
+    rows = [[c.strip() for c in l.strip().strip("|").split(separator)] for l in lines]
+    columns = _header_columns(rows[0])
+    if columns:
+        rows = rows[1:]
+    items = []
+    for row in rows:
+        cells = [c for c in row if c]
+        if not cells:
+            continue
+        if columns:
+            get = lambda key: row[columns[key]] if key in columns and columns[key] < len(row) else None
+            material, quantity, price = get("material"), _number(get("quantity")), _number(get("price"))
+        else:
+            # No header: the text cell is the material, numbers are quantity then price
+            texts = [c for c in cells if _number(c) is None]
+            numbers = [_number(c) for c in cells if _number(c) is not None]
+            material = texts[0] if texts else None
+            quantity = numbers[0] if numbers else None
+            price = numbers[1] if len(numbers) > 1 else None
+        if not material:
+            return []
+        items.append({"material": material, "quantity": quantity, "price": price})
+    return items
+
+
+def _header_columns(row: List[str]) -> Dict[str, int]:
+    columns = {}
+    for index, cell in enumerate(row):
+        if _number(cell) is not None:
+            return {}
+        for key, pattern in HEADER_WORDS.items():
+            if key not in columns and pattern.search(cell):
+                columns[key] = index
+                break
+    return columns if "material" in columns else {}
+
+
+def _parse_enumeration(text: str) -> List[Dict]:
+    chunks = [BULLET.sub("", c).strip(" .") for c in CHUNK_SPLIT.split(LEAD_IN.sub("", text))]
+    chunks = [c for c in chunks if c]
+    items = []
+    for chunk in chunks:
+        match = QTY_FIRST.match(chunk)
+        if match and len(chunks) == 1 and not _explicit_quantity(match):
+            # "304 Stainless Steel", "3M Tape", "12 mm TMT Bar" are material names
+            match = None
+        match = match or MATERIAL_FIRST.match(chunk)
+        if not match:
+            # One unparseable chunk means this is not an item list
+            return []
+        material = match.group("material").strip(" -:,")
+        if not material or _number(material) is not None:
+            return []
+        items.append({
+            "material": material,
+            "quantity": _number(match.group("qty")),
+            "price": _number(match.group("price")),
+        })
+    return items
+
+
+def _explicit_quantity(match) -> bool:
+    """A leading number is a quantity only with a unit, "x", "of" or a price after it"""
+    if match.group("price") or match.group("of"):
+        return True
+    unit = match.group("unit")
+    # "3M Tape": a bare "m" stuck to the number is part of the name
+    return bool(unit) and not (unit.lower() == "m" and match.end("qty") == match.start("unit"))
+
+
+def _number(value) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    cleaned = re.sub(rf"^{CURRENCY}\s*|\s*{CURRENCY}$", "", str(value).strip(), flags=re.IGNORECASE).replace(",", "")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
@@ -1,20 +1,33 @@
 import os
-import boto3
 import json
 from dotenv import load_dotenv
 
+from backend.tracing import instrument_bedrock
+
 load_dotenv()
 
+def create_bedrock_client():
+    """Create a bedrock-runtime client (boto3 is imported on first use)"""
+    import boto3
+
+    return instrument_bedrock(boto3.client(
+        service_name='bedrock-runtime',
+        region_name=os.getenv("AWS_REGION", "us-east-1"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_KEY")
+    ))
+
 class BedrockLLM:
     def __init__(self):
-        self.client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=os.getenv("AWS_REGION", "us-east-1"),
-            aws_access_key_id=os.getenv("AWS_ACCESS_KEY"),
-            aws_secret_access_key=os.getenv("AWS_SECRET_KEY")
-        )
+        self._client = None
         self.model_id = os.getenv("CLAUDE_SONNET_MODEL_ID")
 
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = create_bedrock_client()
+        return self._client
+
     def invoke(self, prompt: str) -> str:
         """Invoke Claude Sonnet with a prompt"""
         payload = {
@@ -42,8 +55,14 @@ class BedrockLLM:
             print(f"❌ Bedrock Error: {e}")
             return f"Error: {str(e)}"
 
+# Singleton instance (the Bedrock client is thread-safe and shared across sessions)
+_llm = None
+
 def get_llm():
-    return BedrockLLM()
+    global _llm
+    if _llm is None:
+        _llm = BedrockLLM()
+    return _llm
 
 if __name__ == "__main__":
     llm = get_llm()
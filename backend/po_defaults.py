@@ -0,0 +1,245 @@
+"""
+History-based org-data defaults per supplier and per user
+
+Buyers nearly always order from a supplier with the same plant, purchase
+org, purchase group, currency and payment term. po_default_counts counts,
+per scope, how often each value was used:
+- supplier:      all POs of the supplier
+- user:          all POs the user created
+- user_supplier: the user's POs with that supplier
+
+Each PO insert adds itself (record_defaults, after its own commit, like
+the spend summaries); backfill() rebuilds the supplier counts from the PO
+table. The PO table has no creator column, so user counts only come from
+inserts. predict() returns a field's most used value once it has enough
+history and a clear majority, most specific scope first.
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.database import get_engine, get_read_engine, text
+
+DEFAULTS_TABLE = "po_default_counts"
+DEFAULTS_MIN_POS = int(os.getenv("DEFAULTS_MIN_POS", "3"))
+DEFAULTS_MIN_SHARE = float(os.getenv("DEFAULTS_MIN_SHARE", "0.6"))
+
+# field: (value column, code column, master data kind the value is an id of)
+FIELDS = {
+    "plant": ("plant_id", "plant_code", "plants"),
+    "purchase_org": ("purchase_org_id", "purchase_org_code", "purchase_orgs"),
+    "purchase_group": ("purchase_group_id", "purchase_group_code", "purchase_groups"),
+    "currency": ("currency", None, None),
+    "payment_term": ("payment_term_code", None, None),
+}
+# Counts the scope's POs, for the share of each value
+TOTAL_FIELD = "pos"
+SCOPES = ("user_supplier", "supplier", "user")
+
+DDL = """
+CREATE TABLE IF NOT EXISTS po_default_counts (
+    scope VARCHAR(20) NOT NULL,
+    scope_key VARCHAR(255) NOT NULL,
+    field VARCHAR(30) NOT NULL,
+    value VARCHAR(255) NOT NULL,
+    code VARCHAR(50),
+    use_count INT NOT NULL DEFAULT 0,
+    last_used DATE,
+    PRIMARY KEY (scope, scope_key, field, value)
+)
+"""
+
+
+def create_defaults_table(engine=None):
+    """Create po_default_counts if it doesn't exist"""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        conn.execute(text(DDL))
+        conn.commit()
+
+
+def record_defaults(pos: Iterable[Dict], engine=None):
+    """Count newly inserted POs (errors are logged, not raised)
+
+    A PO's creator is read from its "created_by" key, if set.
+    """
+    try:
+        rows = _aggregate(pos)
+        if not rows:
+            return
+        engine = engine or get_engine()
+        with engine.connect() as conn:
+            _upsert(conn, rows)
+            conn.commit()
+    except Exception as e:
+        print(f"[WARN] PO defaults not updated (run backfill_po_defaults.py): {e}")
+
+
+def backfill(batch_size: int = 1000, engine=None) -> int:
+    """Rebuild the supplier counts from independent_purchase_orders; returns the POs read
+
+    User counts are kept as they are (past POs don't say who created them).
+    """
+    engine = engine or get_engine()
+    create_defaults_table(engine)
+    # POs inserted from here on count themselves (record_defaults); the scan stops
+    # at the last id before the reset so it doesn't count them a second time
+    with engine.connect() as conn:
+        max_id = conn.execute(text("SELECT MAX(id) FROM independent_purchase_orders")).scalar() or 0
+        conn.execute(text(f"DELETE FROM {DEFAULTS_TABLE} WHERE scope = 'supplier'"))
+        conn.commit()
+
+    last_id, total = 0, 0
+    query = """
+    SELECT id, po_date, created_at, supplier_id, plant_id, plant_code,
+           purchase_org_id, purchase_org_code, purchase_group_id, purchase_group_code,
+           currency, payment_term_code
+    FROM independent_purchase_orders
+    WHERE id > :last_id AND id <= :max_id
+    ORDER BY id
+    LIMIT :batch_size
+    """
+    while True:
+        with engine.connect() as conn:
+            params = {"last_id": last_id, "max_id": max_id, "batch_size": batch_size}
+            batch = [dict(row._mapping) for row in conn.execute(text(query), params)]
+            if not batch:
+                break
+            _upsert(conn, _aggregate(batch))
+            conn.commit()
+        last_id = batch[-1]["id"]
+        total += len(batch)
+        print(f"[PO DEFAULTS] {total} POs counted (last id {last_id})")
+    return total
+
+
+def predict(supplier_id, user: Optional[str] = None, engine=None) -> Dict[str, Dict]:
+    """{field: {"value", "share", "pos", "scope"}} for fields with a clear usual value
+
+    plant/purchase_org/purchase_group values are {id, code, name} like the
+    search results; currency and payment_term are codes. {} when there is
+    not enough history (or the table doesn't exist yet).
+    """
+    scopes = _scopes(supplier_id, user)
+    if not scopes:
+        return {}
+
+    try:
+        where = " OR ".join(f"(scope = :scope_{i} AND scope_key = :key_{i})" for i in range(len(scopes)))
+        params = {}
+        for i, (scope, key) in enumerate(scopes):
+            params.update({f"scope_{i}": scope, f"key_{i}": key})
+        query = f"SELECT scope, field, value, code, use_count, last_used FROM {DEFAULTS_TABLE} WHERE {where}"
+        with (engine or get_read_engine()).connect() as conn:
+            rows = [dict(row._mapping) for row in conn.execute(text(query), params)]
+    except Exception as e:
+        print(f"[WARN] PO defaults unavailable: {e}")
+        return {}
+
+    totals = {r["scope"]: r["use_count"] for r in rows if r["field"] == TOTAL_FIELD}
+    predicted = {}
+    for field in FIELDS:
+        # Most specific scope with enough history and a clear majority wins
+        for scope, _ in scopes:
+            pos = totals.get(scope, 0)
+            candidates = [r for r in rows if r["scope"] == scope and r["field"] == field]
+            if pos < DEFAULTS_MIN_POS or not candidates:
+                continue
+            best = max(candidates, key=lambda r: (r["use_count"], str(r["last_used"] or "")))
+            share = best["use_count"] / pos
+            if share >= DEFAULTS_MIN_SHARE:
+                predicted[field] = {"value": best["value"], "code": best["code"],
+                                    "share": round(share, 2), "pos": pos, "scope": scope}
+                break
+    return _resolve(predicted)
+
+
+def _resolve(predicted: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Turn master-data ids into {id, code, name} (one round trip); drops ids that no longer exist"""
+    from backend.tools import POTools
+
+    batch = POTools.batch()
+    for field, guess in predicted.items():
+        kind = FIELDS[field][2]
+        if kind:
+            batch.add(field, kind, limit=1, ids=[guess["value"]])
+    try:
+        found = batch.run()
+    except Exception as e:
+        print(f"[WARN] PO defaults: master data lookup failed: {e}")
+        found = {field: [] for field in predicted if FIELDS[field][2]}
+
+    resolved = {}
+    for field, guess in predicted.items():
+        if FIELDS[field][2]:
+            if not found.get(field):
+                continue
+            value = found[field][0]
+            # Codes stored on the POs fill in what the master table lacks
+            value["code"] = value.get("code") or guess["code"]
+        else:
+            value = guess["value"]
+        resolved[field] = {"value": value, "share": guess["share"], "pos": guess["pos"], "scope": guess["scope"]}
+    return resolved
+
+
+def _scopes(supplier_id, user: Optional[str]) -> List[Tuple[str, str]]:
+    supplier = str(supplier_id) if supplier_id not in (None, "") else None
+    keys = {
+        "user_supplier": f"{user}|{supplier}" if user and supplier else None,
+        "supplier": supplier,
+        "user": user or None,
+    }
+    return [(scope, keys[scope]) for scope in SCOPES if keys[scope]]
+
+
+def _aggregate(pos: Iterable[Dict]) -> Dict[tuple, Dict]:
+    """{(scope, scope_key, field, value): {code, use_count, last_used}} summed over the POs"""
+    rows = defaultdict(lambda: {"code": None, "use_count": 0, "last_used": None})
+    for po in pos:
+        day = _parse_day(po.get("po_date") or po.get("created_at")).isoformat()
+        values = [(TOTAL_FIELD, "", None)]
+        for field, (column, code_column, _) in FIELDS.items():
+            value = po.get(column)
+            if value not in (None, ""):
+                values.append((field, str(value), po.get(code_column) if code_column else None))
+
+        for scope, key in _scopes(po.get("supplier_id"), po.get("created_by")):
+            for field, value, code in values:
+                row = rows[(scope, key, field, value)]
+                row["use_count"] += 1
+                row["code"] = code or row["code"]
+                row["last_used"] = max(row["last_used"] or day, day)
+    return rows
+
+
+def _upsert(conn, rows: Dict[tuple, Dict]):
+    if not rows:
+        return
+    columns = ("scope", "scope_key", "field", "value", "code", "use_count", "last_used")
+    insert = f"INSERT INTO {DEFAULTS_TABLE} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})"
+    if conn.dialect.name == "mysql":
+        statement = insert + (
+            " ON DUPLICATE KEY UPDATE use_count = use_count + VALUES(use_count),"
+            " code = COALESCE(VALUES(code), code), last_used = GREATEST(last_used, VALUES(last_used))"
+        )
+    else:
+        statement = insert + (
+            f" ON CONFLICT (scope, scope_key, field, value) DO UPDATE SET"
+            f" use_count = {DEFAULTS_TABLE}.use_count + excluded.use_count,"
+            f" code = COALESCE(excluded.code, {DEFAULTS_TABLE}.code),"
+            f" last_used = MAX({DEFAULTS_TABLE}.last_used, excluded.last_used)"
+        )
+    params = [dict(zip(("scope", "scope_key", "field", "value"), key), **values) for key, values in rows.items()]
+    conn.execute(text(statement), params)
+
+
+def _parse_day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    return date.today()
@@ -0,0 +1,191 @@
+"""
+Streaming export of independent_purchase_orders to CSV, JSONL or Parquet
+
+POs are read with a server-side cursor (stream_results) in chunks of
+EXPORT_CHUNK_ROWS and written chunk by chunk, so memory stays constant
+however many POs match. Each line item becomes one output row carrying
+its PO's header columns; a PO without line items is one row with empty
+item columns.
+"""
+import csv
+import io
+import json
+import os
+import sys
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterator, List, Optional
+
+from backend.database import get_read_engine, text
+from backend.line_items import stored_line_items
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+FORMATS = ("csv", "jsonl", "parquet")
+
+HEADER_COLUMNS = [
+    "po_number", "po_date", "validity_date", "po_type", "status",
+    "supplier_id", "supplier_name", "currency",
+    "plant_id", "plant_code", "purchase_org_id", "purchase_org_code",
+    "purchase_group_id", "purchase_group_code", "total_amount", "created_at",
+]
+ITEM_COLUMNS = ["line_no", "material_id", "material_name", "material_code", "quantity", "price", "line_total"]
+COLUMNS = HEADER_COLUMNS + ITEM_COLUMNS
+NUMERIC_COLUMNS = {"total_amount", "quantity", "price", "line_total"}
+DATE_COLUMNS = {"po_date", "validity_date"}
+
+
+def iter_chunks(date_from: Optional[str] = None, date_to: Optional[str] = None,
+                supplier: Optional[str] = None, status: Optional[str] = None,
+                chunk_size: int = EXPORT_CHUNK_ROWS) -> Iterator[List[Dict]]:
+    """Lists of expanded rows (one per line item), one list per fetched chunk of POs"""
+    filters, params = [], {}
+    if date_from:
+        filters.append("po_date >= :date_from")
+        params["date_from"] = date_from
+    if date_to:
+        filters.append("po_date <= :date_to")
+        params["date_to"] = date_to
+    if supplier:
+        filters.append("(supplier_id = :supplier OR supplier_name LIKE :supplier_like)")
+        params.update(supplier=supplier, supplier_like=f"%{supplier}%")
+    if status:
+        filters.append("status = :status")
+        params["status"] = status
+
+    query = f"""
+    SELECT {', '.join(HEADER_COLUMNS)}, line_items
+    FROM independent_purchase_orders
+    {'WHERE ' + ' AND '.join(filters) if filters else ''}
+    ORDER BY id
+    """
+    with get_read_engine().connect() as conn:
+        # Unbuffered cursor: rows arrive as they are fetched instead of all at once
+        result = conn.execution_options(stream_results=True, yield_per=chunk_size).execute(text(query), params)
+        for partition in result.partitions(chunk_size):
+            rows = []
+            for po in partition:
+                rows.extend(_expand(dict(po._mapping)))
+            yield rows
+
+
+def export_pos(out, fmt: str = "csv", **filters) -> Dict:
+    """Write matching POs to `out` (a path, or "-" for stdout); returns counts and timing"""
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}' (use {', '.join(FORMATS)})")
+
+    start = time.perf_counter()
+    stats = {"rows": 0, "chunks": 0}
+
+    def counted():
+        for rows in iter_chunks(**filters):
+            stats["rows"] += len(rows)
+            stats["chunks"] += 1
+            yield rows
+
+    if fmt == "parquet":
+        if out == "-":
+            raise ValueError("Parquet can't be written to stdout, give a file path")
+        write_parquet(counted(), out)
+    else:
+        writer = write_csv if fmt == "csv" else write_jsonl
+        if out == "-":
+            writer(counted(), sys.stdout)
+        else:
+            with open(out, "w", newline="", encoding="utf-8") as f:
+                writer(counted(), f)
+
+    stats["seconds"] = round(time.perf_counter() - start, 2)
+    # Keep stdout clean when the export itself goes there
+    print(f"[EXPORT] {stats['rows']} rows in {stats['chunks']} chunks, {stats['seconds']}s",
+          file=sys.stderr if out == "-" else sys.stdout)
+    return stats
+
+
+def write_csv(chunks: Iterator[List[Dict]], f):
+    writer = csv.DictWriter(f, fieldnames=COLUMNS)
+    writer.writeheader()
+    for rows in chunks:
+        writer.writerows(_plain_row(row) for row in rows)
+
+
+def write_jsonl(chunks: Iterator[List[Dict]], f):
+    for rows in chunks:
+        f.write("".join(json.dumps(_plain_row(row)) + "\n" for row in rows))
+
+
+def write_parquet(chunks: Iterator[List[Dict]], path: str):
+    """One row group per chunk"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export needs pyarrow (pip install pyarrow)")
+
+    schema = pa.schema([
+        (c, pa.float64() if c in NUMERIC_COLUMNS else pa.int64() if c == "line_no"
+         else pa.date32() if c in DATE_COLUMNS else pa.string())
+        for c in COLUMNS
+    ])
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in chunks:
+            if not rows:
+                continue
+            columns = {c: [_typed(c, row[c]) for row in rows] for c in COLUMNS}
+            writer.write_table(pa.Table.from_pydict(columns, schema=schema))
+
+
+def iter_encoded(fmt: str, **filters) -> Iterator[bytes]:
+    """CSV or JSONL bytes, one piece per chunk (for HTTP streaming)"""
+    if fmt not in ("csv", "jsonl"):
+        raise ValueError(f"Streaming supports csv and jsonl, not '{fmt}'")
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS) if fmt == "csv" else None
+    if writer:
+        writer.writeheader()
+    for rows in iter_chunks(**filters):
+        if writer:
+            writer.writerows(_plain_row(row) for row in rows)
+        else:
+            write_jsonl(iter([rows]), buffer)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def _expand(po: Dict) -> List[Dict]:
+    items = stored_line_items(po.pop("line_items"))
+    if not items:
+        return [dict(po, **dict.fromkeys(ITEM_COLUMNS))]
+    return [dict(po, line_total=item.pop("total"), **item) for item in items]
+
+
+def _plain_row(row: Dict) -> Dict:
+    return {k: _plain(v) for k, v in row.items()}
+
+
+def _plain(value):
+    """JSON/CSV friendly value"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def _typed(column: str, value):
+    """Value matching the Parquet schema"""
+    if value is None or value == "":
+        return None
+    if column in NUMERIC_COLUMNS:
+        return float(value)
+    if column == "line_no":
+        return int(value)
+    if column in DATE_COLUMNS:
+        if isinstance(value, datetime):
+            return value.date()
+        return value if isinstance(value, date) else datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    return str(_plain(value))
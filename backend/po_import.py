@@ -0,0 +1,445 @@
+"""
+Streaming PO import from CSV / XLSX spreadsheets
+
+Rows are read one at a time (csv module, openpyxl read-only mode), so memory
+is bounded by the batch size, not by the file. Per batch of rows:
+1. names not seen earlier in the file are resolved against the master tables
+   with one IN query per entity; MasterIndex keeps them for later batches
+2. rows are validated and grouped into POs: consecutive rows with the same
+   po_ref (without a po_ref column: the same supplier, plant, org, group,
+   currency and PO type) are one PO
+3. the POs completed in this batch are written with one executemany, under
+   PO numbers checked against the table (picked again if a concurrent
+   insert takes one first)
+
+A PO with any invalid row is not created, and every row of it is reported.
+Each po_ref is stored in po_import_refs with its PO, so importing the same
+file again skips the POs already created.
+
+Columns (case-insensitive, common aliases accepted):
+  supplier, plant, purchase_org, purchase_group, material, quantity  (required)
+  po_ref, price, currency, po_type, po_date, validity_date           (optional)
+"""
+import csv
+import io
+import os
+import random
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.exc import IntegrityError
+
+from backend.database import get_engine, get_read_engine, text
+from backend.tools import POTools
+
+IMPORT_BATCH_ROWS = int(os.getenv("IMPORT_BATCH_ROWS", "1000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+# PO numbers listed in the report; pos_created counts them all
+IMPORT_MAX_PO_NUMBERS = int(os.getenv("IMPORT_MAX_PO_NUMBERS", "1000"))
+IMPORT_INSERT_ATTEMPTS = 3
+PO_NUMBER_RANGE = range(10_000_000, 100_000_000)
+
+REFS_DDL = """
+CREATE TABLE IF NOT EXISTS po_import_refs (
+    po_ref VARCHAR(255) PRIMARY KEY,
+    po_number VARCHAR(50) NOT NULL,
+    import_id VARCHAR(32),
+    imported_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+)
+"""
+
+COLUMNS = {
+    "po_ref": ("po_ref", "po_reference", "reference", "requisition", "pr_number", "pr"),
+    "supplier": ("supplier", "supplier_name", "vendor", "vendor_name"),
+    "plant": ("plant", "plant_name", "plant_code"),
+    "purchase_org": ("purchase_org", "purchase_organization", "purch_org", "org"),
+    "purchase_group": ("purchase_group", "purch_group", "group"),
+    "material": ("material", "material_name", "material_code", "item", "description"),
+    "quantity": ("quantity", "qty"),
+    "price": ("price", "unit_price", "rate"),
+    "currency": ("currency",),
+    "po_type": ("po_type", "type"),
+    "po_date": ("po_date", "date"),
+    "validity_date": ("validity_date", "valid_until", "validity"),
+}
+REQUIRED = ("supplier", "plant", "purchase_org", "purchase_group", "material", "quantity")
+HEADER_FIELDS = ("supplier", "plant", "purchase_org", "purchase_group", "currency", "po_type")
+
+# entity: (table, selected columns as id/name/code/price, columns a name may match)
+ENTITIES = {
+    "supplier": ("supplier_details", "id, supplier_name, NULL, NULL", ("supplier_name",)),
+    "plant": ("plants", "id, plant_name, plant_code, NULL", ("plant_name", "plant_code")),
+    "purchase_org": ("purchase_organization", "id, description, code, NULL", ("description", "code")),
+    "purchase_group": ("purchase_groups", "id, name, code, NULL", ("name", "code")),
+    "material": ("materials", "id, name, code, price", ("name", "code")),
+}
+
+
+class MasterIndex:
+    """Names/codes seen in the import, resolved in batches and kept in memory"""
+
+    def __init__(self):
+        self._entries: Dict[str, Dict[str, List[Dict]]] = {entity: {} for entity in ENTITIES}
+        self.queries = 0
+
+    def load(self, entity: str, names: Iterable[str]):
+        """Fetch the names not looked up yet with one query"""
+        known = self._entries[entity]
+        # Spellings as written; plain IN keeps the indexes usable, matching is case-insensitive below
+        missing = list(dict.fromkeys(n.strip() for n in names if n and n.strip().lower() not in known))
+        if not missing:
+            return
+
+        table, columns, match_columns = ENTITIES[entity]
+        params = {f"n{i}": name for i, name in enumerate(missing)}
+        placeholders = ", ".join(f":{p}" for p in params)
+        where = " OR ".join(f"{c} IN ({placeholders})" for c in match_columns)
+        for name in missing:
+            known[name.lower()] = []
+        with get_read_engine().connect() as conn:
+            for row in conn.execute(text(f"SELECT {columns} FROM {table} WHERE {where}"), params):
+                record = {"id": row[0], "name": row[1], "code": row[2], "price": row[3] or 0}
+                for key in {str(row[1] or "").lower(), str(row[2] or "").lower()}:
+                    if key in known:
+                        known[key].append(record)
+        self.queries += 1
+
+    def resolve(self, entity: str, name: str) -> Tuple[Optional[Dict], Optional[str]]:
+        """(record, None) or (None, error)"""
+        matches = self._entries[entity].get(name.strip().lower(), [])
+        # A code match beats a name match (a code can equal another row's name)
+        by_code = [m for m in matches if str(m["code"] or "").lower() == name.strip().lower()]
+        candidates = {m["id"]: m for m in (by_code or matches)}
+        label = entity.replace("_", " ")
+        if not candidates:
+            return None, f"unknown {label} '{name}'"
+        if len(candidates) > 1:
+            return None, f"ambiguous {label} '{name}' ({len(candidates)} matches)"
+        return next(iter(candidates.values())), None
+
+
+def create_import_refs_table(engine=None):
+    """Create po_import_refs if it doesn't exist"""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        conn.execute(text(REFS_DDL))
+        conn.commit()
+
+
+def iter_rows(source, fmt: Optional[str] = None) -> Iterator[Tuple[int, Dict]]:
+    """(row number, {column: value}) for each non-empty data row; source is a path or binary file"""
+    fmt = (fmt or os.path.splitext(str(getattr(source, "name", source)))[1].lstrip(".") or "csv").lower()
+    if fmt == "csv":
+        rows = _csv_rows(source)
+    elif fmt in ("xlsx", "xlsm"):
+        rows = _xlsx_rows(source)
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}' (use csv or xlsx)")
+
+    header = None
+    for number, values in rows:
+        if not any(v not in (None, "") for v in values):
+            continue
+        if header is None:
+            header = _map_header(values)
+            continue
+        yield number, {field: values[i] for field, i in header.items() if i < len(values)}
+
+
+def import_pos(source, fmt: Optional[str] = None, batch_size: int = IMPORT_BATCH_ROWS,
+               dry_run: bool = False) -> Dict:
+    """Import POs from a spreadsheet; returns counts, rows/sec and per-row errors"""
+    start = time.perf_counter()
+    create_import_refs_table()
+    index = MasterIndex()
+    # Tells a po_ref reused further down this file from one imported by an earlier run
+    import_id = uuid.uuid4().hex
+    report = {"rows": 0, "pos_created": 0, "pos_already_imported": 0, "po_numbers": [],
+              "error_count": 0, "errors": [], "dry_run": dry_run}
+    open_po = None
+
+    for batch in _batches(iter_rows(source, fmt), batch_size):
+        for entity in ENTITIES:
+            index.load(entity, (str(row.get(entity) or "") for _, row in batch))
+
+        completed = []
+        for number, row in batch:
+            report["rows"] += 1
+            key = _group_key(row)
+            if open_po is not None and open_po["key"] != key:
+                completed.append(open_po)
+                open_po = None
+            if open_po is None:
+                ref = str(row.get("po_ref") or "").strip() or None
+                open_po = {"key": key, "ref": ref, "rows": [], "header": None, "items": [], "errors": []}
+            _add_row(open_po, number, row, index)
+
+        _write(completed, report, dry_run, import_id)
+        elapsed = time.perf_counter() - start
+        print(f"[IMPORT] {report['rows']} rows, {report['pos_created']} POs, {report['error_count']} errors "
+              f"({report['rows'] / elapsed:.0f} rows/s)")
+
+    if open_po is not None:
+        _write([open_po], report, dry_run, import_id)
+
+    elapsed = time.perf_counter() - start
+    report["seconds"] = round(elapsed, 2)
+    report["rows_per_sec"] = round(report["rows"] / elapsed, 1) if elapsed else 0.0
+    report["lookup_queries"] = index.queries
+    return report
+
+
+def _csv_rows(source) -> Iterator[Tuple[int, List]]:
+    if isinstance(source, (str, os.PathLike)):
+        f = open(source, newline="", encoding="utf-8-sig")
+    else:
+        f = io.TextIOWrapper(source, newline="", encoding="utf-8-sig")
+    with f:
+        reader = csv.reader(f)
+        for values in reader:
+            yield reader.line_num, [v.strip() for v in values]
+
+
+def _xlsx_rows(source) -> Iterator[Tuple[int, List]]:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX import needs openpyxl (pip install openpyxl)")
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
+    try:
+        for number, values in enumerate(workbook.active.iter_rows(values_only=True), start=1):
+            yield number, [v.strip() if isinstance(v, str) else v for v in values]
+    finally:
+        workbook.close()
+
+
+def _map_header(values: List) -> Dict[str, int]:
+    header = {}
+    for i, value in enumerate(values):
+        name = str(value or "").strip().lower().replace(" ", "_").replace("-", "_")
+        field = next((f for f, aliases in COLUMNS.items() if name in aliases), None)
+        if field and field not in header:
+            header[field] = i
+    missing = [f for f in REQUIRED if f not in header]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+    return header
+
+
+def _batches(rows: Iterator, size: int) -> Iterator[List]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _group_key(row: Dict):
+    if row.get("po_ref") not in (None, ""):
+        return ("ref", str(row["po_ref"]).strip())
+    return tuple(str(row.get(f) or "").strip().lower() for f in HEADER_FIELDS)
+
+
+def _add_row(po: Dict, number: int, row: Dict, index: MasterIndex):
+    po["rows"].append(number)
+    errors = []
+
+    resolved = {}
+    for entity in ENTITIES:
+        value = str(row.get(entity) or "").strip()
+        if not value:
+            errors.append(f"{entity.replace('_', ' ')} is empty")
+            continue
+        resolved[entity], error = index.resolve(entity, value)
+        if error:
+            errors.append(error)
+
+    quantity = _number(row.get("quantity"))
+    if quantity is None or quantity <= 0:
+        errors.append(f"invalid quantity '{row.get('quantity')}'")
+    price = _number(row.get("price"))
+    if row.get("price") not in (None, "") and (price is None or price < 0):
+        errors.append(f"invalid price '{row.get('price')}'")
+    elif price is None and resolved.get("material"):
+        price = resolved["material"]["price"]
+        if not price:
+            errors.append("no price given and the material has none")
+
+    try:
+        po_date = _parse_date(row.get("po_date")) or date.today()
+        validity_date = _parse_date(row.get("validity_date")) or po_date + timedelta(days=30)
+    except ValueError as e:
+        errors.append(str(e))
+        po_date = validity_date = None
+
+    if not errors:
+        header = {
+            "supplier": resolved["supplier"]["id"],
+            "plant": resolved["plant"]["id"],
+            "purchase_org": resolved["purchase_org"]["id"],
+            "purchase_group": resolved["purchase_group"]["id"],
+            "currency": str(row.get("currency") or "INR").strip().upper(),
+            "po_type": str(row.get("po_type") or "Standard").strip(),
+            "po_date": po_date,
+            "validity_date": validity_date,
+        }
+        if po["header"] is None:
+            po["header"] = dict(header, resolved=resolved)
+        else:
+            differing = [k.replace("_", " ") for k, v in header.items() if po["header"][k] != v]
+            if differing:
+                errors.append(f"{', '.join(differing)} differ from the first row of this PO")
+
+    if errors:
+        po["errors"].append((number, "; ".join(errors)))
+        return
+    po["items"].append({"material": resolved["material"], "quantity": quantity, "price": price,
+                        "total": quantity * price})
+
+
+def _write(pos: List[Dict], report: Dict, dry_run: bool, import_id: str):
+    valid = []
+    for po in pos:
+        if po["errors"]:
+            failed = {number for number, _ in po["errors"]}
+            for number, error in po["errors"]:
+                _error(report, number, error)
+            for number in po["rows"]:
+                if number not in failed:
+                    _error(report, number, f"PO skipped: row {po['errors'][0][0]} of the same PO is invalid")
+        else:
+            valid.append(po)
+    if not valid:
+        return
+
+    valid = _skip_imported(valid, report, import_id)
+    if not valid:
+        return
+    if dry_run:
+        report["pos_created"] += len(valid)
+        return
+
+    error = None
+    for _ in range(IMPORT_INSERT_ATTEMPTS):
+        po_numbers = _free_po_numbers(len(valid))
+        try:
+            POTools.create_independent_pos([_po_data(po) for po in valid], po_numbers,
+                                           [po["ref"] for po in valid], import_id)
+        except IntegrityError as e:
+            # A concurrent insert took one of the numbers (or imported the same po_ref) first
+            error = e
+            valid = _skip_imported(valid, report, import_id)
+            if not valid:
+                return
+            continue
+        except Exception as e:
+            error = e
+            break
+        report["pos_created"] += len(po_numbers)
+        report["po_numbers"].extend(po_numbers[:max(IMPORT_MAX_PO_NUMBERS - len(report["po_numbers"]), 0)])
+        return
+
+    print(f"[ERROR] PO import batch insert failed: {error}")
+    for po in valid:
+        for number in po["rows"]:
+            _error(report, number, f"insert failed: {error}")
+
+
+def _skip_imported(pos: List[Dict], report: Dict, import_id: str) -> List[Dict]:
+    """Drop POs whose po_ref an earlier import created; a po_ref reused later in this file is an error"""
+    refs = [po["ref"] for po in pos if po["ref"]]
+    if not refs:
+        return pos
+    params = {f"r{i}": ref for i, ref in enumerate(dict.fromkeys(refs))}
+    placeholders = ", ".join(f":{p}" for p in params)
+    # Primary, not a replica: a lagging replica would miss the batch just written
+    with get_engine().connect() as conn:
+        imported = dict(conn.execute(
+            text(f"SELECT po_ref, import_id FROM po_import_refs WHERE po_ref IN ({placeholders})"), params
+        ).fetchall())
+
+    kept, seen = [], set()
+    for po in pos:
+        if po["ref"] in imported and imported[po["ref"]] != import_id:
+            report["pos_already_imported"] += 1
+        elif po["ref"] in imported or po["ref"] in seen:
+            for number in po["rows"]:
+                _error(report, number, f"po_ref '{po['ref']}' is also used by earlier rows that are not next to these")
+        else:
+            if po["ref"]:
+                seen.add(po["ref"])
+            kept.append(po)
+    return kept
+
+
+def _free_po_numbers(count: int) -> List[str]:
+    """Random PO numbers that are not in independent_purchase_orders yet"""
+    numbers = set()
+    while len(numbers) < count:
+        candidates = {f"IND-PO-{n}" for n in random.sample(PO_NUMBER_RANGE, count - len(numbers))} - numbers
+        params = {f"n{i}": number for i, number in enumerate(candidates)}
+        placeholders = ", ".join(f":{p}" for p in params)
+        with get_engine().connect() as conn:
+            taken = {row[0] for row in conn.execute(
+                text(f"SELECT po_number FROM independent_purchase_orders WHERE po_number IN ({placeholders})"), params
+            )}
+        numbers |= candidates - taken
+    return list(numbers)
+
+
+def _po_data(po: Dict) -> Dict:
+    header, resolved = po["header"], po["header"]["resolved"]
+    return {
+        "po_date": header["po_date"].isoformat(),
+        "validity_date": header["validity_date"].isoformat(),
+        "po_type": header["po_type"],
+        "supplier_id": resolved["supplier"]["id"],
+        "supplier_name": resolved["supplier"]["name"],
+        "currency": header["currency"],
+        "purchase_org_id": resolved["purchase_org"]["id"],
+        "purchase_org_code": resolved["purchase_org"]["code"],
+        "plant_id": resolved["plant"]["id"],
+        "plant_code": resolved["plant"]["code"],
+        "purchase_group_id": resolved["purchase_group"]["id"],
+        "purchase_group_code": resolved["purchase_group"]["code"],
+        "line_items": po["items"],
+        "total_amount": sum(i["total"] for i in po["items"]),
+    }
+
+
+def _error(report: Dict, number: int, error: str):
+    report["error_count"] += 1
+    if len(report["errors"]) < IMPORT_MAX_ERRORS:
+        report["errors"].append({"row": number, "error": error})
+
+
+def _number(value) -> Optional[float]:
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(str(value).replace(",", "").strip())
+    except ValueError:
+        return None
+
+
+def _parse_date(value) -> Optional[date]:
+    if value in (None, ""):
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in ("%Y-%m-%d", "%d-%m-%Y", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"invalid date '{value}' (use YYYY-MM-DD)")
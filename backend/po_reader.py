@@ -0,0 +1,102 @@
+"""
+PO lookups by number: batched, with parsed line items, cached when final
+
+get_many() fetches any number of POs with one IN query. Header columns and
+line items (parsed into flat rows) come back together. Only draft POs can
+still change, so every other PO is kept in an LRU cache by PO number and
+served from memory on later lookups.
+"""
+import copy
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional
+
+from backend.database import get_read_engine, text
+from backend.line_items import stored_line_items
+
+PO_CACHE_SIZE = int(os.getenv("PO_CACHE_SIZE", "1024"))
+MUTABLE_STATUSES = {"draft"}
+
+COLUMNS = [
+    "po_number", "po_date", "validity_date", "po_type", "status",
+    "supplier_id", "supplier_name", "currency",
+    "plant_id", "plant_code", "purchase_org_id", "purchase_org_code",
+    "purchase_group_id", "purchase_group_code", "total_amount", "remarks", "created_at",
+]
+
+
+class POReader:
+    """Batched PO reads with an LRU cache of non-draft POs"""
+
+    def __init__(self, cache_size: int = PO_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, po_number: str) -> Optional[Dict]:
+        return self.get_many([po_number]).get(po_number.strip().upper())
+
+    def get_many(self, po_numbers: Iterable[str]) -> Dict[str, Optional[Dict]]:
+        """{PO number: PO or None if it doesn't exist}, in the order asked"""
+        numbers = list(dict.fromkeys(n.strip().upper() for n in po_numbers if n and n.strip()))
+        found: Dict[str, Optional[Dict]] = {}
+        with self._lock:
+            for number in numbers:
+                if number in self._cache:
+                    self._cache.move_to_end(number)
+                    found[number] = self._cache[number]
+            self.hits += len(found)
+            self.misses += len(numbers) - len(found)
+
+        missing = [n for n in numbers if n not in found]
+        if missing:
+            fetched = self._fetch(missing)
+            with self._lock:
+                for number, po in fetched.items():
+                    if str(po.get("status") or "").lower() not in MUTABLE_STATUSES:
+                        self._cache[number] = po
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            found.update(fetched)
+
+        # Copies, so callers can't change what is cached
+        return {n: copy.deepcopy(found.get(n)) for n in numbers}
+
+    def invalidate(self, po_number: str):
+        with self._lock:
+            self._cache.pop(po_number.strip().upper(), None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"cached": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+    @staticmethod
+    def _fetch(numbers: List[str]) -> Dict[str, Dict]:
+        params = {f"n{i}": n for i, n in enumerate(numbers)}
+        query = f"""
+        SELECT {', '.join(COLUMNS)}, line_items
+        FROM independent_purchase_orders
+        WHERE po_number IN ({', '.join(':' + p for p in params)})
+        """
+        # Served by the primary if any of these POs was only just created
+        with get_read_engine(keys=numbers).connect() as conn:
+            pos = {}
+            for row in conn.execute(text(query), params):
+                po = dict(row._mapping)
+                po["line_items"] = stored_line_items(po["line_items"])
+                pos[str(po["po_number"]).upper()] = po
+            return pos
+
+
+# Singleton instance
+_po_reader = None
+
+def get_po_reader() -> POReader:
+    """Get or create the PO reader singleton"""
+    global _po_reader
+    if _po_reader is None:
+        _po_reader = POReader()
+    return _po_reader
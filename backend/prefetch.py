@@ -0,0 +1,199 @@
+"""
+Speculative prefetch of the option lists for the next PO steps
+
+The POAgent step graph is fixed, so once a step is done we know which
+lists the UI will ask for next (after the supplier: currency, plant,
+purchase org). after_transition() loads the lists of the next
+PREFETCH_DEPTH list steps in background threads into a per-conversation
+cache; get() then returns them without touching the DB, waits for a load
+that is still running, or loads synchronously if nothing was prefetched.
+
+The lists shown before the user types are the same for every conversation,
+so one load per step is shared by all of them; warm() fills these at
+process start (backend/warmup.py).
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "true").lower() == "true"
+PREFETCH_DEPTH = int(os.getenv("PREFETCH_DEPTH", "3"))
+PREFETCH_WORKERS = int(os.getenv("PREFETCH_WORKERS", "4"))
+PREFETCH_TTL_SECONDS = int(os.getenv("PREFETCH_TTL_SECONDS", "300"))
+PREFETCH_MAX_SESSIONS = int(os.getenv("PREFETCH_MAX_SESSIONS", "256"))
+
+# Happy path through POAgent (optional fields are usually skipped, items loop back)
+NEXT_STEP = {
+    "start": "header_supplier",
+    "header_supplier": "header_type",
+    "header_type": "header_currency",
+    "accept_defaults": "optional_fields",
+    "header_currency": "org_plant",
+    "org_plant": "org_purch_org",
+    "org_purch_org": "org_purch_group",
+    "org_purch_group": "optional_fields",
+    "optional_fields": "item_material",
+    "optional_project": "optional_payment",
+    "optional_payment": "optional_inco",
+    "optional_inco": "item_material",
+    "item_material": "item_qty",
+    "item_resolve": "item_qty",
+    "item_qty": "item_price",
+    "item_price": "add_more_check",
+    "add_more_check": "item_material",
+    "remarks": "confirm",
+}
+
+
+def _loaders() -> Dict[str, Callable[[], List[Dict]]]:
+    """Option list per step, as shown before the user types anything"""
+    from backend.tools import POTools
+
+    return {
+        "header_supplier": lambda: POTools.search_suppliers(""),
+        "header_currency": POTools.get_currencies,
+        "org_plant": lambda: POTools.search_plants(""),
+        "org_purch_org": lambda: POTools.search_purchase_orgs(""),
+        "org_purch_group": lambda: POTools.search_purchase_groups(""),
+        "item_material": lambda: POTools.search_materials(""),
+    }
+
+
+LIST_STEPS = ("header_supplier", "header_currency", "org_plant", "org_purch_org", "org_purch_group", "item_material")
+
+
+def upcoming_steps(step: str, depth: int = PREFETCH_DEPTH) -> List[str]:
+    """The next `depth` steps after `step` that show an option list"""
+    steps, seen = [], {step}
+    current = NEXT_STEP.get(step)
+    while current and current not in seen and len(steps) < depth:
+        seen.add(current)
+        if current in LIST_STEPS:
+            steps.append(current)
+        current = NEXT_STEP.get(current)
+    return steps
+
+
+class OptionPrefetcher:
+    """Per-conversation cache of option lists, filled ahead of the user"""
+
+    def __init__(self, depth: int = PREFETCH_DEPTH, ttl: int = PREFETCH_TTL_SECONDS,
+                 max_sessions: int = PREFETCH_MAX_SESSIONS):
+        self.depth = depth
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # conversation id -> {step: (loaded at, future)}
+        self._sessions: "OrderedDict[str, Dict[str, tuple]]" = OrderedDict()
+        # step -> (loaded at, future), the entry every conversation starts from
+        self._shared: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._loaders: Optional[Dict[str, Callable]] = None
+        self.hits = 0
+        self.waits = 0
+        self.misses = 0
+
+    def after_transition(self, session_id: str, step: str):
+        """Start loading the lists of `step` and the steps after it (skips what is cached)"""
+        if not PREFETCH_ENABLED:
+            return
+        steps = ([step] if step in LIST_STEPS else []) + upcoming_steps(step, self.depth)
+        with self._lock:
+            cache = self._session(session_id)
+            for name in steps:
+                if not self._fresh(cache.get(name)):
+                    cache[name] = self._shared_entry(name)
+
+    def warm(self, steps=LIST_STEPS):
+        """Load the shared lists now (blocks; raises if a load fails)"""
+        with self._lock:
+            futures = [self._shared_entry(name)[1] for name in steps]
+        for future in futures:
+            future.result()
+
+    def get(self, session_id: str, step: str) -> List[Dict]:
+        """Option list for `step`: prefetched if possible, loaded now otherwise"""
+        with self._lock:
+            entry = self._session(session_id).get(step)
+            if not self._fresh(entry):
+                entry = self._shared.get(step)
+            if not self._fresh(entry):
+                entry = None
+            elif entry[1].done():
+                self.hits += 1
+            else:
+                self.waits += 1
+            if entry is None:
+                self.misses += 1
+
+        if entry is not None:
+            try:
+                return entry[1].result()
+            except Exception as e:
+                print(f"[WARN] Prefetch of {step} failed: {e}")
+
+        options = (self._loaders or _loaders())[step]()
+        with self._lock:
+            done = Future()
+            done.set_result(options)
+            self._session(session_id)[step] = self._shared[step] = (time.monotonic(), done)
+        return options
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            served = self.hits + self.waits + self.misses
+            return {
+                "sessions": len(self._sessions),
+                "hits": self.hits,
+                "waits": self.waits,
+                "misses": self.misses,
+                # Share of option lists served without any blocking I/O
+                "hit_rate": round(self.hits / served, 3) if served else None,
+            }
+
+    def _shared_entry(self, step: str) -> tuple:
+        """Caller holds the lock; starts a load unless a fresh one exists"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=PREFETCH_WORKERS, thread_name_prefix="prefetch")
+            self._loaders = _loaders()
+        if not self._fresh(self._shared.get(step)):
+            self._shared[step] = (time.monotonic(), self._executor.submit(self._loaders[step]))
+        return self._shared[step]
+
+    def _session(self, session_id: str) -> Dict[str, tuple]:
+        """Caller holds the lock"""
+        cache = self._sessions.get(session_id)
+        if cache is None:
+            cache = self._sessions[session_id] = {}
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        else:
+            self._sessions.move_to_end(session_id)
+        return cache
+
+    def _fresh(self, entry: Optional[tuple]) -> bool:
+        if entry is None:
+            return False
+        loaded_at, future = entry
+        # A failed (or empty, the tools return [] on DB errors) load is retried on the next transition
+        if future.done() and (future.exception() is not None or not future.result()):
+            return False
+        return time.monotonic() - loaded_at < self.ttl
+
+
+# Singleton instance
+_prefetcher = None
+
+def get_prefetcher() -> OptionPrefetcher:
+    """Get or create the option prefetcher singleton"""
+    global _prefetcher
+    if _prefetcher is None:
+        _prefetcher = OptionPrefetcher()
+    return _prefetcher
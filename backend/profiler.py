@@ -0,0 +1,201 @@
+"""
+On-demand sampling profiler for single turns
+
+A TurnProfiler samples the stack of the thread running a turn (Streamlit
+script run or API turn) every PROFILE_INTERVAL_MS from a background thread
+and, when stopped, writes the stacks in collapsed ("folded") format, the
+input of flamegraph.pl, speedscope and inferno:
+
+    PROFILE_DIR/<step>/<time>_<conversation>_<kind>.folded
+
+so all turns answered at one conversation step sit together. Each line is
+"frame;frame;...;leaf <microseconds>". With PROFILE_MODE=cpu (default,
+Linux/macOS) a sample is weighted by the CPU time the thread used since the
+previous one, so waits on Bedrock or MySQL drop out; PROFILE_MODE=wall
+weights by elapsed time instead. profile_report.py summarizes the files per
+step and per module.
+
+Profiling is off unless PROFILE_TURNS is true (every turn) or
+PROFILE_ON_REQUEST is true and the session/request asks for it. Both are
+operator settings: while any profile runs, the whole process switches
+threads more often, which slows every other session on the worker.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROFILE_TURNS = os.getenv("PROFILE_TURNS", "false").lower() == "true"
+# Honour the sidebar toggle, ?profile=1 and the API's "profile": true
+PROFILE_ON_REQUEST = os.getenv("PROFILE_ON_REQUEST", "false").lower() == "true"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "1"))
+PROFILE_MODE = os.getenv("PROFILE_MODE", "cpu").lower()
+# A run that dies before stop() must not sample the thread forever
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+PROFILE_MAX_DEPTH = 200
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__))) + os.sep
+_frame_names = {}
+# The sampler needs the GIL to look at the other thread; while any profile
+# runs, threads switch at the sampling interval instead of every 5 ms
+_active_lock = threading.Lock()
+_active = 0
+_switch_interval = None
+
+
+def _profiling_started(interval: float):
+    global _active, _switch_interval
+    with _active_lock:
+        if _active == 0:
+            _switch_interval = sys.getswitchinterval()
+            sys.setswitchinterval(min(_switch_interval, interval / 2))
+        _active += 1
+
+
+def _profiling_stopped():
+    global _active
+    with _active_lock:
+        _active -= 1
+        if _active == 0:
+            sys.setswitchinterval(_switch_interval)
+
+
+def _frame_name(code) -> str:
+    """path:function, the path relative to the repo, site-packages or the stdlib"""
+    name = _frame_names.get(code)
+    if name is None:
+        path = code.co_filename
+        if path.startswith(REPO_ROOT) and "site-packages" not in path:
+            path = path[len(REPO_ROOT):]
+        elif "site-packages" + os.sep in path:
+            path = path.split("site-packages" + os.sep, 1)[1]
+        elif os.sep + "lib" + os.sep in path:
+            # Standard library: package-relative ("json/decoder.py")
+            path = path.rsplit(os.sep + "lib" + os.sep, 1)[1].split(os.sep, 1)[-1]
+        name = f"{path}:{code.co_name}".replace(";", ":").replace(" ", "_")
+        _frame_names[code] = name
+    return name
+
+
+def _cpu_clock(thread_id: int):
+    """CPU-time clock of another thread, None where the platform has none"""
+    try:
+        clock = time.pthread_getcpuclockid(thread_id)
+        time.clock_gettime(clock)
+        return lambda: time.clock_gettime(clock)
+    except (AttributeError, OSError):
+        return None
+
+
+class TurnProfiler:
+    """Samples one thread's stack until stop(), then writes a folded profile"""
+
+    def __init__(self, app: str, conversation_id: str, step: Optional[str] = None,
+                 interval_ms: float = PROFILE_INTERVAL_MS, mode: str = PROFILE_MODE):
+        self.app = app
+        self.conversation_id = conversation_id or "-"
+        self.step = step
+        self.interval = interval_ms / 1000
+        self.thread_id = threading.get_ident()
+        self.cpu = _cpu_clock(self.thread_id) if mode == "cpu" else None
+        if mode == "cpu" and self.cpu is None:
+            print("[WARN] No per-thread CPU clock, profiling wall time")
+        self.samples: Counter = Counter()
+        self.started = time.perf_counter()
+        self.path: Optional[str] = None
+        self._stop = threading.Event()
+        self._sampler = threading.Thread(target=self._run, name="turn-profiler", daemon=True)
+        _profiling_started(self.interval)
+        self._sampler.start()
+
+    def set_step(self, step: Optional[str]):
+        self.step = step
+
+    def _run(self):
+        # Restores the switch interval however sampling ends, stop() called or not
+        try:
+            clock = self.cpu or time.perf_counter
+            last = clock()
+            while not self._stop.wait(self.interval):
+                if time.perf_counter() - self.started > PROFILE_MAX_SECONDS:
+                    break
+                frame = sys._current_frames().get(self.thread_id)
+                now = clock()
+                if self._stop.is_set():
+                    break
+                weight, last = int((now - last) * 1e6), now
+                if frame is None or weight <= 0:
+                    continue
+                stack = []
+                while frame is not None and len(stack) < PROFILE_MAX_DEPTH:
+                    stack.append(_frame_name(frame.f_code))
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += weight
+        finally:
+            _profiling_stopped()
+
+    def stop(self, kind: str = "turn") -> Optional[str]:
+        """Stop sampling and write the profile; returns its path (None if nothing was sampled)"""
+        if self._stop.is_set():
+            return self.path
+        self._stop.set()
+        self._sampler.join()
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        if not self.samples:
+            return None
+
+        step = self.step or "unknown"
+        directory = os.path.join(PROFILE_DIR, step)
+        name = f"{datetime.now():%Y%m%d-%H%M%S-%f}_{self.conversation_id[:12]}_{kind}.folded"
+        self.path = os.path.join(directory, name)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                for stack, weight in self.samples.most_common():
+                    f.write(f"{self.app};{kind};{stack} {weight}\n")
+        except OSError as e:
+            print(f"[WARN] Profile not written to {self.path}: {e}")
+            self.path = None
+            return None
+        sampled_ms = sum(self.samples.values()) / 1000
+        print(f"[PROFILE] {self.app} {step} {kind}: {sampled_ms:.0f}ms "
+              f"{'CPU' if self.cpu else 'wall'} of {elapsed_ms:.0f}ms -> {self.path}")
+        return self.path
+
+
+class _NoopProfiler:
+    path = None
+
+    def set_step(self, step):
+        pass
+
+    def stop(self, kind: str = "turn"):
+        return None
+
+
+NOOP_PROFILER = _NoopProfiler()
+
+
+def start_profile(app: str, conversation_id: str, step: Optional[str] = None, enabled: bool = False):
+    """Profile the calling thread with PROFILE_TURNS, or if requested and PROFILE_ON_REQUEST allows it"""
+    if not (PROFILE_TURNS or (enabled and PROFILE_ON_REQUEST)):
+        return NOOP_PROFILER
+    return TurnProfiler(app, conversation_id, step)
+
+
+@contextmanager
+def profile_turn(app: str, conversation_id: str, step: Optional[str] = None, enabled: bool = False):
+    profiler = start_profile(app, conversation_id, step, enabled)
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
@@ -0,0 +1,315 @@
+"""
+Per-statement statistics and slow-query log from SQLAlchemy cursor events
+
+backend.database attaches these listeners to every engine it creates.
+Statements are normalized (literals and bind placeholders become ?, IN
+lists collapse) and fingerprinted, so "supplier_name LIKE '%Avi%'" and
+"... LIKE '%Steel%'" count as one statement. Per fingerprint we keep call
+count, total/mean/max latency, rows (where the driver reports them) and
+errors, split by source: "app" (POTools and other static SQL) or
+"generated" (LLM SQL run through the SQL guard).
+
+Statements slower than SLOW_QUERY_MS go to the slow-query log (kept in
+memory, printed, and appended to SLOW_QUERY_LOG if set) with bind values
+redacted to their types. query_stats() / slow_queries() /
+index_candidates() expose the data; QUERY_STATS_DIR makes each process
+write a snapshot there for query_stats.py to merge.
+"""
+import atexit
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+QUERY_STATS_ENABLED = os.getenv("QUERY_STATS_ENABLED", "true").lower() == "true"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_LOG = os.getenv("SLOW_QUERY_LOG", "")
+SLOW_QUERY_KEEP = int(os.getenv("SLOW_QUERY_KEEP", "200"))
+QUERY_STATS_DIR = os.getenv("QUERY_STATS_DIR", "")
+QUERY_STATS_FLUSH_SECONDS = float(os.getenv("QUERY_STATS_FLUSH_SECONDS", "60"))
+
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+NUMBER_LITERAL = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b")
+PLACEHOLDER = re.compile(r"%\(\w+\)s|%s|\?|(?<![:\w]):\w+")
+VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+ROW_LIST = re.compile(r"(\(\?\+\))(?:\s*,\s*\(\?\+\))+")
+
+# Filter / sort columns, for index candidates
+FROM_TABLE = re.compile(r"\bFROM\s+`?(\w+)`?", re.IGNORECASE)
+JOIN = re.compile(r"\bJOIN\b", re.IGNORECASE)
+WHERE_CLAUSE = re.compile(r"\bWHERE\b(.*?)(?:\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\)\s*AS\b|$)", re.IGNORECASE | re.DOTALL)
+ORDER_CLAUSE = re.compile(r"\bORDER\s+BY\b(.*?)(?:\bLIMIT\b|\)|$)", re.IGNORECASE | re.DOTALL)
+PREDICATE_COLUMN = re.compile(r"`?(\w+)`?\s*(?:=|<=|>=|<|>|\bLIKE\b|\bIN\b|\bBETWEEN\b)", re.IGNORECASE)
+SQL_WORDS = {"and", "or", "not", "is", "null", "asc", "desc", "select", "where", "case", "when", "then", "else"}
+
+_source: ContextVar[str] = ContextVar("query_source", default="app")
+_lock = threading.Lock()
+_stats: Dict[tuple, Dict] = {}
+_slow = deque(maxlen=SLOW_QUERY_KEEP)
+_normalized: "OrderedDict[str, tuple]" = OrderedDict()
+_flusher = None
+
+
+@contextmanager
+def query_source(source: str):
+    """Label the statements run inside the block (e.g. "generated")"""
+    token = _source.set(source)
+    try:
+        yield
+    finally:
+        _source.reset(token)
+
+
+def normalize(statement: str) -> tuple:
+    """(normalized statement, fingerprint); cached, static SQL repeats verbatim"""
+    with _lock:
+        cached = _normalized.get(statement)
+        if cached is not None:
+            _normalized.move_to_end(statement)
+            return cached
+
+    normalized = STRING_LITERAL.sub("?", statement)
+    normalized = NUMBER_LITERAL.sub("?", normalized)
+    normalized = PLACEHOLDER.sub("?", normalized)
+    normalized = " ".join(normalized.split())
+    normalized = VALUE_LIST.sub("(?+)", normalized)
+    normalized = ROW_LIST.sub(r"\1, ...", normalized)
+    result = (normalized, hashlib.sha1(normalized.lower().encode("utf-8")).hexdigest()[:12])
+
+    with _lock:
+        _normalized[statement] = result
+        while len(_normalized) > 2048:
+            _normalized.popitem(last=False)
+    return result
+
+
+def attach(engine):
+    """Collect stats for every statement the engine runs"""
+    if not QUERY_STATS_ENABLED:
+        return
+    from sqlalchemy import event
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._query_stats_start = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_query_stats_start", None)
+        if start is not None:
+            record(statement, parameters, (time.perf_counter() - start) * 1000, cursor.rowcount, executemany)
+
+    def failed(exception_context):
+        start = getattr(exception_context.execution_context, "_query_stats_start", None)
+        if start is not None:
+            record(exception_context.statement, exception_context.parameters,
+                   (time.perf_counter() - start) * 1000, -1, False, error=exception_context.original_exception)
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    event.listen(engine, "handle_error", failed)
+    _start_flusher()
+
+
+def record(statement: str, parameters, elapsed_ms: float, rowcount: int, executemany: bool,
+           error: Optional[BaseException] = None):
+    normalized, fingerprint = normalize(str(statement or ""))
+    source = _source.get()
+    now = time.time()
+    with _lock:
+        stats = _stats.get((fingerprint, source))
+        if stats is None:
+            stats = _stats[(fingerprint, source)] = {
+                "fingerprint": fingerprint, "source": source, "statement": normalized[:2000],
+                "calls": 0, "total_ms": 0.0, "max_ms": 0.0, "rows": 0, "rows_known": 0, "errors": 0,
+                "slow": 0, "first_seen": now, "last_seen": now,
+            }
+        stats["calls"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+        stats["last_seen"] = now
+        # SELECT row counts depend on the driver (pymysql reports them, sqlite doesn't)
+        if rowcount is not None and rowcount >= 0:
+            stats["rows"] += rowcount
+            stats["rows_known"] += 1
+        if error is not None:
+            stats["errors"] += 1
+        slow = elapsed_ms >= SLOW_QUERY_MS
+        if slow:
+            stats["slow"] += 1
+
+    if slow:
+        _log_slow({
+            "at": datetime.fromtimestamp(now).isoformat(timespec="seconds"),
+            "ms": round(elapsed_ms, 1),
+            "fingerprint": fingerprint,
+            "source": source,
+            "statement": normalized[:2000],
+            "params": _redact(parameters, executemany),
+            "rows": rowcount if rowcount is not None and rowcount >= 0 else None,
+            "error": str(error)[:300] if error else None,
+        })
+
+
+def _redact(parameters, executemany: bool):
+    """Bind values replaced by their type (and length for strings)"""
+    def one(value):
+        if isinstance(value, str):
+            return f"<str:{len(value)}>"
+        return f"<{type(value).__name__}>"
+
+    if executemany and isinstance(parameters, (list, tuple)):
+        return {"rows": len(parameters), "first": _redact(parameters[0], False) if parameters else None}
+    if isinstance(parameters, dict):
+        return {k: one(v) for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [one(v) for v in parameters]
+    return None
+
+
+def _log_slow(entry: Dict):
+    with _lock:
+        _slow.append(entry)
+    print(f"[SLOW QUERY] {entry['ms']}ms ({entry['source']}) {entry['statement'][:200]}")
+    if SLOW_QUERY_LOG:
+        try:
+            with open(SLOW_QUERY_LOG, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"[WARN] Slow query not written to {SLOW_QUERY_LOG}: {e}")
+
+
+def query_stats(sort: str = "total_ms", limit: Optional[int] = None, source: Optional[str] = None) -> List[Dict]:
+    """Per-statement stats, slowest in total first"""
+    with _lock:
+        rows = [dict(s) for s in _stats.values() if source is None or s["source"] == source]
+    for row in rows:
+        _finish(row)
+    rows.sort(key=lambda r: r[sort], reverse=True)
+    return rows[:limit] if limit else rows
+
+
+def _finish(row: Dict) -> Dict:
+    row["total_ms"] = round(row["total_ms"], 2)
+    row["max_ms"] = round(row["max_ms"], 2)
+    row["mean_ms"] = round(row["total_ms"] / row["calls"], 2) if row["calls"] else 0.0
+    row["mean_rows"] = round(row["rows"] / row["rows_known"], 1) if row["rows_known"] else None
+    return row
+
+
+def slow_queries(limit: Optional[int] = None) -> List[Dict]:
+    """Most recent slow statements first"""
+    with _lock:
+        entries = list(reversed(_slow))
+    return entries[:limit] if limit else entries
+
+
+def index_candidates(stats: Optional[List[Dict]] = None, limit: int = 20) -> List[Dict]:
+    """Columns filtered or sorted on, per table, weighted by the time spent in those statements
+
+    A heuristic for single-table statements (joins are skipped); check the
+    suggestions with EXPLAIN before adding an index.
+    """
+    weights = defaultdict(lambda: {"total_ms": 0.0, "calls": 0, "fingerprints": set()})
+    for row in stats if stats is not None else query_stats():
+        statement = row["statement"]
+        tables = FROM_TABLE.findall(statement)
+        if len(set(tables)) != 1 or JOIN.search(statement):
+            continue
+        columns = []
+        where = WHERE_CLAUSE.search(statement)
+        if where:
+            columns += [c for c in PREDICATE_COLUMN.findall(where.group(1)) if c.lower() not in SQL_WORDS]
+        order = ORDER_CLAUSE.search(statement)
+        if order:
+            columns += [c.strip("`") for c in re.findall(r"`?(\w+)`?(?:\s+(?:ASC|DESC))?\s*(?:,|$)", order.group(1).strip(), re.IGNORECASE)
+                        if c.lower() not in SQL_WORDS]
+        columns = list(dict.fromkeys(columns))
+        if not columns or columns == ["?"]:
+            continue
+        key = (tables[0], tuple(columns))
+        weights[key]["total_ms"] += row["total_ms"]
+        weights[key]["calls"] += row["calls"]
+        weights[key]["fingerprints"].add(row["fingerprint"])
+
+    candidates = [
+        {"table": table, "columns": list(columns), "total_ms": round(w["total_ms"], 1), "calls": w["calls"],
+         "statements": len(w["fingerprints"])}
+        for (table, columns), w in weights.items()
+    ]
+    candidates.sort(key=lambda c: c["total_ms"], reverse=True)
+    return candidates[:limit]
+
+
+def snapshot() -> Dict:
+    return {"pid": os.getpid(), "at": time.time(), "stats": query_stats(), "slow": slow_queries()}
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+        _slow.clear()
+
+
+def merge_snapshots(snapshots: List[Dict]) -> Dict:
+    """Combine the stats of several processes (used by query_stats.py)"""
+    merged: Dict[tuple, Dict] = {}
+    slow = []
+    for snap in snapshots:
+        for row in snap.get("stats", []):
+            key = (row["fingerprint"], row["source"])
+            if key not in merged:
+                merged[key] = dict(row)
+                continue
+            target = merged[key]
+            for field in ("calls", "total_ms", "rows", "rows_known", "errors", "slow"):
+                target[field] += row[field]
+            target["max_ms"] = max(target["max_ms"], row["max_ms"])
+            target["first_seen"] = min(target["first_seen"], row["first_seen"])
+            target["last_seen"] = max(target["last_seen"], row["last_seen"])
+        slow.extend(snap.get("slow", []))
+    stats = [_finish(row) for row in merged.values()]
+    stats.sort(key=lambda r: r["total_ms"], reverse=True)
+    slow.sort(key=lambda e: e["at"], reverse=True)
+    return {"stats": stats, "slow": slow}
+
+
+def write_snapshot():
+    if not QUERY_STATS_DIR:
+        return
+    path = os.path.join(QUERY_STATS_DIR, f"query_stats_{os.getpid()}.json")
+    try:
+        os.makedirs(QUERY_STATS_DIR, exist_ok=True)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(snapshot(), f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        print(f"[WARN] Query stats not written to {path}: {e}")
+
+
+def _start_flusher():
+    """Snapshot to QUERY_STATS_DIR periodically and at exit (once per process)"""
+    global _flusher
+    if not QUERY_STATS_DIR:
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(QUERY_STATS_FLUSH_SECONDS)
+                write_snapshot()
+
+        _flusher = threading.Thread(target=loop, name="query-stats-flush", daemon=True)
+        _flusher.start()
+    atexit.register(write_snapshot)
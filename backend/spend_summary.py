@@ -0,0 +1,187 @@
+"""
+Pre-aggregated spend summaries of independent_purchase_orders
+
+Analytics questions ("total spend per supplier this quarter", "PO count per
+plant per month") are answered from two small tables instead of scanning
+and aggregating every PO:
+- po_spend_daily:   one row per day, supplier, plant, purchase org, currency
+- po_spend_monthly: the same keys per month ("YYYY-MM")
+
+Each PO insert adds itself to both tables (record_po), right after its own
+commit so a summary problem never blocks PO creation. backfill() rebuilds
+them from the PO table in batches, and also repairs any drift.
+"""
+import json
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Optional
+
+from backend.database import get_engine, text
+
+SUMMARY_TABLES = ("po_spend_daily", "po_spend_monthly")
+
+# Period column per table; the other keys are shared
+PERIODS = {"po_spend_daily": ("day", "DATE"), "po_spend_monthly": ("month", "CHAR(7)")}
+DIMENSIONS = ("supplier_id", "plant_id", "purchase_org_id", "currency")
+MEASURES = ("po_count", "line_item_count", "total_amount")
+
+SUMMARY_HINT = (
+    "po_spend_daily (day) and po_spend_monthly (month 'YYYY-MM') hold pre-aggregated PO spend per "
+    "supplier, plant, purchase org and currency (po_count, line_item_count, total_amount). Use them "
+    "(SUM over their rows) for totals, counts and trends instead of aggregating independent_purchase_orders."
+)
+
+DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    {period} {period_type} NOT NULL,
+    supplier_id VARCHAR(255) NOT NULL DEFAULT '',
+    supplier_name VARCHAR(255),
+    plant_id INT NOT NULL DEFAULT 0,
+    plant_code VARCHAR(50),
+    purchase_org_id INT NOT NULL DEFAULT 0,
+    purchase_org_code VARCHAR(50),
+    currency VARCHAR(10) NOT NULL DEFAULT '',
+    po_count INT NOT NULL DEFAULT 0,
+    line_item_count INT NOT NULL DEFAULT 0,
+    total_amount DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY ({period}, supplier_id, plant_id, purchase_org_id, currency)
+){comment}
+"""
+
+
+def create_summary_tables(engine=None):
+    """Create the summary tables if they don't exist"""
+    engine = engine or get_engine()
+    with engine.connect() as conn:
+        for table, (period, period_type) in PERIODS.items():
+            # MySQL keeps the hint in the DDL, where SQLDatabase's table info picks it up
+            comment = " COMMENT='{}'".format(SUMMARY_HINT.replace("'", "''")) if conn.dialect.name == "mysql" else ""
+            conn.execute(text(DDL.format(table=table, period=period, period_type=period_type, comment=comment)))
+        conn.commit()
+
+
+def record_po(po_data: Dict, engine=None):
+    """Add one newly inserted PO to the summaries (errors are logged, not raised)"""
+    record_pos([po_data], engine)
+
+
+def record_pos(pos: Iterable[Dict], engine=None):
+    """Add newly inserted POs to the summaries in one upsert per table"""
+    try:
+        rows = _aggregate(pos)
+        engine = engine or get_engine()
+        with engine.connect() as conn:
+            _upsert(conn, rows)
+            conn.commit()
+    except Exception as e:
+        print(f"[WARN] Spend summary not updated (run backfill_spend_summary.py): {e}")
+
+
+def backfill(since: Optional[str] = None, batch_size: int = 1000, engine=None) -> int:
+    """Rebuild the summaries from independent_purchase_orders, from `since` (YYYY-MM-DD) on
+
+    `since` is rounded down to the first of its month so monthly rows are
+    rebuilt whole. POs inserted while it runs can be counted twice; run it
+    when no POs are being created. Returns the number of POs read.
+    """
+    engine = engine or get_engine()
+    create_summary_tables(engine)
+    start = _parse_day(since).replace(day=1) if since else None
+
+    with engine.connect() as conn:
+        for table, (period, _) in PERIODS.items():
+            if start is None:
+                conn.execute(text(f"DELETE FROM {table}"))
+            else:
+                bound = start.isoformat() if period == "day" else start.strftime("%Y-%m")
+                conn.execute(text(f"DELETE FROM {table} WHERE {period} >= :bound"), {"bound": bound})
+        conn.commit()
+
+    # Keyset pagination over the PO table; each batch is folded in with an upsert
+    last_id, total = 0, 0
+    query = """
+    SELECT id, po_date, created_at, supplier_id, supplier_name, plant_id, plant_code,
+           purchase_org_id, purchase_org_code, currency, line_items, total_amount
+    FROM independent_purchase_orders
+    WHERE id > :last_id {date_filter}
+    ORDER BY id
+    LIMIT :batch_size
+    """.format(date_filter="AND COALESCE(po_date, DATE(created_at)) >= :start" if start else "")
+    while True:
+        params = {"last_id": last_id, "batch_size": batch_size}
+        if start:
+            params["start"] = start.isoformat()
+        with engine.connect() as conn:
+            batch = [dict(row._mapping) for row in conn.execute(text(query), params)]
+            if not batch:
+                break
+            _upsert(conn, _aggregate(batch))
+            conn.commit()
+        last_id = batch[-1]["id"]
+        total += len(batch)
+        print(f"[SPEND SUMMARY] {total} POs folded in (last id {last_id})")
+    return total
+
+
+def _aggregate(pos: Iterable[Dict]) -> Dict[str, Dict]:
+    """{table: {key: row}} summed over the given POs"""
+    rows = {table: defaultdict(lambda: dict.fromkeys(MEASURES, 0)) for table in PERIODS}
+    for po in pos:
+        day = _parse_day(po.get("po_date") or po.get("created_at"))
+        dims = (
+            str(po.get("supplier_id") or ""),
+            int(po.get("plant_id") or 0),
+            int(po.get("purchase_org_id") or 0),
+            str(po.get("currency") or ""),
+        )
+        line_items = po.get("line_items") or []
+        if isinstance(line_items, (str, bytes)):
+            try:
+                line_items = json.loads(line_items)
+            except ValueError:
+                line_items = []
+
+        for table, period_value in (("po_spend_daily", day.isoformat()), ("po_spend_monthly", day.strftime("%Y-%m"))):
+            row = rows[table][(period_value,) + dims]
+            row["po_count"] += 1
+            row["line_item_count"] += len(line_items)
+            row["total_amount"] += float(po.get("total_amount") or 0)
+            # Latest names/codes win; they are labels, not keys
+            row["supplier_name"] = po.get("supplier_name")
+            row["plant_code"] = po.get("plant_code")
+            row["purchase_org_code"] = po.get("purchase_org_code")
+    return rows
+
+
+def _upsert(conn, rows: Dict[str, Dict]):
+    for table, keyed in rows.items():
+        if not keyed:
+            continue
+        period = PERIODS[table][0]
+        columns = (period,) + DIMENSIONS + ("supplier_name", "plant_code", "purchase_org_code") + MEASURES
+        insert = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)})"
+        if conn.dialect.name == "mysql":
+            statement = insert + " ON DUPLICATE KEY UPDATE " + ", ".join(
+                [f"{m} = {m} + VALUES({m})" for m in MEASURES] +
+                [f"{c} = VALUES({c})" for c in ("supplier_name", "plant_code", "purchase_org_code")]
+            )
+        else:
+            statement = insert + f" ON CONFLICT ({', '.join((period,) + DIMENSIONS)}) DO UPDATE SET " + ", ".join(
+                [f"{m} = {table}.{m} + excluded.{m}" for m in MEASURES] +
+                [f"{c} = excluded.{c}" for c in ("supplier_name", "plant_code", "purchase_org_code")]
+            )
+        params = [
+            dict(zip((period,) + DIMENSIONS, key), **values)
+            for key, values in keyed.items()
+        ]
+        conn.execute(text(statement), params)
+
+
+def _parse_day(value) -> date:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if value:
+        return datetime.strptime(str(value)[:10], "%Y-%m-%d").date()
+    return date.today()
@@ -1,20 +1,22 @@
-import boto3
 import json
 import os
-from sqlalchemy import text
-from backend.database import engine
+from backend.database import get_read_engine, text
+from backend.llm import create_bedrock_client
+from backend.spend_summary import SUMMARY_HINT, SUMMARY_TABLES
+from backend.sql_guard import QueryRejected, get_sql_guard
 from typing import Optional
 
 class SQLAgent:
     def __init__(self):
-        self.bedrock = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=os.getenv('AWS_REGION', 'us-east-1'),
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_KEY')
-        )
+        self._bedrock = None
         self.model_id = os.getenv('CLAUDE_SONNET_MODEL_ID', 'anthropic.claude-3-5-sonnet-20240620-v1:0')
 
+    @property
+    def bedrock(self):
+        if self._bedrock is None:
+            self._bedrock = create_bedrock_client()
+        return self._bedrock
+
     def get_schema(self) -> str:
         """Get schema for relevant tables"""
         # We only expose safe tables for querying
@@ -24,12 +26,14 @@ class SQLAgent:
             "independent_purchase_orders",
             "purchase_organization",
             "purchase_groups",
-            "materials"
+            "materials",
+            "po_spend_daily",
+            "po_spend_monthly"
         ]
         
         schema_info = []
         try:
-            with engine.connect() as conn:
+            with get_read_engine().connect() as conn:
                 for t in tables:
                     try:
                         # Get columns
@@ -47,6 +51,8 @@ class SQLAgent:
         except Exception as e:
             print(f"[ERROR] get_schema: {e}")
             
+        if any(line.startswith(f"Table {t}:") for t in SUMMARY_TABLES for line in schema_info):
+            schema_info.append(f"Note: {SUMMARY_HINT}")
         return "\n".join(schema_info) if schema_info else "No tables available"
 
     def generate_query(self, question: str) -> Optional[str]:
@@ -104,33 +110,33 @@ class SQLAgent:
             return None
 
     def run_query(self, sql: str) -> str:
-        """Execute SQL query and return formatted string results"""
+        """Execute SQL query (through the cost guard) and return formatted string results"""
         try:
-            with engine.connect() as conn:
-                result = conn.execute(text(sql))
-                rows = [dict(row._mapping) for row in result]
-                
-                if not rows:
-                    return "No results found."
-                
-                # Format as a Markdown table
-                output = f"Found {len(rows)} results:\n\n"
-                
-                # Get headers from first row
-                headers = list(rows[0].keys())
-                
-                # Create Markdown table header
-                header_row = "| " + " | ".join(headers) + " |"
-                separator_row = "| " + " | ".join(["---"] * len(headers)) + " |"
-                output += f"{header_row}\n{separator_row}\n"
-                
-                # Create table body
-                for row in rows:
-                    row_values = [str(row.get(h, "")) for h in headers]
-                    output += "| " + " | ".join(row_values) + " |\n"
-                    
-                return output
+            rows, _ = get_sql_guard().execute(get_read_engine(), sql)
+            
+            if not rows:
+                return "No results found."
+            
+            # Format as a Markdown table
+            output = f"Found {len(rows)} results:\n\n"
+            
+            # Get headers from first row
+            headers = list(rows[0].keys())
+            
+            # Create Markdown table header
+            header_row = "| " + " | ".join(headers) + " |"
+            separator_row = "| " + " | ".join(["---"] * len(headers)) + " |"
+            output += f"{header_row}\n{separator_row}\n"
+            
+            # Create table body
+            for row in rows:
+                row_values = [str(row.get(h, "")) for h in headers]
+                output += "| " + " | ".join(row_values) + " |\n"
                 
+            return output
+            
+        except QueryRejected as e:
+            return f"Query not run: {e}. Try narrowing it down, e.g. by supplier, plant or date."
         except Exception as e:
             return f"Error executing query: {e}"
 
@@ -142,3 +148,14 @@ class SQLAgent:
         
         print(f"[DEBUG] Generated SQL: {sql}")
         return self.run_query(sql)
+
+
+# Singleton instance
+_sql_agent = None
+
+def get_sql_agent():
+    """Get or create the SQL agent singleton"""
+    global _sql_agent
+    if _sql_agent is None:
+        _sql_agent = SQLAgent()
+    return _sql_agent
@@ -0,0 +1,193 @@
+"""
+Cost guard for LLM-generated SQL
+
+Every generated statement goes through SQLGuard before it reaches MySQL:
+1. parse: single read-only statement (SELECT, or SHOW/DESCRIBE of a table;
+   no EXPLAIN, which would skip steps 2-4), no file/lock/sleep tricks
+2. enforce a LIMIT (added, or lowered to the configured maximum)
+3. EXPLAIN: reject when the estimated rows examined or a full scan of a
+   large table exceeds the budget (unless the LIMIT lets MySQL stop early)
+4. execute with a per-query MAX_EXECUTION_TIME
+
+Each decision is printed and, if SQL_GUARD_LOG is set, appended as JSONL
+with the estimated vs actual cost.
+"""
+import json
+import os
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from backend.database import text
+from backend.query_stats import query_source
+
+load_dotenv()
+
+STRING_LITERAL = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+LIMIT_CLAUSE = re.compile(r"\bLIMIT\s+(\d+)(?:\s*,\s*(\d+))?(?:\s+OFFSET\s+(\d+))?\s*$", re.IGNORECASE)
+FORBIDDEN = re.compile(
+    r"\bINTO\s+(?:OUTFILE|DUMPFILE)\b|\bSLEEP\s*\(|\bBENCHMARK\s*\(|\bFOR\s+UPDATE\b|\bLOCK\s+IN\s+SHARE\s+MODE\b",
+    re.IGNORECASE
+)
+# Clauses that force MySQL to read every matching row before the LIMIT applies
+BLOCKING_CLAUSES = re.compile(r"\bORDER\s+BY\b|\bGROUP\s+BY\b|\bDISTINCT\b|\bUNION\b|\b(?:COUNT|SUM|AVG|MIN|MAX)\s*\(", re.IGNORECASE)
+METADATA_STATEMENTS = ("show", "describe", "desc")
+# DESCRIBE/DESC of a table only; "DESC SELECT ..." is EXPLAIN (and EXPLAIN ANALYZE runs the query)
+DESCRIBE_TABLE = re.compile(r"^(?:describe|desc)\s+`?\w+`?(?:\.`?\w+`?)?(?:\s+`?\w+`?)?$", re.IGNORECASE)
+
+
+class QueryRejected(Exception):
+    """Raised when a generated query is unsafe or over the cost budget"""
+
+    def __init__(self, reason: str, decision: Dict):
+        super().__init__(reason)
+        self.decision = decision
+
+
+class SQLGuard:
+    """Parses, limits, EXPLAINs and times out generated SELECT statements"""
+
+    def __init__(
+        self,
+        max_rows: Optional[int] = None,
+        max_examined_rows: Optional[int] = None,
+        full_scan_rows: Optional[int] = None,
+        timeout_ms: Optional[int] = None,
+        log_path: Optional[str] = None
+    ):
+        self.max_rows = max_rows or int(os.getenv("SQL_GUARD_MAX_ROWS", "100"))
+        self.max_examined_rows = max_examined_rows or int(os.getenv("SQL_GUARD_MAX_EXAMINED_ROWS", "200000"))
+        self.full_scan_rows = full_scan_rows or int(os.getenv("SQL_GUARD_FULL_SCAN_ROWS", "50000"))
+        self.timeout_ms = timeout_ms or int(os.getenv("SQL_GUARD_TIMEOUT_MS", "5000"))
+        self.log_path = log_path or os.getenv("SQL_GUARD_LOG")
+
+    def prepare(self, sql: str, decision: Dict) -> str:
+        """Validate the statement and enforce a LIMIT, recording what changed"""
+        statement = re.sub(r"--[^\n]*|/\*.*?\*/", " ", sql, flags=re.DOTALL).strip().rstrip(";").strip()
+        bare = STRING_LITERAL.sub("''", statement)
+        first_word = bare.split(None, 1)[0].lower() if bare else ""
+
+        if ";" in bare:
+            self._reject(decision, "multiple statements")
+        if first_word == "explain" or (first_word in ("describe", "desc") and not DESCRIBE_TABLE.match(bare)):
+            self._reject(decision, "EXPLAIN is not allowed (EXPLAIN ANALYZE would run the query unguarded)")
+        if first_word in METADATA_STATEMENTS:
+            decision["final_sql"] = statement
+            decision["metadata"] = True
+            return statement
+        if first_word != "select":
+            self._reject(decision, f"only SELECT is allowed (got {first_word.upper() or 'nothing'})")
+        if FORBIDDEN.search(bare):
+            self._reject(decision, f"forbidden construct: {FORBIDDEN.search(bare).group(0)}")
+
+        match = LIMIT_CLAUSE.search(statement)
+        if not match:
+            statement = f"{statement} LIMIT {self.max_rows}"
+            decision["limit_enforced"] = self.max_rows
+            decision["action"] = "rewritten"
+            decision["reasons"].append(f"added LIMIT {self.max_rows}")
+        else:
+            # "LIMIT offset, count" vs "LIMIT count [OFFSET n]"
+            count = int(match.group(2) or match.group(1))
+            if count > self.max_rows:
+                offset = match.group(1) if match.group(2) else match.group(3)
+                limit = f"LIMIT {self.max_rows}" + (f" OFFSET {offset}" if offset else "")
+                statement = statement[:match.start()] + limit
+                decision["limit_enforced"] = self.max_rows
+                decision["action"] = "rewritten"
+                decision["reasons"].append(f"lowered LIMIT {count} to {self.max_rows}")
+
+        decision["final_sql"] = statement
+        return statement
+
+    def check_cost(self, conn, sql: str, decision: Dict):
+        """Run EXPLAIN and reject statements over the cost budget"""
+        if conn.dialect.name != "mysql":
+            decision["reasons"].append(f"EXPLAIN skipped for {conn.dialect.name}")
+            return
+
+        plan = [dict(row._mapping) for row in conn.execute(text(f"EXPLAIN {sql}"))]
+
+        # Nested-loop joins multiply; separate SELECT ids (subqueries) add up
+        per_select: Dict = {}
+        for step in plan:
+            rows = float(step.get("rows") or 0) * float(step.get("filtered") or 100) / 100
+            per_select[step.get("id")] = per_select.get(step.get("id"), 1) * max(rows, 1)
+        estimated = int(sum(per_select.values()))
+        full_scans = [
+            f"{step.get('table')} ({step.get('rows')} rows)"
+            for step in plan
+            if step.get("type") == "ALL" and int(step.get("rows") or 0) >= self.full_scan_rows
+        ]
+        decision["estimated_rows"] = estimated
+        decision["full_scans"] = full_scans
+
+        stops_early = not BLOCKING_CLAUSES.search(STRING_LITERAL.sub("''", sql))
+        if stops_early and (full_scans or estimated > self.max_examined_rows):
+            decision["reasons"].append("over budget but LIMIT without ORDER/GROUP lets MySQL stop early")
+            return
+        if full_scans:
+            self._reject(decision, f"full scan of {', '.join(full_scans)}")
+        if estimated > self.max_examined_rows:
+            self._reject(decision, f"estimated {estimated} rows examined > budget {self.max_examined_rows}")
+
+    def execute(self, engine, sql: str) -> Tuple[List[Dict], Dict]:
+        """Guard and run a generated query, returns (rows, decision)"""
+        start = time.perf_counter()
+        decision = {"sql": sql, "action": "allowed", "reasons": []}
+        try:
+            sql = self.prepare(sql, decision)
+            with query_source("generated"), engine.connect() as conn:
+                if not decision.get("metadata"):
+                    self.check_cost(conn, sql, decision)
+                    if conn.dialect.name == "mysql":
+                        sql = re.sub(r"^\s*SELECT\b", f"SELECT /*+ MAX_EXECUTION_TIME({self.timeout_ms}) */",
+                                     sql, count=1, flags=re.IGNORECASE)
+                result = conn.execute(text(sql))
+                rows = [dict(row._mapping) for row in result]
+        except QueryRejected:
+            self._log(decision, start)
+            raise
+        except Exception as e:
+            decision["error"] = str(e)
+            self._log(decision, start)
+            raise
+
+        decision["actual_rows"] = len(rows)
+        # Rows cut off by the LIMIT the guard imposed (not one the query asked for)
+        decision["truncated"] = bool(decision.get("limit_enforced")) and len(rows) >= decision["limit_enforced"]
+        self._log(decision, start)
+        return rows, decision
+
+    @staticmethod
+    def _reject(decision: Dict, reason: str):
+        decision["action"] = "rejected"
+        decision["reasons"].append(reason)
+        raise QueryRejected(reason, decision)
+
+    def _log(self, decision: Dict, start: float):
+        decision["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        print(
+            f"[SQL GUARD] {decision['action']} est_rows={decision.get('estimated_rows', '?')} "
+            f"actual_rows={decision.get('actual_rows', '-')} {decision['elapsed_ms']}ms "
+            f"{'; '.join(decision['reasons'])}"
+        )
+        if self.log_path:
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(dict(decision, ts=time.time()), default=str) + "\n")
+            except OSError as e:
+                print(f"[WARN] Could not write SQL guard log: {e}")
+
+
+# Singleton instance
+_sql_guard = None
+
+def get_sql_guard() -> SQLGuard:
+    """Get or create the SQL guard singleton"""
+    global _sql_guard
+    if _sql_guard is None:
+        _sql_guard = SQLGuard()
+    return _sql_guard
@@ -0,0 +1,319 @@
+"""
+Conversation state store
+
+Keeps agent conversation state outside of the Streamlit process so any worker
+can resume any conversation and a restart does not lose in-flight POs.
+Backends: in-memory (LRU), SQLite (shared file) and Redis (or any
+Redis-compatible server). Select with STATE_STORE_BACKEND.
+
+acquire()/release() hold a conversation for one load -> turn -> save across
+every worker sharing the store, so concurrent turns of one conversation do
+not overwrite each other. A lock left by a dead worker expires after
+STATE_LOCK_TTL seconds.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Bump when the shape of a stored conversation changes
+STATE_VERSION = 1
+# Longest a turn may hold its conversation, and how long another turn waits for it
+STATE_LOCK_TTL = int(os.getenv("STATE_LOCK_TTL", "300"))
+STATE_LOCK_WAIT = float(os.getenv("STATE_LOCK_WAIT", "30"))
+
+
+class ConversationBusy(Exception):
+    """Raised when another turn holds the conversation for longer than STATE_LOCK_WAIT"""
+
+
+def serialize_state(state: Dict) -> bytes:
+    """Encode conversation state as compact, versioned bytes"""
+    payload = json.dumps({"v": STATE_VERSION, "s": state}, separators=(",", ":"), default=str)
+    return zlib.compress(payload.encode("utf-8"))
+
+
+def deserialize_state(blob: bytes) -> Optional[Dict]:
+    """Decode bytes written by serialize_state, None if unreadable or outdated"""
+    try:
+        payload = json.loads(zlib.decompress(blob).decode("utf-8"))
+    except Exception as e:
+        print(f"[WARN] deserialize_state: {e}")
+        return None
+
+    if payload.get("v") != STATE_VERSION:
+        print(f"[WARN] Discarding conversation state with version {payload.get('v')}")
+        return None
+    return payload.get("s")
+
+
+class StateStore(ABC):
+    """Base class for conversation state stores"""
+
+    def __init__(self, idle_ttl: int = 3600):
+        self.idle_ttl = idle_ttl
+
+    def load(self, conversation_id: str) -> Optional[Dict]:
+        blob = self._get(conversation_id)
+        return deserialize_state(blob) if blob else None
+
+    def save(self, conversation_id: str, state: Dict):
+        self._put(conversation_id, serialize_state(state))
+
+    def acquire(self, conversation_id: str, ttl: int = STATE_LOCK_TTL, wait: float = STATE_LOCK_WAIT) -> str:
+        """Block until this caller holds the conversation, returns the token for release()"""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + wait
+        while not self._try_lock(conversation_id, token, ttl):
+            if time.monotonic() > deadline:
+                raise ConversationBusy(f"Conversation {conversation_id} is busy with another turn")
+            time.sleep(0.05)
+        return token
+
+    def release(self, conversation_id: str, token: str):
+        self._unlock(conversation_id, token)
+
+    @abstractmethod
+    def delete(self, conversation_id: str):
+        """Forget a conversation"""
+
+    def evict_idle(self) -> int:
+        """Drop conversations idle for longer than idle_ttl, returns count"""
+        return 0
+
+    @abstractmethod
+    def _get(self, conversation_id: str) -> Optional[bytes]:
+        """Stored blob, None if missing"""
+
+    @abstractmethod
+    def _put(self, conversation_id: str, blob: bytes):
+        """Store the blob and refresh its idle timer"""
+
+    @abstractmethod
+    def _try_lock(self, conversation_id: str, token: str, ttl: int) -> bool:
+        """Take the conversation lock unless someone else holds an unexpired one"""
+
+    @abstractmethod
+    def _unlock(self, conversation_id: str, token: str):
+        """Drop the lock if it is still ours"""
+
+
+class MemoryStateStore(StateStore):
+    """Process-local store with LRU and idle eviction"""
+
+    def __init__(self, max_entries: int = 1000, idle_ttl: int = 3600):
+        super().__init__(idle_ttl)
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._locks: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, conversation_id: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if not entry:
+                return None
+            blob, touched = entry
+            if time.time() - touched > self.idle_ttl:
+                del self._entries[conversation_id]
+                return None
+            self._entries.move_to_end(conversation_id)
+            return blob
+
+    def _put(self, conversation_id: str, blob: bytes):
+        with self._lock:
+            self._entries[conversation_id] = (blob, time.time())
+            self._entries.move_to_end(conversation_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, conversation_id: str):
+        with self._lock:
+            self._entries.pop(conversation_id, None)
+
+    def _try_lock(self, conversation_id: str, token: str, ttl: int) -> bool:
+        with self._lock:
+            held = self._locks.get(conversation_id)
+            if held and held[1] > time.time():
+                return False
+            self._locks[conversation_id] = (token, time.time() + ttl)
+            return True
+
+    def _unlock(self, conversation_id: str, token: str):
+        with self._lock:
+            if self._locks.get(conversation_id, (None,))[0] == token:
+                del self._locks[conversation_id]
+
+    def evict_idle(self) -> int:
+        cutoff = time.time() - self.idle_ttl
+        with self._lock:
+            stale = [cid for cid, (_, touched) in self._entries.items() if touched < cutoff]
+            for cid in stale:
+                del self._entries[cid]
+        return len(stale)
+
+
+class SQLiteStateStore(StateStore):
+    """File-backed store, shareable by every worker on the same host"""
+
+    def __init__(self, path: str = "conversation_state.db", idle_ttl: int = 3600):
+        super().__init__(idle_ttl)
+        self.path = path
+        self._local = threading.local()
+        self._saves = 0
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_state (
+                conversation_id TEXT PRIMARY KEY,
+                data BLOB NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_state_updated ON conversation_state (updated_at)")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS conversation_lock (
+                conversation_id TEXT PRIMARY KEY,
+                token TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+        """)
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections must not be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _get(self, conversation_id: str) -> Optional[bytes]:
+        row = self._conn().execute(
+            "SELECT data, updated_at FROM conversation_state WHERE conversation_id = ?",
+            (conversation_id,)
+        ).fetchone()
+        if not row or time.time() - row[1] > self.idle_ttl:
+            return None
+        return row[0]
+
+    def _put(self, conversation_id: str, blob: bytes):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO conversation_state (conversation_id, data, updated_at) VALUES (?, ?, ?)",
+            (conversation_id, blob, time.time())
+        )
+        conn.commit()
+
+        # Sweep idle conversations every so often instead of on every write
+        self._saves += 1
+        if self._saves % 100 == 0:
+            self.evict_idle()
+
+    def delete(self, conversation_id: str):
+        conn = self._conn()
+        conn.execute("DELETE FROM conversation_state WHERE conversation_id = ?", (conversation_id,))
+        conn.commit()
+
+    def _try_lock(self, conversation_id: str, token: str, ttl: int) -> bool:
+        # One statement: insert, or take over an expired lock; no row changes while it is held
+        conn = self._conn()
+        now = time.time()
+        cursor = conn.execute(
+            """
+            INSERT INTO conversation_lock (conversation_id, token, expires_at) VALUES (?, ?, ?)
+            ON CONFLICT (conversation_id) DO UPDATE SET token = excluded.token, expires_at = excluded.expires_at
+            WHERE conversation_lock.expires_at < ?
+            """,
+            (conversation_id, token, now + ttl, now)
+        )
+        conn.commit()
+        return cursor.rowcount == 1
+
+    def _unlock(self, conversation_id: str, token: str):
+        conn = self._conn()
+        conn.execute("DELETE FROM conversation_lock WHERE conversation_id = ? AND token = ?", (conversation_id, token))
+        conn.commit()
+
+    def evict_idle(self) -> int:
+        conn = self._conn()
+        cursor = conn.execute(
+            "DELETE FROM conversation_state WHERE updated_at < ?",
+            (time.time() - self.idle_ttl,)
+        )
+        conn.commit()
+        return cursor.rowcount
+
+
+class RedisStateStore(StateStore):
+    """Store backed by Redis or any Redis-compatible server; idle eviction via key TTL"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", idle_ttl: int = 3600,
+                 prefix: str = "po_agent:conversation:"):
+        super().__init__(idle_ttl)
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _get(self, conversation_id: str) -> Optional[bytes]:
+        key = self.prefix + conversation_id
+        blob = self.client.get(key)
+        if blob is not None:
+            # Reading counts as activity
+            self.client.expire(key, self.idle_ttl)
+        return blob
+
+    def _put(self, conversation_id: str, blob: bytes):
+        self.client.set(self.prefix + conversation_id, blob, ex=self.idle_ttl)
+
+    def delete(self, conversation_id: str):
+        self.client.delete(self.prefix + conversation_id)
+
+    def _try_lock(self, conversation_id: str, token: str, ttl: int) -> bool:
+        return bool(self.client.set(self.prefix + conversation_id + ":lock", token, nx=True, ex=ttl))
+
+    def _unlock(self, conversation_id: str, token: str):
+        # Compare and delete in one step, so an expired lock taken over by another worker stays
+        self.client.eval(
+            "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0",
+            1, self.prefix + conversation_id + ":lock", token
+        )
+
+
+# Singleton instance
+_state_store = None
+_state_store_lock = threading.Lock()
+
+
+def get_state_store() -> StateStore:
+    """Get or create the configured state store singleton"""
+    global _state_store
+    with _state_store_lock:
+        if _state_store is None:
+            backend = os.getenv("STATE_STORE_BACKEND", "memory").lower()
+            idle_ttl = int(os.getenv("STATE_STORE_IDLE_TTL", "3600"))
+
+            if backend == "sqlite":
+                _state_store = SQLiteStateStore(
+                    os.getenv("STATE_STORE_PATH", "conversation_state.db"), idle_ttl=idle_ttl
+                )
+            elif backend == "redis":
+                _state_store = RedisStateStore(
+                    os.getenv("REDIS_URL", "redis://localhost:6379/0"), idle_ttl=idle_ttl
+                )
+            else:
+                _state_store = MemoryStateStore(
+                    int(os.getenv("STATE_STORE_MAX_ENTRIES", "1000")), idle_ttl=idle_ttl
+                )
+    return _state_store
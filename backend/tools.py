@@ -1,11 +1,130 @@
-from sqlalchemy import text
-from backend.database import engine
-from typing import List, Dict
+from backend.database import get_engine, get_read_engine, record_write, text
+from backend.spend_summary import record_po, record_pos
+from backend.po_defaults import record_defaults
+from typing import List, Dict, Optional
 from datetime import datetime
 
+INSERT_INDEPENDENT_PO = """
+INSERT INTO independent_purchase_orders (
+    po_number, po_date, validity_date, po_type, 
+    supplier_id, supplier_name, currency,
+    purchase_org_id, purchase_org_code,
+    plant_id, plant_code,
+    purchase_group_id, purchase_group_code,
+    line_items, total_amount, status
+) VALUES (
+    :po_number, :po_date, :validity_date, :po_type,
+    :supplier_id, :supplier_name, :currency,
+    :purchase_org_id, :purchase_org_code,
+    :plant_id, :plant_code,
+    :purchase_group_id, :purchase_group_code,
+    :line_items, :total_amount, 'Created'
+)
+"""
+
+# Spreadsheet reference of an imported PO (table created by backend/po_import.py)
+INSERT_IMPORT_REF = """
+INSERT INTO po_import_refs (po_ref, po_number, import_id) VALUES (:po_ref, :po_number, :import_id)
+"""
+
+# kind: (table, id, code, name, columns a search matches)
+MASTER_LOOKUPS = {
+    "plants": ("plants", "id", "plant_code", "plant_name", ("plant_name",)),
+    "purchase_orgs": ("purchase_organization", "id", "code", "description", ("description", "code")),
+    "purchase_groups": ("purchase_groups", "id", "code", "name", ("name", "code")),
+    "suppliers": ("supplier_details", "id", "NULL", "supplier_name", ("supplier_name",)),
+}
+
+
+def _relevance_order(name_col: str, code_col: Optional[str] = None, suffix: str = "") -> str:
+    """ORDER BY for a search: exact name/code, prefix, word prefix, then other matches; shorter names first
+
+    Ranked in SQL so the best matches are inside the LIMIT however broad the term.
+    """
+    exact, prefix = [f"LOWER({name_col}) = :exact{suffix}"], [f"LOWER({name_col}) LIKE :prefix{suffix}"]
+    if code_col:
+        exact.append(f"LOWER({code_col}) = :exact{suffix}")
+        prefix.append(f"LOWER({code_col}) LIKE :prefix{suffix}")
+    return (f"ORDER BY CASE WHEN {' OR '.join(exact)} THEN 0 WHEN {' OR '.join(prefix)} THEN 1 "
+            f"WHEN LOWER({name_col}) LIKE :word_prefix{suffix} THEN 2 ELSE 3 END, LENGTH({name_col}), {name_col}")
+
+
+def _relevance_params(query_str: str, suffix: str = "") -> Dict:
+    term = query_str.strip().lower()
+    return {f"exact{suffix}": term, f"prefix{suffix}": f"{term}%", f"word_prefix{suffix}": f"% {term}%"}
+
+
+class MasterDataBatch:
+    """Unit of work for master-data reads
+
+    Queue lookups with add(), then run() fetches all of them with one
+    connection checkout and one UNION ALL round trip:
+
+        batch = POTools.batch()
+        batch.add("plant", "plants", limit=1)
+        batch.add("orgs", "purchase_orgs")
+        results = batch.run()   # {"plant": [{id, code, name}], "orgs": [...]}
+    """
+
+    def __init__(self):
+        self._lookups: List[tuple] = []
+
+    def add(self, key: str, kind: str, query: str = "", limit: int = 50,
+            ids: Optional[List] = None) -> "MasterDataBatch":
+        """Queue a lookup by name/code search, or of the given ids"""
+        if kind not in MASTER_LOOKUPS:
+            raise ValueError(f"Unknown master data kind '{kind}'")
+        self._lookups.append((key, kind, query, limit, list(ids or [])))
+        return self
+
+    def run(self, conn=None) -> Dict[str, List[Dict]]:
+        """Results per key; pass `conn` to reuse a connection the caller already holds"""
+        results = {key: [] for key, *_ in self._lookups}
+        if not self._lookups:
+            return results
+
+        # One derived table per lookup so each keeps its own filter and LIMIT
+        parts, params = [], {}
+        for i, (key, kind, query, limit, ids) in enumerate(self._lookups):
+            table, id_col, code_col, name_col, search_cols = MASTER_LOOKUPS[kind]
+            where, order = "", ""
+            if ids:
+                where = f"WHERE {id_col} IN ({', '.join(f':id_{i}_{j}' for j in range(len(ids)))})"
+                params.update({f"id_{i}_{j}": v for j, v in enumerate(ids)})
+            elif query:
+                where = "WHERE " + " OR ".join(f"{c} LIKE :search_{i}" for c in search_cols)
+                params[f"search_{i}"] = f"%{query}%"
+                order = _relevance_order(name_col, code_col if code_col != "NULL" else None, suffix=f"_{i}")
+                params.update(_relevance_params(query, suffix=f"_{i}"))
+            parts.append(f"""
+            SELECT * FROM (
+                SELECT {i} AS k, {id_col} AS id, {code_col} AS code, {name_col} AS name
+                FROM {table} {where}
+                {order}
+                LIMIT {int(limit)}
+            ) AS q{i}""")
+        sql = text(" UNION ALL ".join(parts))
+
+        def fetch(c):
+            for row in c.execute(sql, params):
+                results[self._lookups[row[0]][0]].append({"id": row[1], "code": row[2], "name": row[3]})
+
+        if conn is not None:
+            fetch(conn)
+        else:
+            with get_read_engine().connect() as c:
+                fetch(c)
+        return results
+
+
 class POTools:
     """Custom tools for PO creation"""
     
+    @staticmethod
+    def batch() -> MasterDataBatch:
+        """Start a batch of master-data lookups (one round trip on run())"""
+        return MasterDataBatch()
+
     @staticmethod
     def get_suppliers(limit: int = 10) -> List[Dict]:
         """Fetch suppliers from database"""
@@ -15,7 +134,7 @@ class POTools:
         LIMIT :limit
         """
         try:
-            with engine.connect() as conn:
+            with get_read_engine().connect() as conn:
                 result = conn.execute(text(query), {"limit": limit})
                 return [{
                     "id": row[0],
@@ -30,15 +149,16 @@ class POTools:
     @staticmethod
     def search_suppliers(query_str: str) -> List[Dict]:
         """Search suppliers by name"""
-        query = """
+        query = f"""
         SELECT id, supplier_name, emailID
         FROM supplier_details
         WHERE supplier_name LIKE :search
+        {_relevance_order("supplier_name") if query_str.strip() else ""}
         LIMIT 50
         """
         try:
-            with engine.connect() as conn:
-                result = conn.execute(text(query), {"search": f"%{query_str}%"})
+            with get_read_engine().connect() as conn:
+                result = conn.execute(text(query), {"search": f"%{query_str}%", **_relevance_params(query_str)})
                 return [{
                     "id": row[0],
                     "name": row[1],
@@ -52,15 +172,16 @@ class POTools:
     def search_plants(query_str: str) -> List[Dict]:
         """Search plants by name"""
         # Assuming 'plants' table exists, otherwise fallback or mock
-        query = """
+        query = f"""
         SELECT id, plant_name, plant_code
         FROM plants
         WHERE plant_name LIKE :search
+        {_relevance_order("plant_name", "plant_code") if query_str.strip() else ""}
         LIMIT 50
         """
         try:
-            with engine.connect() as conn:
-                result = conn.execute(text(query), {"search": f"%{query_str}%"})
+            with get_read_engine().connect() as conn:
+                result = conn.execute(text(query), {"search": f"%{query_str}%", **_relevance_params(query_str)})
                 return [{
                     "id": row[0],
                     "name": row[1],
@@ -83,16 +204,17 @@ class POTools:
             query = "SELECT id, name, code, price FROM materials LIMIT 50"
             params = {}
         else:
-            query = """
+            query = f"""
             SELECT id, name, code, price
             FROM materials 
             WHERE name LIKE :search OR code LIKE :search 
+            {_relevance_order("name", "code")}
             LIMIT 50
             """
-            params = {"search": f"%{query_str}%"}
+            params = {"search": f"%{query_str}%", **_relevance_params(query_str)}
             
         try:
-            with engine.connect() as conn:
+            with get_read_engine().connect() as conn:
                 result = conn.execute(text(query), params)
                 return [{
                     "id": row[0],
@@ -110,6 +232,43 @@ class POTools:
             ]
             return [m for m in mock_materials if query_str.lower() in m['name'].lower()]
 
+    @staticmethod
+    def resolve_materials(names: List[str], per_name: int = 10) -> Dict[str, List[Dict]]:
+        """Candidate materials for several names in one round trip (exact matches first)"""
+        names = list(dict.fromkeys(n for n in names if n))
+        if not names:
+            return {}
+
+        # One derived table per name so a broad name can't crowd out the others
+        parts = []
+        params = {"per_name": per_name}
+        for i, name in enumerate(names):
+            parts.append(f"""
+            SELECT * FROM (
+                SELECT {i} AS k, id, name, code, price
+                FROM materials
+                WHERE name LIKE :search_{i} OR code LIKE :search_{i}
+                ORDER BY (LOWER(name) = :exact_{i}) DESC, LENGTH(name)
+                LIMIT :per_name
+            ) AS m{i}""")
+            params[f"search_{i}"] = f"%{name}%"
+            params[f"exact_{i}"] = name.lower()
+        query = " UNION ALL ".join(parts)
+
+        candidates = {name: [] for name in names}
+        try:
+            with get_read_engine().connect() as conn:
+                for row in conn.execute(text(query), params):
+                    candidates[names[row[0]]].append({
+                        "id": row[1],
+                        "name": row[2],
+                        "code": row[3],
+                        "price": row[4] or 0
+                    })
+        except Exception as e:
+            print(f"[ERROR] resolve_materials: {e}")
+        return candidates
+
     @staticmethod
     def search_purchase_orgs(query_str: str = "") -> List[Dict]:
         """Search purchase organizations"""
@@ -117,11 +276,12 @@ class POTools:
             query = "SELECT id, code, description FROM purchase_organization LIMIT 50"
             params = {}
         else:
-            query = "SELECT id, code, description FROM purchase_organization WHERE description LIKE :search OR code LIKE :search LIMIT 50"
-            params = {"search": f"%{query_str}%"}
+            query = (f"SELECT id, code, description FROM purchase_organization WHERE description LIKE :search OR code LIKE :search "
+                     f"{_relevance_order('description', 'code')} LIMIT 50")
+            params = {"search": f"%{query_str}%", **_relevance_params(query_str)}
             
         try:
-            with engine.connect() as conn:
+            with get_read_engine().connect() as conn:
                 result = conn.execute(text(query), params)
                 return [{"id": row[0], "code": row[1], "name": row[2]} for row in result]
         except Exception as e:
@@ -135,11 +295,12 @@ class POTools:
             query = "SELECT id, code, name FROM purchase_groups LIMIT 50"
             params = {}
         else:
-            query = "SELECT id, code, name FROM purchase_groups WHERE name LIKE :search OR code LIKE :search LIMIT 50"
-            params = {"search": f"%{query_str}%"}
+            query = (f"SELECT id, code, name FROM purchase_groups WHERE name LIKE :search OR code LIKE :search "
+                     f"{_relevance_order('name', 'code')} LIMIT 50")
+            params = {"search": f"%{query_str}%", **_relevance_params(query_str)}
             
         try:
-            with engine.connect() as conn:
+            with get_read_engine().connect() as conn:
                 result = conn.execute(text(query), params)
                 return [{"id": row[0], "code": row[1], "name": row[2]} for row in result]
         except Exception as e:
@@ -151,7 +312,7 @@ class POTools:
         """Fetch payment terms"""
         query = "SELECT id, code, name FROM payment_terms LIMIT 5"
         try:
-            with engine.connect() as conn:
+            with get_read_engine().connect() as conn:
                 result = conn.execute(text(query))
                 return [{"id": row[0], "code": row[1], "name": row[2]} for row in result]
         except Exception as e:
@@ -163,7 +324,7 @@ class POTools:
         """Fetch currencies"""
         query = "SELECT id, code, name FROM currencies LIMIT 50"
         try:
-            with engine.connect() as conn:
+            with get_read_engine().connect() as conn:
                 result = conn.execute(text(query))
                 return [{"id": row[0], "code": row[1], "name": row[2]} for row in result]
         except Exception as e:
@@ -173,54 +334,71 @@ class POTools:
     @staticmethod
     def create_independent_po(po_data: Dict) -> str:
         """Create independent purchase order"""
-        import json
         import random
         
         po_number = f"IND-PO-{random.randint(10000, 99999)}"
         
-        query = """
-        INSERT INTO independent_purchase_orders (
-            po_number, po_date, validity_date, po_type, 
-            supplier_id, supplier_name, currency,
-            purchase_org_id, purchase_org_code,
-            plant_id, plant_code,
-            purchase_group_id, purchase_group_code,
-            line_items, total_amount, status
-        ) VALUES (
-            :po_number, :po_date, :validity_date, :po_type,
-            :supplier_id, :supplier_name, :currency,
-            :purchase_org_id, :purchase_org_code,
-            :plant_id, :plant_code,
-            :purchase_group_id, :purchase_group_code,
-            :line_items, :total_amount, 'Created'
-        )
-        """
-        
         try:
-            with engine.connect() as conn:
-                conn.execute(text(query), {
-                    "po_number": po_number,
-                    "po_date": po_data.get("po_date"),
-                    "validity_date": po_data.get("validity_date"),
-                    "po_type": po_data.get("po_type", "Standard"),
-                    "supplier_id": po_data.get("supplier_id"),
-                    "supplier_name": po_data.get("supplier_name"),
-                    "currency": po_data.get("currency", "INR"),
-                    "purchase_org_id": po_data.get("purchase_org_id"),
-                    "purchase_org_code": po_data.get("purchase_org_code"),
-                    "plant_id": po_data.get("plant_id"),
-                    "plant_code": po_data.get("plant_code"),
-                    "purchase_group_id": po_data.get("purchase_group_id"),
-                    "purchase_group_code": po_data.get("purchase_group_code"),
-                    "line_items": json.dumps(po_data.get("line_items", []), default=str),
-                    "total_amount": po_data.get("total_amount", 0.0)
-                })
+            with get_engine().connect() as conn:
+                conn.execute(text(INSERT_INDEPENDENT_PO), POTools._independent_po_params(po_number, po_data))
                 conn.commit()
-                return po_number
+                record_write(po_number)
+            record_po(po_data)
+            record_defaults([po_data])
+            return po_number
         except Exception as e:
             print(f"[ERROR] create_independent_po: {e}")
             return f"ERROR-{e}"
 
+    @staticmethod
+    def create_independent_pos(pos: List[Dict], po_numbers: List[str],
+                               import_refs: Optional[List[Optional[str]]] = None,
+                               import_id: Optional[str] = None) -> List[str]:
+        """Insert many independent POs in one executemany and transaction (raises on failure)
+
+        Used by bulk imports; the caller picks unique PO numbers. `import_refs`
+        (po_ref per PO, None for none) are stored in the same transaction,
+        tagged with `import_id`.
+        """
+        params = [POTools._independent_po_params(n, po) for n, po in zip(po_numbers, pos)]
+        if not params:
+            return []
+        refs = [{"po_ref": ref, "po_number": n, "import_id": import_id}
+                for n, ref in zip(po_numbers, import_refs or []) if ref]
+
+        with get_engine().connect() as conn:
+            conn.execute(text(INSERT_INDEPENDENT_PO), params)
+            if refs:
+                conn.execute(text(INSERT_IMPORT_REF), refs)
+            conn.commit()
+        for po_number in po_numbers:
+            record_write(po_number)
+        record_pos(pos)
+        record_defaults(pos)
+        return list(po_numbers)
+
+    @staticmethod
+    def _independent_po_params(po_number: str, po_data: Dict) -> Dict:
+        import json
+
+        return {
+            "po_number": po_number,
+            "po_date": po_data.get("po_date"),
+            "validity_date": po_data.get("validity_date"),
+            "po_type": po_data.get("po_type", "Standard"),
+            "supplier_id": po_data.get("supplier_id"),
+            "supplier_name": po_data.get("supplier_name"),
+            "currency": po_data.get("currency", "INR"),
+            "purchase_org_id": po_data.get("purchase_org_id"),
+            "purchase_org_code": po_data.get("purchase_org_code"),
+            "plant_id": po_data.get("plant_id"),
+            "plant_code": po_data.get("plant_code"),
+            "purchase_group_id": po_data.get("purchase_group_id"),
+            "purchase_group_code": po_data.get("purchase_group_code"),
+            "line_items": json.dumps(po_data.get("line_items", []), default=str),
+            "total_amount": po_data.get("total_amount", 0.0)
+        }
+
     @staticmethod
     def create_po(po_data: Dict) -> str:
         """Create purchase order in local database"""
@@ -242,7 +420,7 @@ class POTools:
         """
         
         try:
-            with engine.connect() as conn:
+            with get_engine().connect() as conn:
                 conn.execute(text(query), {
                     "po_number": po_number,
                     "supplier_id": po_data.get("supplier_id"),
@@ -257,6 +435,7 @@ class POTools:
                     "raw_payload": json.dumps(po_data, default=str)
                 })
                 conn.commit()
+                record_write(po_number)
                 return po_number
         except Exception as e:
             print(f"[ERROR] create_po: {e}")
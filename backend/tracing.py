@@ -0,0 +1,197 @@
+"""
+Structured tracing of turns, DB queries and LLM calls
+
+Set TRACE_FILE to a path to record spans there as JSON lines, one span per
+line with OTLP/JSON field names (traceId, spanId, parentSpanId,
+startTimeUnixNano, ...). trace_viewer.py prints a conversation's critical
+path from that file, or converts it to an OTLP export request.
+
+A trace starts at a Streamlit rerun or API turn (new_trace=True) or at the
+first span opened outside one. DB statements (SQLAlchemy cursor events) and
+Bedrock calls (botocore call events) become child spans of whatever span is
+current in their thread; outside a trace they are not recorded.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+TRACE_MAX_STATEMENT = int(os.getenv("TRACE_MAX_STATEMENT", "500"))
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+_write_lock = threading.Lock()
+_out = None
+
+
+def enabled() -> bool:
+    return bool(TRACE_FILE)
+
+
+class Span:
+    """An open span; end() writes it out and makes its parent current again"""
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: dict):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.start_ns = time.time_ns()
+        self.attributes = attributes
+        self.ended = False
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error: Optional[BaseException] = None):
+        if self.ended:
+            return
+        self.ended = True
+        _write(self.name, self.trace_id, self.span_id, self.parent.span_id if self.parent else None,
+               self.start_ns, time.time_ns(), self.attributes, error)
+        if _current.get() is self:
+            _current.set(self.parent)
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        pass
+
+    def end(self, error: Optional[BaseException] = None):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def start_span(name: str, new_trace: bool = False, **attributes):
+    """Open a span as a child of the current one (or as a new trace) and make it current"""
+    if not enabled():
+        return NOOP_SPAN
+    parent = None if new_trace else _current.get()
+    span = Span(name, parent, attributes)
+    _current.set(span)
+    return span
+
+
+@contextmanager
+def span(name: str, new_trace: bool = False, **attributes):
+    current = start_span(name, new_trace=new_trace, **attributes)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    current.end()
+
+
+def record_span(name: str, start_ns: int, end_ns: int, error: Optional[BaseException] = None, **attributes):
+    """Record an already finished operation under the current span (dropped outside a trace)"""
+    parent = _current.get() if enabled() else None
+    if parent is None:
+        return
+    _write(name, parent.trace_id, uuid.uuid4().hex[:16], parent.span_id, start_ns, end_ns, attributes, error)
+
+
+def _write(name, trace_id, span_id, parent_id, start_ns, end_ns, attributes, error):
+    global _out
+    record = {
+        "traceId": trace_id,
+        "spanId": span_id,
+        "parentSpanId": parent_id or "",
+        "name": name,
+        "startTimeUnixNano": start_ns,
+        "endTimeUnixNano": end_ns,
+        "attributes": attributes,
+        "status": {"code": "ERROR", "message": str(error)[:500]} if error else {"code": "OK"},
+        "thread": threading.current_thread().name,
+    }
+    line = json.dumps(record, default=str) + "\n"
+    try:
+        with _write_lock:
+            if _out is None:
+                _out = open(TRACE_FILE, "a", encoding="utf-8")
+            _out.write(line)
+            _out.flush()
+    except OSError as e:
+        print(f"[WARN] Trace not written to {TRACE_FILE}: {e}")
+
+
+def instrument_engine(engine):
+    """Span per executed statement, with a fingerprint to spot repeated lookups"""
+    if not enabled():
+        return
+    from sqlalchemy import event
+
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._trace_start = time.time_ns()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        start = getattr(context, "_trace_start", None)
+        if start is None:
+            return
+        record_span("db.query", start, time.time_ns(), **_statement_attributes(
+            conn, statement, parameters, executemany, rows=cursor.rowcount))
+
+    def failed(exception_context):
+        context = exception_context.execution_context
+        if context is not None and hasattr(context, "_trace_start"):
+            record_span("db.query", context._trace_start, time.time_ns(), error=exception_context.original_exception,
+                        **_statement_attributes(exception_context.connection, exception_context.statement,
+                                                exception_context.parameters, context.executemany))
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+    event.listen(engine, "handle_error", failed)
+
+
+def _statement_attributes(conn, statement, parameters, executemany, rows=None) -> dict:
+    statement = " ".join(str(statement or "").split())
+    fingerprint = hashlib.sha1(f"{statement}|{parameters!r}".encode("utf-8")).hexdigest()[:12]
+    attributes = {
+        "db.system": conn.dialect.name if conn is not None else None,
+        "db.statement": statement[:TRACE_MAX_STATEMENT],
+        "db.fingerprint": fingerprint,
+        "db.executemany": bool(executemany),
+    }
+    if rows is not None and rows >= 0:
+        attributes["db.rows"] = rows
+    return attributes
+
+
+def instrument_bedrock(client):
+    """Span per Bedrock API call made through a boto3 client"""
+    if not enabled():
+        return client
+
+    def before(params=None, context=None, model=None, **kwargs):
+        if context is not None:
+            context["trace_start"] = time.time_ns()
+            context["trace_model"] = (params or {}).get("modelId")
+            context["trace_operation"] = getattr(model, "name", None)
+
+    def after(http_response=None, parsed=None, model=None, context=None, exception=None, **kwargs):
+        if context is None or "trace_start" not in context:
+            return
+        error = (parsed or {}).get("Error") if isinstance(parsed, dict) else None
+        if error:
+            exception = RuntimeError(error.get("Message") or error.get("Code"))
+        record_span("llm.bedrock", context.pop("trace_start"), time.time_ns(), error=exception, **{
+            "llm.operation": context.get("trace_operation"),
+            "llm.model": context.get("trace_model"),
+            "http.status_code": getattr(http_response, "status_code", None),
+        })
+
+    client.meta.events.register("provide-client-params.bedrock-runtime", before)
+    client.meta.events.register("after-call.bedrock-runtime", after)
+    client.meta.events.register("after-call-error.bedrock-runtime", after)
+    return client
@@ -0,0 +1,170 @@
+"""
+Background warmup at process start
+
+Without it the first user after a deploy pays for the DB connect, Bedrock
+client creation, schema reflection and the first master-data queries
+(cold DB pages; for the PO app, loading its option lists).
+start_warmup(profile) runs those steps in background threads (one per task)
+so the entry point renders immediately; warmup_status() / is_ready() tell
+the UI and /health how far it got. Calling it again (Streamlit reruns the
+script on every interaction) only starts tasks that haven't run yet.
+
+WARMUP_ENABLED=false turns it off (e.g. to measure a cold first response).
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() == "true"
+WARMUP_DB_CONNECTIONS = int(os.getenv("WARMUP_DB_CONNECTIONS", "2"))
+
+
+def _warm_db_pool():
+    """Open a few pool connections (and a replica one) so the first turns don't connect"""
+    from backend.database import get_engine, get_read_engine, has_replicas, text
+
+    connections = [get_engine().connect() for _ in range(max(1, WARMUP_DB_CONNECTIONS))]
+    try:
+        for conn in connections:
+            conn.execute(text("SELECT 1"))
+    finally:
+        for conn in connections:
+            conn.close()
+    if has_replicas():
+        with get_read_engine().connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+
+def _warm_llm_client():
+    from backend.llm import get_llm
+    from backend.sql_agent import get_sql_agent
+
+    get_llm().client
+    get_sql_agent().bedrock
+
+
+def _warm_option_lists():
+    """Load the PO app's supplier/currency/plant/org/group/material lists into the shared prefetch cache"""
+    from backend.prefetch import get_prefetcher
+
+    get_prefetcher().warm()
+
+
+def _warm_db_cache():
+    """Run the master-data queries once so the DB has their pages cached (nothing is kept here)"""
+    from backend.tools import POTools
+
+    POTools.batch().add("plants", "plants").add("orgs", "purchase_orgs") \
+        .add("groups", "purchase_groups").add("suppliers", "suppliers").run()
+    POTools.search_materials("")
+
+
+def _warm_agent_executor():
+    from langchain_agent.agent import get_agent_executor
+
+    get_agent_executor()
+
+
+def _warm_sql_chain():
+    from langchain_agent.sql_chain import get_sql_chain
+
+    # Loads (or builds) the schema snapshot
+    get_sql_chain().db.get_table_info()
+
+
+TASKS: Dict[str, Callable] = {
+    "db_pool": _warm_db_pool,
+    "llm_client": _warm_llm_client,
+    "option_lists": _warm_option_lists,
+    "db_cache": _warm_db_cache,
+    "agent_executor": _warm_agent_executor,
+    "sql_chain": _warm_sql_chain,
+}
+
+PROFILES = {
+    "po": ("db_pool", "llm_client", "option_lists"),
+    "smart": ("db_pool", "llm_client", "db_cache"),
+    "langchain": ("db_pool", "agent_executor", "sql_chain", "db_cache"),
+    # The API serves no option lists
+    "api": ("db_pool", "llm_client", "agent_executor", "sql_chain", "db_cache"),
+}
+
+_tasks: Dict[str, Dict] = {}
+_lock = threading.Lock()
+_started_at: Optional[float] = None
+_ready_after: Optional[float] = None
+
+
+def start_warmup(profile: str) -> Dict:
+    """Start the profile's warmup tasks in the background (once per process)"""
+    global _started_at
+    if not WARMUP_ENABLED:
+        return warmup_status()
+
+    with _lock:
+        if _started_at is None:
+            _started_at = time.perf_counter()
+        for name in PROFILES[profile]:
+            if name in _tasks:
+                continue
+            _tasks[name] = {"status": "running", "ms": None, "error": None}
+            threading.Thread(target=_run, args=(name,), name=f"warmup-{name}", daemon=True).start()
+    return warmup_status()
+
+
+def _run(name: str):
+    global _ready_after
+    start = time.perf_counter()
+    try:
+        TASKS[name]()
+        status, error = "done", None
+    except Exception as e:
+        # A failed warmup only means the first request does the work itself
+        status, error = "failed", str(e)
+        print(f"[WARN] Warmup {name} failed: {e}")
+    elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+    with _lock:
+        _tasks[name].update(status=status, ms=elapsed_ms, error=error)
+        if all(t["status"] != "running" for t in _tasks.values()):
+            _ready_after = round(time.perf_counter() - _started_at, 3)
+    print(f"[WARMUP] {name} {status} in {elapsed_ms}ms")
+
+
+def is_ready() -> bool:
+    return warmup_status()["ready"]
+
+
+def wait_ready(timeout: Optional[float] = None) -> bool:
+    """Block until every started task has finished (True) or the timeout passes"""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while not is_ready():
+        if not _tasks or (deadline is not None and time.monotonic() >= deadline):
+            return False
+        time.sleep(0.05)
+    return True
+
+
+def warmup_status() -> Dict:
+    with _lock:
+        tasks = {name: dict(task) for name, task in _tasks.items()}
+        ready = bool(tasks) and all(t["status"] != "running" for t in tasks.values())
+        return {
+            "enabled": WARMUP_ENABLED,
+            "ready": ready,
+            # Seconds from the first start_warmup() to the last task finishing
+            "ready_after_s": _ready_after if ready else None,
+            "tasks": tasks,
+        }
+
+
+def readiness_label() -> str:
+    """One line for the UI sidebars"""
+    status = warmup_status()
+    if not status["enabled"] or not status["tasks"]:
+        return "⚪ Warmup off"
+    done = sum(t["status"] != "running" for t in status["tasks"].values())
+    if not status["ready"]:
+        return f"⏳ Warming up ({done}/{len(status['tasks'])})... first answers may be slower"
+    failed = [name for name, t in status["tasks"].items() if t["status"] == "failed"]
+    return f"✅ Ready (warmup failed: {', '.join(failed)})" if failed else "✅ Ready"
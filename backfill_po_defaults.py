@@ -0,0 +1,33 @@
+"""
+Create and rebuild the per-supplier PO defaults (po_default_counts)
+
+    python backfill_po_defaults.py                 # rebuild supplier counts from all POs
+    python backfill_po_defaults.py --create-only
+"""
+import argparse
+import time
+
+from backend.po_defaults import DEFAULTS_TABLE, backfill, create_defaults_table
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill po_default_counts from independent_purchase_orders")
+    parser.add_argument("--batch-size", type=int, default=1000, help="POs read per batch")
+    parser.add_argument("--create-only", action="store_true", help="Only create the table")
+    args = parser.parse_args()
+
+    try:
+        create_defaults_table()
+        print(f"✅ Table {DEFAULTS_TABLE} ready")
+        if args.create_only:
+            return
+
+        start = time.perf_counter()
+        total = backfill(batch_size=args.batch_size)
+        print(f"✅ Counted {total} POs in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
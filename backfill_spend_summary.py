@@ -0,0 +1,35 @@
+"""
+Create and (re)build the pre-aggregated spend summary tables
+
+    python backfill_spend_summary.py                     # full rebuild
+    python backfill_spend_summary.py --since 2025-01-01  # rebuild from that month on
+    python backfill_spend_summary.py --create-only
+"""
+import argparse
+import time
+
+from backend.spend_summary import SUMMARY_TABLES, backfill, create_summary_tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill po_spend_daily / po_spend_monthly")
+    parser.add_argument("--since", help="Rebuild from this date (YYYY-MM-DD, rounded down to the month)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="POs read per batch")
+    parser.add_argument("--create-only", action="store_true", help="Only create the tables")
+    args = parser.parse_args()
+
+    try:
+        create_summary_tables()
+        print(f"✅ Tables {', '.join(SUMMARY_TABLES)} ready")
+        if args.create_only:
+            return
+
+        start = time.perf_counter()
+        total = backfill(since=args.since, batch_size=args.batch_size)
+        print(f"✅ Backfilled {total} POs in {time.perf_counter() - start:.1f}s")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Cold-start benchmark and import-time profile for the Streamlit entry points
+
+Each entry point is executed in a fresh interpreter in Streamlit "bare mode"
+(no server), which runs the script top to bottom exactly like the first page
+load. Timings are compared against benchmarks/budgets.json.
+
+Run with: python benchmarks/cold_start.py [--runs 5] [--importtime] [--output report.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+BUDGETS_PATH = os.path.join(os.path.dirname(__file__), "budgets.json")
+
+ENTRY_POINTS = {
+    "frontend": "frontend/app.py",
+    "smart_frontend": "smart_frontend/smart_app.py",
+    "langchain": "langchain_app.py",
+}
+
+# Packages that should only be imported on first use, never at startup
+HEAVY_PACKAGES = [
+    "boto3", "botocore", "sqlalchemy", "pymysql",
+    "langchain", "langchain_core", "langchain_aws", "langchain_community",
+]
+
+RUNNER = "import runpy, sys; sys.path.insert(0, {root!r}); runpy.run_path({script!r}, run_name='__main__')"
+
+
+def _run_entry_point(script: str, extra_args: List[str] = None) -> subprocess.CompletedProcess:
+    code = RUNNER.format(root=ROOT, script=os.path.join(ROOT, script))
+    return subprocess.run(
+        [sys.executable] + (extra_args or []) + ["-c", code],
+        cwd=ROOT, capture_output=True, text=True,
+        # Background warmup/prefetch threads are measured by first_response.py, not as part of the script run
+        env=dict(os.environ, WARMUP_ENABLED="false", PREFETCH_ENABLED="false")
+    )
+
+
+def measure_cold_start(script: str, runs: int) -> Dict:
+    """Wall time of a fresh interpreter executing the script once"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = _run_entry_point(script)
+        timings.append(time.perf_counter() - start)
+        if proc.returncode != 0:
+            print(proc.stderr[-2000:])
+            raise RuntimeError(f"{script} exited with {proc.returncode}")
+    return {
+        "median": round(statistics.median(timings), 3),
+        "max": round(max(timings), 3),
+        "runs": runs,
+    }
+
+
+def profile_imports(script: str, top: int = 15) -> Dict:
+    """Parse `python -X importtime` output into per-package totals"""
+    proc = _run_entry_point(script, ["-X", "importtime"])
+    per_package = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = [p.strip() for p in line.split(":", 1)[1].split("|")]
+        per_package[name.split(".")[0]] += int(self_us)
+
+    packages = sorted(per_package.items(), key=lambda kv: kv[1], reverse=True)
+    return {
+        "total_ms": round(sum(per_package.values()) / 1000, 1),
+        "top_packages_ms": [(name, round(us / 1000, 1)) for name, us in packages[:top]],
+        "eager_heavy_packages": [p for p in HEAVY_PACKAGES if p in per_package],
+    }
+
+
+def load_budgets() -> Dict:
+    with open(BUDGETS_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--importtime", action="store_true", help="also print an import-time profile")
+    parser.add_argument("--only", choices=sorted(ENTRY_POINTS), help="benchmark a single entry point")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    budgets = load_budgets().get("cold_start_seconds", {})
+    report = {}
+    over_budget = []
+
+    for name, script in ENTRY_POINTS.items():
+        if args.only and name != args.only:
+            continue
+
+        result = measure_cold_start(script, args.runs)
+        budget = budgets.get(name)
+        result["budget"] = budget
+        status = "OK"
+        if budget is not None and result["median"] > budget:
+            status = "OVER BUDGET"
+            over_budget.append(name)
+        print(f"{name:15} median {result['median']:.3f}s  max {result['max']:.3f}s  budget {budget}s  {status}")
+
+        if args.importtime:
+            profile = profile_imports(script)
+            result["imports"] = profile
+            print(f"  imports: {profile['total_ms']} ms total")
+            for package, ms in profile["top_packages_ms"]:
+                print(f"    {package:30} {ms:8.1f} ms")
+            if profile["eager_heavy_packages"]:
+                print(f"  ⚠️ heavy packages imported at startup: {', '.join(profile['eager_heavy_packages'])}")
+
+        report[name] = result
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    sys.exit(1 if over_budget else 0)
+
+
+if __name__ == "__main__":
+    main()
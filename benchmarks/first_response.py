@@ -0,0 +1,131 @@
+"""
+Time-to-first-response benchmark: background warmup off vs on
+
+Each run is a fresh interpreter that starts warmup for the profile (or not,
+WARMUP_ENABLED=false), waits --arrival seconds for the first user to show
+up, then answers that user's first message and reports how long it took.
+Bedrock clients are real boto3 clients (so client creation is paid as in
+production) with invoke_model stubbed; the DB is a seeded SQLite file
+unless --database-url is given.
+
+Run with: python benchmarks/first_response.py [--profile po] [--runs 5] [--arrival 1.0]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.load_test import CONVERSATION, StubBedrockClient, seed_sqlite
+
+FIRST_MESSAGES = {
+    "po": CONVERSATION[0],
+    # Served by the dispatcher: DB and tools, no agent LLM call
+    "langchain": "search supplier Avians",
+}
+
+
+def child(args):
+    """One cold process: optional warmup, user arrives, first message timed"""
+    import backend.llm
+    import backend.sql_agent
+
+    class _NoStats:
+        def add(self, name, value):
+            pass
+
+    stub = StubBedrockClient(args.llm_latency, 8, _NoStats())
+    real_create = backend.llm.create_bedrock_client
+
+    def create_client():
+        client = real_create()
+        client.invoke_model = stub.invoke_model
+        return client
+
+    backend.llm.create_bedrock_client = create_client
+    backend.sql_agent.create_bedrock_client = create_client
+
+    from backend.warmup import start_warmup, warmup_status
+    start_warmup(args.profile)
+    time.sleep(args.arrival)
+
+    start = time.perf_counter()
+    if args.profile == "po":
+        from backend.agent import POAgent
+        POAgent().process_message(FIRST_MESSAGES["po"])
+    else:
+        from langchain_agent.dispatcher import dispatch
+        dispatch(FIRST_MESSAGES["langchain"])
+    elapsed = time.perf_counter() - start
+
+    print(json.dumps({"first_response_s": round(elapsed, 3),
+                      "ready_after_s": warmup_status()["ready_after_s"]}))
+
+
+def run_once(args, warmup: bool) -> dict:
+    env = dict(os.environ, DATABASE_URL=args.database_url, WARMUP_ENABLED="true" if warmup else "false")
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", "--profile", args.profile,
+         "--arrival", str(args.arrival), "--llm-latency", str(args.llm_latency)],
+        cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Child run failed:\n{result.stderr[-2000:]}")
+    # The last line is the JSON result, everything before it is backend logging
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="First response latency with and without background warmup")
+    parser.add_argument("--profile", choices=sorted(FIRST_MESSAGES), default="po")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--arrival", type=float, default=1.0,
+                        help="Seconds between process start and the first user message")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--database-url", help="Defaults to a seeded SQLite file")
+    parser.add_argument("--output", help="Write the report as JSON")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    if not args.database_url:
+        path = os.path.join(tempfile.mkdtemp(prefix="po_first_"), "first.db")
+        seed_sqlite(path)
+        args.database_url = f"sqlite:///{path}"
+        print(f"Seeded embedded DB at {path}")
+
+    report = {"profile": args.profile, "arrival_s": args.arrival, "runs": args.runs}
+    for label, warmup in (("cold", False), ("warm", True)):
+        results = [run_once(args, warmup) for _ in range(args.runs)]
+        first = [r["first_response_s"] for r in results]
+        ready = [r["ready_after_s"] for r in results if r["ready_after_s"] is not None]
+        report[label] = {
+            "first_response_p50_s": round(statistics.median(first), 3),
+            "first_response_max_s": round(max(first), 3),
+            "ready_after_p50_s": round(statistics.median(ready), 3) if ready else None,
+        }
+        print(f"{label:5} first response p50 {report[label]['first_response_p50_s']:.3f}s "
+              f"(max {report[label]['first_response_max_s']:.3f}s)"
+              + (f", warmup ready after {report[label]['ready_after_p50_s']:.3f}s" if ready else ""))
+
+    saved = report["cold"]["first_response_p50_s"] - report["warm"]["first_response_p50_s"]
+    report["saved_s"] = round(saved, 3)
+    print(f"Warmup saves {saved:.3f}s on the first response")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
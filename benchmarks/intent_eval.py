@@ -0,0 +1,124 @@
+"""
+Intent routing evaluation against a labelled set
+
+Compares the legacy keyword detection (POAgent / LangChainPOAgent) with
+backend.intent_router and reports misroutes and wasted LLM calls on two
+labelled sets:
+- tuned: benchmarks/intent_labels.jsonl, the messages the router's rules
+  were written against
+- held-out: benchmarks/intent_heldout.jsonl, messages the rules were not
+  fitted to; its numbers are the ones to trust
+Misroutes and wasted LLM calls are defined as:
+- a message routed to the SQL agent that is not a question costs an LLM
+  SQL generation for nothing
+- every router LLM fallback is one extra (small) LLM call
+
+Without --llm the fallback is not called; those messages are counted as
+LLM calls and reported as "unresolved" (neither correct nor misrouted).
+Accuracy is over all messages, so unresolved ones count against it.
+
+Run with: python benchmarks/intent_eval.py [--llm] [--threshold 0.7] [--set held-out] [--verbose]
+"""
+import argparse
+import json
+import os
+import sys
+from typing import Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+LABEL_SETS = {
+    "tuned": os.path.join(os.path.dirname(__file__), "intent_labels.jsonl"),
+    "held-out": os.path.join(os.path.dirname(__file__), "intent_heldout.jsonl"),
+}
+
+
+def legacy_route(text: str, step: str) -> str:
+    """Keyword detection as it was in POAgent.process_message / LangChainPOAgent._is_question"""
+    lowered = text.lower()
+    if step is None:
+        words = ["how many", "what", "show", "list", "count", "tell me", "where", "which", "give me"]
+    else:
+        words = ["how", "what", "show", "list", "give", "count", "tell", "where"]
+    is_question = any(lowered.startswith(w) for w in words) or "?" in text
+    return "question" if is_question else "step_input"
+
+
+def load_labels(path: str) -> List[Dict]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(examples: List[Dict], predict) -> Dict:
+    """predict(example) -> (intent, llm_calls); intent None means left to an LLM fallback that wasn't called"""
+    result = {"total": len(examples), "misroutes": 0, "unresolved": 0, "wasted_llm_calls": 0, "llm_calls": 0,
+              "errors": [], "unresolved_cases": []}
+    for example in examples:
+        intent, llm_calls = predict(example)
+        result["llm_calls"] += llm_calls
+        if intent is None:
+            result["unresolved"] += 1
+            result["unresolved_cases"].append((example["step"], example["text"], example["intent"]))
+            continue
+        if intent == "question":
+            result["llm_calls"] += 1  # SQL generation
+        if intent != example["intent"]:
+            result["misroutes"] += 1
+            result["errors"].append((example["step"], example["text"], example["intent"], intent))
+            if intent == "question":
+                result["wasted_llm_calls"] += 1
+    correct = result["total"] - result["misroutes"] - result["unresolved"]
+    result["accuracy"] = round(correct / max(result["total"], 1), 3)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm", action="store_true", help="call the LLM fallback for low-confidence messages")
+    parser.add_argument("--threshold", type=float, help="router confidence threshold")
+    parser.add_argument("--set", choices=["all", *LABEL_SETS], default="all", help="labelled set(s) to evaluate")
+    parser.add_argument("--verbose", action="store_true", help="print every misroute and unresolved message")
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    from backend.intent_router import IntentRouter
+
+    router = IntentRouter(threshold=args.threshold, llm_fallback=args.llm)
+
+    def predict_router(example):
+        decision = router.score(example["text"], example["step"])
+        if decision["confidence"] >= router.threshold:
+            return decision["intent"], 0
+        if args.llm:
+            return router._ask_llm(example["text"], example["step"]) or decision["intent"], 1
+        return None, 1
+
+    report = {}
+    for label_set, path in LABEL_SETS.items():
+        if args.set not in ("all", label_set):
+            continue
+        examples = load_labels(path)
+        report[label_set] = {
+            "legacy": evaluate(examples, lambda e: (legacy_route(e["text"], e["step"]), 0)),
+            "router": evaluate(examples, predict_router),
+        }
+
+        print(f"\n{label_set}: {len(examples)} labelled messages, threshold {router.threshold}")
+        print(f"{'':8} {'accuracy':>9} {'misroutes':>10} {'unresolved':>11} {'wasted LLM':>11} {'LLM calls':>10}")
+        for name, result in report[label_set].items():
+            print(f"{name:8} {result['accuracy']:>9} {result['misroutes']:>10} {result['unresolved']:>11} "
+                  f"{result['wasted_llm_calls']:>11} {result['llm_calls']:>10}")
+            if args.verbose:
+                for step, text, expected, got in result["errors"]:
+                    print(f"    [{step}] {text!r}: expected {expected}, got {got}")
+                for step, text, expected in result["unresolved_cases"]:
+                    print(f"    [{step}] {text!r}: expected {expected}, unresolved (LLM fallback)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Concurrent load test for the PO agents
+
+Simulates N buyers walking through a full POAgent conversation with random
+think time, at increasing concurrency levels, and reports where the node
+saturates:
+- throughput (turns/s) and p50/p95/p99 turn latency
+- DB pool checkout waits (QueuePool)
+- LLM concurrency waits (stubbed Bedrock with a throughput limit)
+- GIL contention (scheduling delay of a probe thread)
+and the knee point where adding users stops adding throughput.
+
+By default Bedrock is stubbed and the DB is a seeded SQLite file, so the test
+runs anywhere. Use --database-url for a local MySQL with the real schema, or
+--url to drive a running API service (api/server.py) instead of in-process.
+
+Run with: python benchmarks/load_test.py --users 1,2,4,8,16 --conversations 3
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+CONVERSATION = [
+    "Create PO", "Avians Steel", "Regular Purchase", "INR", "Noida Plant",
+    "Central Purchasing", "Raw Materials", "skip", "MS Pipe", "10", "100",
+    "no", "skip", "yes",
+]
+
+SEED_SQL = [
+    "CREATE TABLE supplier_details (id INTEGER PRIMARY KEY, supplier_name TEXT, emailID TEXT, mobile TEXT)",
+    "CREATE TABLE plants (id INTEGER PRIMARY KEY, plant_name TEXT, plant_code TEXT, name TEXT, code TEXT)",
+    "CREATE TABLE materials (id INTEGER PRIMARY KEY, name TEXT, code TEXT, price REAL)",
+    "CREATE TABLE purchase_organization (id INTEGER PRIMARY KEY, code TEXT, description TEXT)",
+    "CREATE TABLE purchase_groups (id INTEGER PRIMARY KEY, code TEXT, name TEXT, status TEXT DEFAULT '1')",
+    "CREATE TABLE currencies (id INTEGER PRIMARY KEY, code TEXT, name TEXT)",
+    "CREATE TABLE payment_terms (id INTEGER PRIMARY KEY, code TEXT, name TEXT)",
+    """CREATE TABLE independent_purchase_orders (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, po_number TEXT UNIQUE, po_date TEXT, validity_date TEXT,
+        po_type TEXT, supplier_id TEXT, supplier_name TEXT, currency TEXT,
+        purchase_org_id INTEGER, purchase_org_code TEXT, plant_id INTEGER, plant_code TEXT,
+        purchase_group_id INTEGER, purchase_group_code TEXT, project_name TEXT,
+        payment_term_code TEXT, inco_term_code TEXT, remarks TEXT, line_items TEXT,
+        total_amount REAL, status TEXT, created_at TEXT DEFAULT CURRENT_TIMESTAMP)""",
+]
+
+
+def seed_sqlite(path: str, suppliers: int = 2000, materials: int = 5000):
+    """Create a SQLite DB with the tables and master data POAgent touches (and writes on PO insert)"""
+    import sqlite3
+
+    conn = sqlite3.connect(path)
+    for statement in SEED_SQL:
+        conn.execute(statement)
+    conn.executemany("INSERT INTO supplier_details (supplier_name, emailID, mobile) VALUES (?, ?, ?)",
+                     [("Avians Steel", "sales@avians.test", "999")] +
+                     [(f"Supplier {i}", f"s{i}@test", str(i)) for i in range(suppliers)])
+    conn.executemany("INSERT INTO plants (plant_name, plant_code, name, code) VALUES (?, ?, ?, ?)",
+                     [(n, c, n, c) for n, c in [("Noida Plant", "P01"), ("Delhi Plant", "P02"), ("Mumbai Plant", "P03")]])
+    conn.executemany("INSERT INTO materials (name, code, price) VALUES (?, ?, ?)",
+                     [("MS Pipe", "M01", 100)] + [(f"Material {i}", f"M{i:05}", i % 500) for i in range(materials)])
+    conn.executemany("INSERT INTO purchase_organization (code, description) VALUES (?, ?)",
+                     [("1000", "Central Purchasing"), ("2000", "Regional Purchasing")])
+    conn.executemany("INSERT INTO purchase_groups (code, name) VALUES (?, ?)",
+                     [("001", "Raw Materials"), ("002", "Services")])
+    conn.executemany("INSERT INTO currencies (code, name) VALUES (?, ?)", [("INR", "Rupee"), ("USD", "Dollar")])
+    conn.commit()
+    conn.close()
+
+    # Tables every PO insert also writes to, created with the app's own DDL
+    from sqlalchemy import create_engine
+    from backend.po_defaults import create_defaults_table
+    from backend.spend_summary import create_summary_tables
+
+    engine = create_engine(f"sqlite:///{path}")
+    create_summary_tables(engine)
+    create_defaults_table(engine)
+    engine.dispose()
+
+
+class StubBedrockClient:
+    """bedrock-runtime stand-in: fixed latency, limited concurrent requests"""
+
+    def __init__(self, latency: float, concurrency: int, stats: "Stats"):
+        self.latency = latency
+        self.slots = threading.Semaphore(concurrency)
+        self.stats = stats
+
+    def invoke_model(self, modelId: str, body: str):
+        prompt = json.loads(body)["messages"][0]["content"]
+        if "Extract Purchase Order entities" in prompt:
+            text = '{"intent": "create_po"}'
+        elif "Classify the user's message" in prompt:
+            text = "step_input"
+        elif "SQL expert" in prompt:
+            text = "SELECT id, plant_name FROM plants LIMIT 10"
+        else:
+            text = "OK"
+
+        wait_start = time.perf_counter()
+        with self.slots:
+            self.stats.add("llm_wait", time.perf_counter() - wait_start)
+            # Jitter so calls don't move in lockstep
+            time.sleep(random.uniform(0.8, 1.2) * self.latency)
+        payload = json.dumps({"content": [{"text": text}]}).encode("utf-8")
+
+        class _Body:
+            def read(self_inner):
+                return payload
+
+        return {"body": _Body()}
+
+
+class Stats:
+    """Thread-safe sample collector"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = {}
+
+    def add(self, name: str, value: float):
+        with self._lock:
+            self.samples.setdefault(name, []).append(value)
+
+    def percentile(self, name: str, pct: float) -> float:
+        values = sorted(self.samples.get(name, []))
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))]
+
+
+def instrument_pool(engine, stats: Stats):
+    """Record how long each connection checkout waits on the pool"""
+    pool = engine.pool
+    original_connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return original_connect()
+        finally:
+            stats.add("db_pool_wait", time.perf_counter() - start)
+
+    pool.connect = timed_connect
+
+
+def gil_probe(stats: Stats, stop: threading.Event, interval: float = 0.005):
+    """Sleep-wake probe: oversleeping beyond the interval is time spent waiting for the GIL"""
+    while not stop.is_set():
+        start = time.perf_counter()
+        time.sleep(interval)
+        stats.add("gil_delay", max(0.0, time.perf_counter() - start - interval))
+
+
+def run_conversation_in_process(stats: Stats, think_time: float):
+    from backend.agent import POAgent
+
+    agent = POAgent()
+    for message in CONVERSATION:
+        start = time.perf_counter()
+        agent.process_message(message)
+        stats.add("turn", time.perf_counter() - start)
+        time.sleep(random.expovariate(1 / think_time) if think_time > 0 else 0)
+
+
+def run_conversation_service(stats: Stats, think_time: float, url: str):
+    def post(path: str, payload: Dict) -> Dict:
+        request = urllib.request.Request(
+            url.rstrip("/") + path, data=json.dumps(payload).encode("utf-8"),
+            headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=120) as response:
+            return json.loads(response.read())
+
+    conversation_id = post("/conversations", {"backend": "po"})["conversation_id"]
+    for message in CONVERSATION:
+        start = time.perf_counter()
+        post(f"/conversations/{conversation_id}/messages", {"text": message})
+        stats.add("turn", time.perf_counter() - start)
+        time.sleep(random.expovariate(1 / think_time) if think_time > 0 else 0)
+
+
+def run_level(users: int, conversations: int, think_time: float, url: str = None) -> Dict:
+    stats = Stats()
+    # The stubbed LLM and pool instrumentation report to the active level
+    _INSTRUMENTED["stats"] = stats
+
+    stop = threading.Event()
+    probe = threading.Thread(target=gil_probe, args=(stats, stop), daemon=True)
+    probe.start()
+
+    def user_loop(_):
+        for _ in range(conversations):
+            try:
+                if url:
+                    run_conversation_service(stats, think_time, url)
+                else:
+                    run_conversation_in_process(stats, think_time)
+            except Exception as e:
+                stats.add("errors", 1)
+                print(f"[WARN] conversation failed: {e}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as pool:
+        list(pool.map(user_loop, range(users)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+
+    turns = len(stats.samples.get("turn", []))
+    return {
+        "users": users,
+        "turns": turns,
+        "errors": len(stats.samples.get("errors", [])),
+        "throughput": round(turns / elapsed, 2),
+        "p50_ms": round(stats.percentile("turn", 50) * 1000, 1),
+        "p95_ms": round(stats.percentile("turn", 95) * 1000, 1),
+        "p99_ms": round(stats.percentile("turn", 99) * 1000, 1),
+        "db_pool_wait_p95_ms": round(stats.percentile("db_pool_wait", 95) * 1000, 1),
+        "llm_wait_p95_ms": round(stats.percentile("llm_wait", 95) * 1000, 1),
+        "gil_delay_p99_ms": round(stats.percentile("gil_delay", 99) * 1000, 1),
+    }
+
+
+# Mutable holder so the patched factory / pool always report to the active level
+_INSTRUMENTED: Dict = {}
+
+
+def setup_in_process(args):
+    """Point the backend at the embedded DB and stubbed Bedrock (before any backend import)"""
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        path = os.path.join(tempfile.mkdtemp(prefix="po_load_"), "load.db")
+        seed_sqlite(path)
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+        print(f"Seeded embedded DB at {path}")
+
+    import backend.llm
+    import backend.sql_agent
+    from backend.database import get_engine
+
+    class _ProxyStats:
+        def add(self, name, value):
+            _INSTRUMENTED["stats"].add(name, value)
+
+    proxy = _ProxyStats()
+    shared_client = StubBedrockClient(args.llm_latency, args.llm_concurrency, proxy)
+    backend.llm.create_bedrock_client = lambda: shared_client
+    backend.sql_agent.create_bedrock_client = lambda: shared_client
+
+    if args.pool_size:
+        from sqlalchemy import create_engine
+        import backend.database
+        backend.database._engine = create_engine(
+            os.environ["DATABASE_URL"], pool_size=args.pool_size, max_overflow=0
+        )
+    instrument_pool(get_engine(), proxy)
+
+
+def find_knee(levels: List[Dict]) -> Dict:
+    """First level where adding users yields < half of the ideal throughput gain"""
+    for prev, current in zip(levels, levels[1:]):
+        ideal_gain = current["users"] / prev["users"]
+        actual_gain = current["throughput"] / prev["throughput"] if prev["throughput"] else 0
+        if actual_gain - 1 < (ideal_gain - 1) / 2:
+            return prev
+    return levels[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", default="1,2,4,8,16", help="comma separated concurrency levels")
+    parser.add_argument("--conversations", type=int, default=2, help="conversations per user per level")
+    parser.add_argument("--think-time", type=float, default=0.2, help="mean seconds between turns")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="stubbed Bedrock latency (s)")
+    parser.add_argument("--llm-concurrency", type=int, default=8, help="stubbed Bedrock concurrent requests")
+    parser.add_argument("--pool-size", type=int, default=5, help="DB pool size (0 = engine default)")
+    parser.add_argument("--database-url", help="use this DB (e.g. local MySQL) instead of embedded SQLite")
+    parser.add_argument("--url", help="drive a running API service instead of in-process agents")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    if not args.url:
+        setup_in_process(args)
+
+    levels = []
+    print(f"{'users':>5} {'turns':>6} {'err':>4} {'turns/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'pool p95':>9} {'llm p95':>8} {'gil p99':>8}")
+    for users in [int(u) for u in args.users.split(",")]:
+        result = run_level(users, args.conversations, args.think_time, args.url)
+        levels.append(result)
+        print(f"{result['users']:>5} {result['turns']:>6} {result['errors']:>4} {result['throughput']:>8} "
+              f"{result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} "
+              f"{result['db_pool_wait_p95_ms']:>9} {result['llm_wait_p95_ms']:>8} {result['gil_delay_p99_ms']:>8}")
+
+    knee = find_knee(levels)
+    peak = max(level["throughput"] for level in levels) or 1
+    print("\nThroughput curve:")
+    for level in levels:
+        bar = "█" * int(40 * level["throughput"] / peak)
+        marker = "  ◀ knee" if level is knee else ""
+        print(f"{level['users']:>5} users | {bar} {level['throughput']}{marker}")
+
+    # Name the resource that is waiting the most at the knee
+    waits = {
+        "DB pool": knee["db_pool_wait_p95_ms"],
+        "LLM concurrency": knee["llm_wait_p95_ms"],
+        "GIL": knee["gil_delay_p99_ms"],
+    }
+    bottleneck = max(waits, key=waits.get)
+    print(f"\nKnee at {knee['users']} users ({knee['throughput']} turns/s, p95 {knee['p95_ms']} ms); "
+          f"largest wait: {bottleneck} ({waits[bottleneck]} ms)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"levels": levels, "knee": knee}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
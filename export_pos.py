@@ -0,0 +1,37 @@
+"""
+Export purchase orders (one row per line item) to CSV, JSONL or Parquet
+
+    python export_pos.py pos_2025_q1.csv --from 2025-01-01 --to 2025-03-31
+    python export_pos.py pos.parquet --supplier "Avians" --status Created
+    python export_pos.py - --format jsonl | gzip > pos.jsonl.gz
+"""
+import argparse
+import os
+
+from backend.po_export import EXPORT_CHUNK_ROWS, FORMATS, export_pos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export independent POs with line items")
+    parser.add_argument("out", help="Output file, or - for stdout (csv/jsonl)")
+    parser.add_argument("--format", choices=FORMATS, help="Default: from the file extension, else csv")
+    parser.add_argument("--from", dest="date_from", help="PO date from (YYYY-MM-DD, inclusive)")
+    parser.add_argument("--to", dest="date_to", help="PO date to (YYYY-MM-DD, inclusive)")
+    parser.add_argument("--supplier", help="Supplier ID, or part of the supplier name")
+    parser.add_argument("--status", help="PO status, e.g. Created")
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_ROWS, help="POs fetched per chunk")
+    args = parser.parse_args()
+
+    fmt = args.format or os.path.splitext(args.out)[1].lstrip(".").lower()
+    if fmt not in FORMATS:
+        fmt = "csv"
+    try:
+        export_pos(args.out, fmt, date_from=args.date_from, date_to=args.date_to,
+                   supplier=args.supplier, status=args.status, chunk_size=args.chunk_size)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,25 @@
 import streamlit as st
 import sys
 import os
+import uuid
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from backend.agent import POAgent
+from backend.prefetch import get_prefetcher
+from backend.profiler import PROFILE_ON_REQUEST, start_profile
 from backend.tools import POTools
+from backend.state_store import get_state_store
+from backend.tracing import start_span
+from backend.warmup import readiness_label, start_warmup
 
 # Initialize tools
 tools = POTools()
+state_store = get_state_store()
+prefetcher = get_prefetcher()
+# Connections, LLM client and master data load in the background (once per process)
+start_warmup("po")
 
 # Page config
 st.set_page_config(
@@ -151,7 +161,7 @@ def get_next_step_options(step, response, last_user_input):
              options = [{"name": s["name"], "id": s["id"]} for s in suppliers]
              response += "\n\n**Select One:**"
         else:
-             suppliers = tools.search_suppliers("")
+             suppliers = prefetcher.get(conversation_id, step)
              options = [{"name": s["name"], "id": s["id"]} for s in suppliers]
              response += "\n\n**Select Supplier:**"
 
@@ -171,12 +181,17 @@ def get_next_step_options(step, response, last_user_input):
         
     # 3. Currency
     elif step == "header_currency":
-        currencies = tools.get_currencies()
+        currencies = prefetcher.get(conversation_id, step)
         options = [{"name": c["code"], "id": c["id"]} for c in currencies]
         if not options:
              options = [{"name": "INR", "id": "inr"}, {"name": "USD", "id": "usd"}, {"name": "EUR", "id": "eur"}]
         response += "\n\n**Select Currency:**"
         
+    # 3b. Usual settings for this supplier
+    elif step == "accept_defaults":
+        options = [{"name": "Yes, use these", "id": "yes"}, {"name": "No, choose each", "id": "no"}]
+        response += "\n\n**Use usual settings?**"
+        
     # 4. Plant
     elif step == "org_plant":
         if "multiple matches" in response.lower():
@@ -184,7 +199,7 @@ def get_next_step_options(step, response, last_user_input):
             options = [{"name": p["name"], "id": p["id"]} for p in plants]
             response += "\n\n**Select One:**"
         else:
-            plants = tools.search_plants("")
+            plants = prefetcher.get(conversation_id, step)
             options = [{"name": p["name"], "id": p["id"]} for p in plants]
             response += "\n\n**Select Plant:**"
         
@@ -195,7 +210,7 @@ def get_next_step_options(step, response, last_user_input):
             options = [{"name": o["name"], "id": o["id"]} for o in orgs]
             response += "\n\n**Select One:**"
         else:
-            orgs = tools.search_purchase_orgs("")
+            orgs = prefetcher.get(conversation_id, step)
             options = [{"name": o["name"], "id": o["id"]} for o in orgs]
             response += "\n\n**Select Purchase Org:**"
         
@@ -206,7 +221,7 @@ def get_next_step_options(step, response, last_user_input):
             options = [{"name": g["name"], "id": g["id"]} for g in groups]
             response += "\n\n**Select One:**"
         else:
-            groups = tools.search_purchase_groups("")
+            groups = prefetcher.get(conversation_id, step)
             options = [{"name": g["name"], "id": g["id"]} for g in groups]
             response += "\n\n**Select Purchase Group:**"
         
@@ -217,10 +232,17 @@ def get_next_step_options(step, response, last_user_input):
             options = [{"name": m["name"], "id": m["id"]} for m in materials]
             response += "\n\n**Select One:**"
         else:
-            materials = tools.search_materials("")
+            materials = prefetcher.get(conversation_id, step)
             options = [{"name": m["name"], "id": m["id"]} for m in materials]
             response += "\n\n**Select Material:**"
         
+    # 7b. Ambiguous material from a multi-item message
+    elif step == "item_resolve":
+        candidates = agent.state["item_queue"][0]["candidates"]
+        options = [{"name": m["name"], "id": m["id"]} for m in candidates]
+        options.append({"name": "Skip", "id": "skip"})
+        response += "\n\n**Select One:**"
+        
     # 8. Add More / Confirm
     elif step == "add_more_check":
         options = [{"name": "Yes", "id": "y"}, {"name": "No", "id": "n"}]
@@ -229,41 +251,84 @@ def get_next_step_options(step, response, last_user_input):
         options = [{"name": "Yes, Create PO", "id": "yes"}, {"name": "Cancel", "id": "cancel"}]
         response += "\n\n**Confirm:**"
         
+    # Load the lists of the next steps while the user reads this one
+    prefetcher.after_transition(conversation_id, step)
     return options, response
 
-# Initialize agent in session state
-if "agent" not in st.session_state:
-    st.session_state.agent = POAgent()
-    st.session_state.messages = []
-    st.session_state.pending_options = None
-    
-    # Add welcome message
-    welcome_msg = "👋 Hi! I'll help you create an **Independent Purchase Order**.\n\nWe'll go through:\n1. Header (Supplier, Type, Currency)\n2. Org Data (Plant, Purch Org, Group)\n3. Line Items\n\nType 'start' or just say 'Create PO' to begin!"
-    st.session_state.messages.append({
-        "role": "assistant",
-        "content": welcome_msg
-    })
+WELCOME_MSG = "👋 Hi! I'll help you create an **Independent Purchase Order**.\n\nWe'll go through:\n1. Header (Supplier, Type, Currency)\n2. Org Data (Plant, Purch Org, Group)\n3. Line Items\n\nType 'start' or just say 'Create PO' to begin!"
+
+# Conversation state lives in the state store, keyed by the id in the URL,
+# so any worker can pick the conversation up and session memory stays tiny
+if "cid" not in st.query_params:
+    st.query_params["cid"] = uuid.uuid4().hex
+conversation_id = st.query_params["cid"]
+
+# A run that ended early (exception, st.stop, interrupted rerun) left its span and profile open
+leftover = st.session_state.pop("open_run", None)
+if leftover:
+    leftover[0].end()
+    leftover[1].stop("render")
+
+# One trace per script run (TRACE_FILE); turns, queries and LLM calls nest under it
+rerun_span = start_span("streamlit.rerun", new_trace=True, app="po", conversation_id=conversation_id)
+# Sampling profile of this script run, when switched on in the sidebar (or ?profile=1)
+# and PROFILE_ON_REQUEST allows it, or for every run with PROFILE_TURNS
+profiler = start_profile("po", conversation_id,
+                         enabled=st.session_state.get("profile_turns", False) or st.query_params.get("profile") == "1")
+st.session_state["open_run"] = (rerun_span, profiler)
+
+def rerun():
+    """End this run's span and profile (a processed turn), then rerun the script"""
+    rerun_span.end()
+    profiler.stop("turn")
+    st.session_state.pop("open_run", None)
+    st.rerun()
+
+def current_user():
+    """Signed-in user's email when Streamlit auth is configured (for per-user PO defaults)"""
+    try:
+        return st.user.get("email") if st.user.is_logged_in else None
+    except Exception:
+        return None
+
+saved = state_store.load(conversation_id)
+if saved:
+    agent = POAgent(state=saved["agent"], user=current_user())
+    messages = saved["messages"]
+else:
+    agent = POAgent(user=current_user())
+    messages = [{"role": "assistant", "content": WELCOME_MSG}]
+
+# Profiles are grouped by the step the run started at (the one a turn answers)
+profiler.set_step(agent.state["step"])
+
+# Covers new conversations and ones resumed on this worker (no-op when already cached)
+prefetcher.after_transition(conversation_id, agent.state["step"])
+
+def save_conversation():
+    """Persist agent state and chat messages for this conversation"""
+    state_store.save(conversation_id, {"agent": agent.export_state(), "messages": messages})
 
 # Sidebar with minimal info
 with st.sidebar:
     st.header("ℹ️ About")
     st.write("This chatbot helps you create Purchase Orders in SupplierX.")
+    st.caption(readiness_label())
+    prefetch = prefetcher.stats()
+    if prefetch["hit_rate"] is not None:
+        st.caption(f"Option lists served from prefetch: {prefetch['hit_rate']:.0%}")
+    if PROFILE_ON_REQUEST:
+        st.toggle("Profile turns", key="profile_turns", help="Write a sampling profile of each run to PROFILE_DIR")
     
     st.header("🔄 Actions")
     if st.button("🔄 Restart Conversation", use_container_width=True):
-        st.session_state.agent = POAgent()
-        st.session_state.messages = []
-        st.session_state.pending_options = None
-        welcome_msg = "👋 Hi! I'll help you create an **Independent Purchase Order**.\n\nWe'll go through:\n1. Header (Supplier, Type, Currency)\n2. Org Data (Plant, Purch Org, Group)\n3. Line Items\n\nType 'start' or just say 'Create PO' to begin!"
-        st.session_state.messages.append({
-            "role": "assistant",
-            "content": welcome_msg
-        })
-        st.rerun()
+        state_store.delete(conversation_id)
+        prefetcher.forget(conversation_id)
+        rerun()
     
     st.divider()
     st.header("📊 Current State")
-    state = st.session_state.agent.state
+    state = agent.state
     
     # Flatten for display
     display_state = {
@@ -276,7 +341,7 @@ with st.sidebar:
 
 # Display chat history in a fixed container
 with st.container(height=600, border=False):
-    for i, message in enumerate(st.session_state.messages):
+    for i, message in enumerate(messages):
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
             
@@ -295,14 +360,14 @@ with st.container(height=600, border=False):
                     )
                     
                     if st.button("Confirm Selection", key=f"confirm_{i}"):
-                        st.session_state.messages.append({
+                        messages.append({
                             "role": "user",
                             "content": selected_name
                         })
-                        response = st.session_state.agent.process_message(selected_name)
+                        response = agent.process_message(selected_name)
                         
                         # Get options for next step
-                        next_step = st.session_state.agent.state["step"]
+                        next_step = agent.state["step"]
                         next_options, response = get_next_step_options(next_step, response, selected_name)
                         
                         msg = {
@@ -312,8 +377,9 @@ with st.container(height=600, border=False):
                         if next_options:
                             msg["options"] = next_options
                             
-                        st.session_state.messages.append(msg)
-                        st.rerun()
+                        messages.append(msg)
+                        save_conversation()
+                        rerun()
                 
                 else:
                     # Few options, use buttons
@@ -329,16 +395,16 @@ with st.container(height=600, border=False):
                             ):
                                 # User clicked an option
                                 user_msg = option["name"]
-                                st.session_state.messages.append({
+                                messages.append({
                                     "role": "user",
                                     "content": user_msg
                                 })
                                 
                                 # Process the selection
-                                response = st.session_state.agent.process_message(user_msg)
+                                response = agent.process_message(user_msg)
                                 
                                 # Get options for next step
-                                next_step = st.session_state.agent.state["step"]
+                                next_step = agent.state["step"]
                                 next_options, response = get_next_step_options(next_step, response, user_msg)
                                 
                                 msg = {
@@ -348,25 +414,26 @@ with st.container(height=600, border=False):
                                 if next_options:
                                     msg["options"] = next_options
                                 
-                                st.session_state.messages.append(msg)
+                                messages.append(msg)
+                                save_conversation()
                                 
-                                st.rerun()
+                                rerun()
 
 # Chat input at bottom
 if prompt := st.chat_input("Type your message..."):
     # Add user message to history
-    st.session_state.messages.append({
+    messages.append({
         "role": "user",
         "content": prompt
     })
     
     # Get bot response
-    response = st.session_state.agent.process_message(prompt)
+    response = agent.process_message(prompt)
     
     # Check state to show relevant buttons
     options = None
-    last_user_input = st.session_state.messages[-2]["content"] if len(st.session_state.messages) > 1 else ""
-    step = st.session_state.agent.state["step"]
+    last_user_input = messages[-2]["content"] if len(messages) > 1 else ""
+    step = agent.state["step"]
     
     # Use helper to get options
     options, response = get_next_step_options(step, response, last_user_input)
@@ -379,8 +446,12 @@ if prompt := st.chat_input("Type your message..."):
     if options:
         msg["options"] = options
     
-    st.session_state.messages.append(msg)
+    messages.append(msg)
+    save_conversation()
     
     # Rerun to update chat
-    st.rerun()
+    rerun()
 
+rerun_span.end()
+profiler.stop("render")
+st.session_state.pop("open_run", None)
@@ -1,48 +1,46 @@
+import sys
+
 from backend.database import engine
+from backend.po_reader import get_po_reader
 from sqlalchemy import text
-import json
 
-def get_latest_po():
+def get_po_details(po_numbers):
+    """Print the given POs, or the latest one if none are given"""
     try:
-        with engine.connect() as conn:
-            # Check Org and Group
-            org = conn.execute(text("SELECT id, code FROM purchase_organization LIMIT 1")).fetchone()
-            group = conn.execute(text("SELECT id, code FROM purchase_groups LIMIT 1")).fetchone()
-            
-            print(f"Org: ID={org[0]} (Type: {type(org[0])})")
-            print(f"Group: ID={group[0]} (Type: {type(group[0])})")
-            
-            if result:
-                # Convert row to dict
-                columns = result._mapping.keys()
-                po_data = dict(zip(columns, result))
-                
-                print(f"\n✅ Found Latest PO: {po_data['po_number']}")
-                print("-" * 30)
-                print(f"ID: {po_data['id']}")
-                print(f"Date: {po_data['po_date']}")
-                print(f"Supplier: {po_data['supplier_name']} ({po_data['supplier_id']})")
-                print(f"Plant: {po_data['plant_code']}")
-                print(f"Org: {po_data['purchase_org_code']}")
-                print(f"Group: {po_data['purchase_group_code']}")
-                print(f"Total Amount: {po_data['currency']} {po_data['total_amount']}")
-                print(f"Status: {po_data['status']}")
-                print("-" * 30)
-                
-                # Parse Line Items
-                if po_data['line_items']:
-                    try:
-                        items = json.loads(po_data['line_items'])
-                        print("\nLine Items:")
-                        for item in items:
-                            print(f" - {item['material_name']} (Qty: {item['quantity']}) @ {item['price']}")
-                    except:
-                        print(f"Raw Line Items: {po_data['line_items']}")
-            else:
+        if not po_numbers:
+            with engine.connect() as conn:
+                latest = conn.execute(text(
+                    "SELECT po_number FROM independent_purchase_orders ORDER BY id DESC LIMIT 1"
+                )).fetchone()
+            if not latest:
                 print("❌ No Purchase Orders found in 'independent_purchase_orders' table.")
-                
+                return
+            po_numbers = [latest[0]]
+
+        for po_number, po_data in get_po_reader().get_many(po_numbers).items():
+            if po_data is None:
+                print(f"\n❌ No purchase order found with PO Number: {po_number}")
+                continue
+
+            print(f"\n✅ Found PO: {po_data['po_number']}")
+            print("-" * 30)
+            print(f"Date: {po_data['po_date']}")
+            print(f"Supplier: {po_data['supplier_name']} ({po_data['supplier_id']})")
+            print(f"Plant: {po_data['plant_code']}")
+            print(f"Org: {po_data['purchase_org_code']}")
+            print(f"Group: {po_data['purchase_group_code']}")
+            print(f"Total Amount: {po_data['currency']} {po_data['total_amount']}")
+            print(f"Status: {po_data['status']}")
+            print("-" * 30)
+
+            if po_data['line_items']:
+                print("\nLine Items:")
+                for item in po_data['line_items']:
+                    print(f" - {item['material_name']} (Qty: {item['quantity']}) @ {item['price']}")
+
     except Exception as e:
         print(f"Error fetching PO: {e}")
 
 if __name__ == "__main__":
-    get_latest_po()
+    # python get_po_details.py [PO_NUMBER ...]
+    get_po_details(sys.argv[1:])
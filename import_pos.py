@@ -0,0 +1,45 @@
+"""
+Import purchase orders from a CSV or XLSX spreadsheet
+
+    python import_pos.py requisitions.csv
+    python import_pos.py requisitions.xlsx --dry-run --report report.json
+
+See backend/po_import.py for the columns and how rows are grouped into POs.
+"""
+import argparse
+import json
+
+from backend.po_import import IMPORT_BATCH_ROWS, import_pos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import POs from CSV/XLSX")
+    parser.add_argument("path", help="CSV or XLSX file")
+    parser.add_argument("--format", choices=["csv", "xlsx"], help="Default: from the file extension")
+    parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_ROWS, help="Rows resolved and written per batch")
+    parser.add_argument("--dry-run", action="store_true", help="Validate only, create nothing")
+    parser.add_argument("--report", help="Write the full report (PO numbers, errors) as JSON")
+    args = parser.parse_args()
+
+    try:
+        report = import_pos(args.path, fmt=args.format, batch_size=args.batch_size, dry_run=args.dry_run)
+    except (OSError, ValueError) as e:
+        print(f"❌ Error: {e}")
+        raise SystemExit(1)
+
+    verb = "would be created" if args.dry_run else "created"
+    print(f"✅ {report['rows']} rows in {report['seconds']}s ({report['rows_per_sec']} rows/s), "
+          f"{report['pos_created']} POs {verb}, {report['pos_already_imported']} already imported, "
+          f"{report['error_count']} row errors")
+    for error in report["errors"][:20]:
+        print(f"   row {error['row']}: {error['error']}")
+    if report["error_count"] > 20:
+        print(f"   ... {report['error_count'] - 20} more")
+
+    if args.report:
+        with open(args.report, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
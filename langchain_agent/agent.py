@@ -4,27 +4,14 @@ Uses LangChain's Agent framework with custom tools
 """
 import json
 from typing import Dict, List, Optional
-from langchain.agents import AgentExecutor, create_tool_calling_agent
-from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage
 
-from langchain_agent.llm import get_llm_with_credentials
-from langchain_agent.tools import ALL_TOOLS
-from langchain_agent.sql_chain import get_sql_chain
+from backend.intent_router import get_intent_router
+from backend.tracing import span
+from langchain_agent.dispatcher import dispatch
+from langchain_agent.history import ChatHistory
 
 
-class LangChainPOAgent:
-    """LangChain-based PO Agent with conversation memory"""
-    
-    def __init__(self):
-        self.llm = get_llm_with_credentials()
-        self.tools = ALL_TOOLS
-        self.chat_history: List = []
-        self.sql_chain = get_sql_chain()
-        
-        # Create the agent prompt
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", """You are a helpful Purchase Order assistant for SupplierX.
+SYSTEM_PROMPT = """You are a helpful Purchase Order assistant for SupplierX.
 
 Your job is to:
 1. **Create new Purchase Orders** by collecting required information
@@ -37,41 +24,97 @@ Your job is to:
 **Required Information for Creating PO:**
 - Supplier, PO Type, Currency, Plant, Purchase Organization, Purchase Group, Material/Service, Quantity, Unit Price
 
-**To retrieve PO details:** Use the get_po_details tool with the PO number (e.g., IND-PO-97591)
+**To retrieve PO details:** Use the get_po_details tool with the PO number (e.g., IND-PO-97591), or get_po_details_batch for several PO numbers at once
+
+**Search results** are ranked best match first and may be cut short. Prefer refining the search; use more_results only if the row you need is not shown.
+
+Always be helpful and guide the user step by step."""
 
-Always be helpful and guide the user step by step."""),
+
+# Shared executor: the LLM client, prompt and tools hold no per-conversation
+# data (chat history is passed on every invoke), so one copy serves all sessions.
+# LangChain itself is only imported when the executor is first needed.
+_executor = None
+
+
+def get_agent_executor():
+    """Get or create the shared AgentExecutor"""
+    global _executor
+    if _executor is None:
+        from langchain.agents import create_tool_calling_agent
+        from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+        from langchain_agent.executor import TOOL_TURN_DEADLINE_SECONDS, ConcurrentAgentExecutor
+        from langchain_agent.llm import get_llm_with_credentials
+        from langchain_agent.tools import ALL_TOOLS
+
+        llm = get_llm_with_credentials()
+        prompt = ChatPromptTemplate.from_messages([
+            ("system", SYSTEM_PROMPT),
             MessagesPlaceholder(variable_name="chat_history"),
             ("human", "{input}"),
             MessagesPlaceholder(variable_name="agent_scratchpad")
         ])
-        
-        # Create the agent
-        self.agent = create_tool_calling_agent(self.llm, self.tools, self.prompt)
-        
-        # Create the executor
-        self.agent_executor = AgentExecutor(
-            agent=self.agent,
-            tools=self.tools,
+        agent = create_tool_calling_agent(llm, ALL_TOOLS, prompt)
+        # Tool calls requested together run concurrently; the whole turn is time-boxed
+        _executor = ConcurrentAgentExecutor(
+            agent=agent,
+            tools=ALL_TOOLS,
             verbose=True,
             handle_parsing_errors=True,
-            max_iterations=5
+            max_iterations=5,
+            max_execution_time=TOOL_TURN_DEADLINE_SECONDS
         )
+    return _executor
+
+
+class LangChainPOAgent:
+    """LangChain-based PO Agent with bounded conversation memory"""
+    
+    def __init__(self, state: Optional[Dict] = None):
+        self.history = ChatHistory.from_state(state)
+    
+    @property
+    def agent_executor(self):
+        return get_agent_executor()
+    
+    @property
+    def tools(self) -> List:
+        return self.agent_executor.tools
+    
+    @property
+    def sql_chain(self):
+        from langchain_agent.sql_chain import get_sql_chain
+        return get_sql_chain()
+    
+    def export_state(self) -> Dict:
+        """Return the serializable conversation state"""
+        return self.history.to_state()
     
     def _is_question(self, text: str) -> bool:
-        """Check if the input is a data question"""
-        question_words = ["how many", "what", "show", "list", "count", "tell me", "where", "which", "give me"]
-        text_lower = text.lower()
-        return any(text_lower.startswith(w) or text_lower.startswith(w) for w in question_words) or "?" in text
+        """Check if the input is a data question (vs. a request for the agent)"""
+        return get_intent_router().route(text)["intent"] == "question"
     
     def process_message(self, user_input: str) -> str:
         """Process a user message and return the response"""
+        with span("langchain.turn") as current:
+            return self._process_message(user_input, current)
+
+    def _process_message(self, user_input: str, current) -> str:
+        # Single-tool requests ("details of IND-PO-97591") skip the LLM entirely
+        with span("langchain.dispatch"):
+            direct = dispatch(user_input)
+        if direct is not None:
+            current.set(route="dispatch")
+            self.history.add_turn(user_input, direct)
+            return direct
         
         # Check if it's a data question
         if self._is_question(user_input):
             try:
-                answer = self.sql_chain.run(user_input)
-                self.chat_history.append(HumanMessage(content=user_input))
-                self.chat_history.append(AIMessage(content=answer))
+                current.set(route="sql_chain")
+                with span("langchain.sql_chain"):
+                    answer = self.sql_chain.run(user_input)
+                self.history.add_turn(user_input, answer)
                 return answer
             except Exception as e:
                 print(f"[SQL Chain Error] {e}")
@@ -79,10 +122,12 @@ Always be helpful and guide the user step by step."""),
         
         try:
             # Run the agent
-            result = self.agent_executor.invoke({
-                "input": user_input,
-                "chat_history": self.chat_history
-            })
+            current.set(route="agent")
+            with span("langchain.agent"):
+                result = self.agent_executor.invoke({
+                    "input": user_input,
+                    "chat_history": self.history.messages()
+                })
             
             # Extract clean response
             raw_output = result.get("output", "I couldn't process that request.")
@@ -97,8 +142,7 @@ Always be helpful and guide the user step by step."""),
                 response = str(raw_output)
             
             # Update chat history
-            self.chat_history.append(HumanMessage(content=user_input))
-            self.chat_history.append(AIMessage(content=response))
+            self.history.add_turn(user_input, response)
             
             return response
             
@@ -108,4 +152,4 @@ Always be helpful and guide the user step by step."""),
     
     def reset(self):
         """Reset the conversation history"""
-        self.chat_history = []
+        self.history.clear()
@@ -0,0 +1,149 @@
+"""
+Deterministic answers for SQL results
+
+Most questions (lists, counts, lookups) are answered by rendering the result
+shape directly, with no second LLM call:
+- empty:       "No matching records found."
+- scalar:      one row, one column -> "**Total Spend:** 1,250,000.00"
+- single row:  one bullet per column
+- small table: Markdown table
+- large table: first rows as a table, plus totals of numeric columns
+  (left out when the SQL guard's LIMIT cut the result, as they would be partial;
+  the summary for narrative answers drops its sums then too)
+
+Only questions that need reasoning over the data (why, compare, trend,
+recommend...) go to the LLM, and then with a summary and a sample of the
+rows instead of every tuple.
+"""
+import os
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+MAX_TABLE_ROWS = int(os.getenv("ANSWER_TABLE_ROWS", "20"))
+SAMPLE_ROWS = int(os.getenv("ANSWER_SAMPLE_ROWS", "10"))
+
+NARRATIVE = re.compile(
+    r"\b(?:why|explain|reason|compare|comparison|versus|vs|trend|pattern|insight|analy[sz]e|analysis|"
+    r"recommend|suggest|should|summari[sz]e|summary|better|worse|difference|anomal\w*|unusual)\b",
+    re.IGNORECASE
+)
+
+
+def needs_narrative(question: str) -> bool:
+    """True when the question asks for reasoning rather than the data itself"""
+    return bool(NARRATIVE.search(question))
+
+
+def result_shape(rows: List[Dict]) -> str:
+    if not rows:
+        return "empty"
+    if len(rows) == 1:
+        return "scalar" if len(rows[0]) == 1 else "single_row"
+    return "small_table" if len(rows) <= MAX_TABLE_ROWS else "large_table"
+
+
+def format_answer(rows: List[Dict], truncated: bool = False) -> str:
+    """Render query results as Markdown according to their shape
+
+    `truncated`: the rows stop at a LIMIT the SQL guard imposed, so there are more.
+    """
+    shape = result_shape(rows)
+    if shape == "empty":
+        return "No matching records found."
+
+    if shape == "scalar":
+        column, value = next(iter(rows[0].items()))
+        return f"**{_label(column)}:** {_value(value)}"
+
+    if shape == "single_row":
+        return "\n".join(f"- **{_label(column)}:** {_value(value)}" for column, value in rows[0].items())
+
+    found = f"Found {len(rows)} results (the row limit, there may be more)" if truncated else f"Found {len(rows)} results"
+    output = f"{found}:\n\n" + _table(rows[:MAX_TABLE_ROWS])
+    if shape == "large_table":
+        output += f"\n_Showing the first {MAX_TABLE_ROWS} of {len(rows)} rows._"
+        # A sum over a cut-off result is not the total; ask for it with SUM() instead
+        totals = {} if truncated else _numeric_totals(rows)
+        if totals:
+            labels = {c: _label(c) if _label(c).startswith("Total") else f"Total {_label(c)}" for c in totals}
+            output += "\n\n" + "\n".join(f"- **{labels[c]}:** {_value(v)}" for c, v in totals.items())
+    return output
+
+
+def summarize_rows(rows: List[Dict], sample: int = SAMPLE_ROWS, truncated: bool = False) -> str:
+    """Compact description of a result for the LLM: size, column stats, sampled rows
+
+    With `truncated` the summary says more rows exist and gives no sums, so the
+    LLM does not report a partial sum as the total.
+    """
+    if not rows:
+        return "No rows."
+
+    columns = list(rows[0].keys())
+    if truncated:
+        lines = [f"First {len(rows)} rows only (row limit reached, more rows exist; totals unknown); "
+                 f"columns: {', '.join(columns)}"]
+    else:
+        lines = [f"{len(rows)} rows; columns: {', '.join(columns)}"]
+    for column in columns:
+        numbers = [float(r[column]) for r in rows if isinstance(r[column], (int, float, Decimal)) and not isinstance(r[column], bool)]
+        if numbers and len(numbers) == len(rows):
+            total = "" if truncated else f", sum {sum(numbers):g}"
+            lines.append(f"{column}: min {min(numbers):g}, max {max(numbers):g}{total}")
+        else:
+            distinct = {str(r[column]) for r in rows}
+            if len(distinct) < len(rows):
+                lines.append(f"{column}: {len(distinct)} distinct values")
+
+    # Evenly spaced sample so the head and the tail are both represented
+    step = max(1, len(rows) // sample)
+    sampled = rows[::step][:sample]
+    lines.append(f"Sample of {len(sampled)} rows:")
+    lines.extend(" | ".join(_value(r[c]) for c in columns) for r in sampled)
+    return "\n".join(lines)
+
+
+def _table(rows: List[Dict]) -> str:
+    headers = list(rows[0].keys())
+    output = "| " + " | ".join(headers) + " |\n"
+    output += "| " + " | ".join(["---"] * len(headers)) + " |\n"
+    for row in rows:
+        output += "| " + " | ".join(_value(row.get(h)).replace("|", "\\|") for h in headers) + " |\n"
+    return output
+
+
+def _numeric_totals(rows: List[Dict]) -> Dict:
+    totals = {}
+    for column in rows[0]:
+        # Ids and codes are numbers too, but their sum means nothing
+        if re.search(r"(?:^|_)(?:id|code|number|no)$", column, re.IGNORECASE):
+            continue
+        values = [r[column] for r in rows]
+        if all(isinstance(v, (int, float, Decimal)) and not isinstance(v, bool) for v in values):
+            totals[column] = sum(values)
+    return totals
+
+
+def _label(column: str) -> str:
+    """COUNT(*) -> Count, total_spend -> Total Spend"""
+    column = re.sub(r"\(\s*\*?\s*\)", "", column)
+    column = re.sub(r"[_()`*]+", " ", column).strip()
+    return column.title() or "Result"
+
+
+def _value(value) -> str:
+    if value is None:
+        return "-"
+    if isinstance(value, (bool, int)):
+        return str(value)
+    if isinstance(value, (float, Decimal)):
+        return f"{value:,.2f}"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(sep=" ") if isinstance(value, datetime) else value.isoformat()
+    return str(value)
@@ -0,0 +1,115 @@
+"""
+Direct tool dispatch for unambiguous requests
+
+"details of IND-PO-97591", "IND-PO-97591 and IND-PO-97592" or "search
+supplier Avians" map to exactly one tool, so they are answered by calling
+the tool directly instead of running the AgentExecutor loop (one or more
+LLM calls). Anything open-ended, or that mixes several requests, returns
+None and goes to the agent.
+"""
+import re
+import threading
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+PO_NUMBER = re.compile(r"\b(?:IND-)?PO-\d+\b", re.IGNORECASE)
+PO_DETAIL_CUES = re.compile(r"\b(?:details?|show|get|view|open|status|info|information|lookup|look up|fetch)\b|^\W*$")
+LIST_JOINERS = re.compile(r"\band\b|[,&]")
+# Requests that need the agent even if they mention a PO or a master-data entity
+AGENT_CUES = re.compile(r"\b(?:create|raise|new|add|change|update|cancel|copy|duplicate|order|buy|and|then|also)\b")
+
+SEARCH = re.compile(
+    r"^(?:please\s+)?(?:search|find|look\s*up|show|list|get)\s+(?:me\s+)?(?:for\s+)?(?:the\s+|all\s+)?"
+    r"(?P<entity>suppliers?|vendors?|plants?|materials?|purchase\s+org(?:anization)?s?|purchase\s+groups?)"
+    r"(?:\s+(?:named|called|matching|like|with\s+name))?(?:\s+(?P<query>.+?))?\s*[.?!]?$",
+    re.IGNORECASE
+)
+# "suppliers in Noida" is a filter the name search can't express
+FILTER_WORDS = re.compile(r"^(?:in|at|from|with|by|near|located|which|that|who|where|for|per|of)\b", re.IGNORECASE)
+# ... and neither is "suppliers sorted by spend" or "materials with the most orders"
+RANKING_WORDS = re.compile(
+    r"\b(?:sort(?:ed)?|rank(?:ed)?|by|top|bottom|most|least|highest|lowest|biggest|largest|smallest|"
+    r"spend|spent|count|total|sum|average|avg|number\s+of|how\s+many)\b",
+    re.IGNORECASE
+)
+PO_TYPES = re.compile(r"^(?:show|list|get|what\s+are)?\s*(?:the\s+|all\s+)?(?:available\s+)?po\s+types\??$", re.IGNORECASE)
+
+ENTITY_TOOLS = [
+    (re.compile(r"suppliers?|vendors?"), "search_suppliers"),
+    (re.compile(r"plants?"), "search_plants"),
+    (re.compile(r"materials?"), "search_materials"),
+    (re.compile(r"purchase\s+org"), "search_purchase_orgs"),
+    (re.compile(r"purchase\s+groups?"), "search_purchase_groups"),
+]
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def match(text: str) -> Optional[Tuple[str, Dict]]:
+    """(tool name, tool input) when the request maps to exactly one tool, else None"""
+    message = " ".join(text.strip().split())
+    lowered = message.lower()
+
+    if PO_TYPES.match(lowered):
+        return "get_po_types", {}
+
+    po_numbers = list(dict.fromkeys(n.upper() for n in PO_NUMBER.findall(message)))
+    if len(po_numbers) > 1:
+        # "details of PO-1, PO-2 and PO-3": the joiners only list PO numbers
+        rest = LIST_JOINERS.sub(" ", PO_NUMBER.sub(" ", lowered))
+        if not AGENT_CUES.search(rest) and (PO_DETAIL_CUES.search(rest) or len(rest.split()) <= 1):
+            return "get_po_details_batch", {"po_numbers": po_numbers}
+        return None
+
+    if AGENT_CUES.search(lowered):
+        return None
+
+    if po_numbers:
+        rest = PO_NUMBER.sub(" ", lowered)
+        if PO_DETAIL_CUES.search(rest) or len(rest.split()) <= 3:
+            return "get_po_details", {"po_number": po_numbers[0]}
+        return None
+
+    search = SEARCH.match(message)
+    if search:
+        query = (search.group("query") or "").strip().strip("'\"")
+        if query and (FILTER_WORDS.match(query) or RANKING_WORDS.search(query)):
+            return None
+        entity = search.group("entity").lower()
+        tool = next(name for pattern, name in ENTITY_TOOLS if pattern.match(entity))
+        return tool, {"query": query}
+    return None
+
+
+def dispatch(text: str) -> Optional[str]:
+    """Run the matching tool directly; None means the agent should handle it"""
+    matched = match(text)
+    record(matched is not None)
+    if matched is None:
+        return None
+
+    from langchain_agent.tools import ALL_TOOLS
+
+    name, tool_input = matched
+    tool = next(t for t in ALL_TOOLS if t.name == name)
+    print(f"[DISPATCH] {name}({tool_input}) without LLM")
+    return tool.invoke(tool_input)
+
+
+def record(served_directly: bool):
+    with _stats_lock:
+        _stats["turns"] += 1
+        if served_directly:
+            _stats["direct"] += 1
+
+
+def dispatch_stats() -> Dict:
+    """Turns seen and the fraction answered without an LLM call"""
+    with _stats_lock:
+        turns = _stats["turns"]
+        return {
+            "turns": turns,
+            "direct": _stats["direct"],
+            "direct_fraction": round(_stats["direct"] / turns, 3) if turns else 0.0,
+        }
@@ -0,0 +1,130 @@
+"""
+AgentExecutor that runs the tool calls of one model turn concurrently
+
+When the model asks for search_suppliers, search_plants and
+search_purchase_groups in the same step, AgentExecutor runs them one after
+another, each with its own DB round trip. ConcurrentAgentExecutor runs the
+batch in a shared thread pool (copying contextvars, so read-your-writes
+routing still applies), bounded by a per-turn deadline.
+
+Per turn it records the sum of the tool durations (what sequential
+execution would have cost) and the wall time actually spent; they are
+printed, returned as "tool_timings" and, if TOOL_TIMINGS_LOG is set,
+appended as JSONL.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from typing import Dict
+
+from dotenv import load_dotenv
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction, AgentStep
+
+from backend.tracing import span
+
+load_dotenv()
+
+TOOL_MAX_WORKERS = int(os.getenv("TOOL_MAX_WORKERS", "8"))
+TOOL_TURN_DEADLINE_SECONDS = float(os.getenv("TOOL_TURN_DEADLINE_SECONDS", "30"))
+TOOL_TIMINGS_LOG = os.getenv("TOOL_TIMINGS_LOG")
+
+# Shared by all conversations; tools are I/O bound (DB round trips)
+_tool_pool = ThreadPoolExecutor(max_workers=TOOL_MAX_WORKERS, thread_name_prefix="agent-tool")
+_local = threading.local()
+_timings_lock = threading.Lock()
+
+
+class ConcurrentAgentExecutor(AgentExecutor):
+    """Runs independent tool calls from the same model turn in parallel"""
+
+    def _call(self, inputs, run_manager=None):
+        # The executor is shared across sessions; per-turn state is thread-local
+        turn = _turn_state()
+        turn.update(deadline=time.monotonic() + TOOL_TURN_DEADLINE_SECONDS, batch=None,
+                    timings={"batches": 0, "tool_calls": 0, "sequential_ms": 0.0, "concurrent_ms": 0.0})
+        outputs = super()._call(inputs, run_manager=run_manager)
+        outputs["tool_timings"] = self._record_timings(turn["timings"])
+        return outputs
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager=None):
+        # The parent yields every action of the turn before performing any of
+        # them, so the whole batch is known by the first _perform_agent_action
+        turn = _turn_state()
+        turn["batch"] = {"actions": [], "results": None}
+        for item in super()._iter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+            if isinstance(item, AgentAction):
+                turn["batch"]["actions"].append(item)
+            yield item
+        turn["batch"] = None
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager=None) -> AgentStep:
+        turn = _turn_state()
+        batch = turn.get("batch")
+        if not batch or len(batch["actions"]) < 2:
+            return self._timed_action(turn, name_to_tool_map, color_mapping, agent_action, run_manager)
+
+        if batch["results"] is None:
+            batch["results"] = self._run_batch(turn, batch["actions"], name_to_tool_map, color_mapping, run_manager)
+        return batch["results"][id(agent_action)]
+
+    def _run_batch(self, turn, actions, name_to_tool_map, color_mapping, run_manager) -> Dict[int, AgentStep]:
+        start = time.perf_counter()
+        futures = {
+            id(action): (action, _tool_pool.submit(
+                contextvars.copy_context().run, self._timed_action,
+                turn, name_to_tool_map, color_mapping, action, run_manager
+            ))
+            for action in actions
+        }
+
+        results = {}
+        for key, (action, future) in futures.items():
+            try:
+                results[key] = future.result(timeout=max(0.0, turn["deadline"] - time.monotonic()))
+            except FutureTimeout:
+                print(f"[TOOLS] {action.tool} missed the turn deadline")
+                results[key] = AgentStep(action=action, observation=f"Tool {action.tool} timed out, try a narrower search.")
+
+        turn["timings"]["batches"] += 1
+        turn["timings"]["concurrent_ms"] += (time.perf_counter() - start) * 1000
+        return results
+
+    def _timed_action(self, turn, name_to_tool_map, color_mapping, agent_action, run_manager) -> AgentStep:
+        start = time.perf_counter()
+        with span(f"tool {agent_action.tool}", tool=agent_action.tool):
+            step = super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        timings = turn["timings"]
+        with _timings_lock:
+            timings["tool_calls"] += 1
+            timings["sequential_ms"] += elapsed_ms
+            if not turn.get("batch") or len(turn["batch"]["actions"]) < 2:
+                # Single calls cost the same either way
+                timings["concurrent_ms"] += elapsed_ms
+        return step
+
+    @staticmethod
+    def _record_timings(timings: Dict) -> Dict:
+        timings = {k: round(v, 1) if isinstance(v, float) else v for k, v in timings.items()}
+        if timings["tool_calls"]:
+            print(f"[TOOLS] {timings['tool_calls']} calls in {timings['batches']} parallel batches: "
+                  f"sequential {timings['sequential_ms']}ms, actual {timings['concurrent_ms']}ms")
+        if TOOL_TIMINGS_LOG:
+            try:
+                with open(TOOL_TIMINGS_LOG, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(dict(timings, ts=time.time())) + "\n")
+            except OSError as e:
+                print(f"[WARN] Could not write tool timings log: {e}")
+        return timings
+
+
+def _turn_state() -> Dict:
+    if not hasattr(_local, "turn"):
+        _local.turn = {}
+    return _local.turn
@@ -0,0 +1,138 @@
+"""
+Bounded chat history for the LangChain PO Agent
+
+Keeps the last few turns verbatim and folds older ones into a running
+summary, so the prompt sent on every agent invoke stays within a token
+budget no matter how long the conversation runs.
+"""
+import os
+import re
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PO_NUMBER_PATTERN = re.compile(r"\b(?:IND-)?PO-\d+\b")
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)"""
+    return len(text) // 4 + 1
+
+
+def compact_output(text: str, max_tokens: int) -> str:
+    """Replace a large tool/SQL output with a compact reference to it"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    table_rows = [l for l in lines if l.startswith("|")]
+    po_numbers = sorted(set(PO_NUMBER_PATTERN.findall(text)))
+    intro = next((l.strip() for l in lines if l.strip() and not l.startswith("|")), "")
+
+    parts = [f"[Earlier output omitted: {len(text)} chars"]
+    if table_rows:
+        # Header + separator + body rows
+        columns = [c.strip() for c in table_rows[0].strip("|").split("|")]
+        parts.append(f", table with {max(len(table_rows) - 2, 0)} rows; columns: {', '.join(columns)}")
+    if po_numbers:
+        parts.append(f"; PO numbers: {', '.join(po_numbers[:10])}")
+    parts.append("]")
+
+    reference = "".join(parts)
+    if intro:
+        reference = f"{intro[:200]}\n{reference}"
+    return reference
+
+
+class ChatHistory:
+    """Token-budgeted history: recent turns verbatim, older turns summarized"""
+
+    def __init__(
+        self,
+        max_tokens: Optional[int] = None,
+        keep_turns: Optional[int] = None,
+        max_message_tokens: Optional[int] = None,
+        summary_tokens: Optional[int] = None
+    ):
+        self.max_tokens = max_tokens or int(os.getenv("CHAT_HISTORY_MAX_TOKENS", "2000"))
+        self.keep_turns = keep_turns or int(os.getenv("CHAT_HISTORY_KEEP_TURNS", "4"))
+        self.max_message_tokens = max_message_tokens or int(os.getenv("CHAT_HISTORY_MAX_MESSAGE_TOKENS", "300"))
+        self.summary_tokens = summary_tokens or self.max_tokens // 4
+        self.summary_lines: List[str] = []
+        self.turns: List[Dict] = []
+
+    def add_turn(self, user_input: str, response: str):
+        """Record a turn, compacting large outputs and folding old turns"""
+        self.turns.append({
+            "human": compact_output(user_input, self.max_message_tokens),
+            "ai": compact_output(response, self.max_message_tokens)
+        })
+        self._fold()
+
+    def messages(self) -> List:
+        """Messages to pass as chat_history on the next invoke"""
+        from langchain_core.messages import AIMessage, HumanMessage
+
+        messages = []
+        if self.summary_lines:
+            # Sent as a human/ai pair so roles keep alternating for the model
+            summary = "Summary of the earlier conversation:\n" + "\n".join(self.summary_lines)
+            messages.append(HumanMessage(content=summary))
+            messages.append(AIMessage(content="Noted, I'll keep that context in mind."))
+        for turn in self.turns:
+            messages.append(HumanMessage(content=turn["human"]))
+            messages.append(AIMessage(content=turn["ai"]))
+        return messages
+
+    def token_count(self) -> int:
+        summary = "\n".join(self.summary_lines)
+        return estimate_tokens(summary) + sum(
+            estimate_tokens(t["human"]) + estimate_tokens(t["ai"]) for t in self.turns
+        )
+
+    def clear(self):
+        self.summary_lines = []
+        self.turns = []
+
+    def to_state(self) -> Dict:
+        return {"summary": self.summary_lines, "turns": self.turns}
+
+    @classmethod
+    def from_state(cls, state) -> "ChatHistory":
+        history = cls()
+        if isinstance(state, list):
+            # Older stored format: flat list of {"role", "content"} messages
+            pairs = zip(state[0::2], state[1::2])
+            history.turns = [{"human": h["content"], "ai": a["content"]} for h, a in pairs]
+        elif state:
+            history.summary_lines = list(state.get("summary", []))
+            history.turns = list(state.get("turns", []))
+        history._fold()
+        return history
+
+    def _fold(self):
+        """Move the oldest turns into the summary until within budget"""
+        while self.turns and (
+            len(self.turns) > self.keep_turns
+            or (len(self.turns) > 1 and self.token_count() > self.max_tokens)
+        ):
+            self.summary_lines.append(self._summarize_turn(self.turns.pop(0)))
+
+        # The summary has its own budget; forget the oldest lines first
+        while len(self.summary_lines) > 1 and estimate_tokens("\n".join(self.summary_lines)) > self.summary_tokens:
+            self.summary_lines.pop(0)
+
+    @staticmethod
+    def _summarize_turn(turn: Dict) -> str:
+        human = " ".join(turn["human"].split())[:120]
+        answer = next((l.strip() for l in turn["ai"].splitlines() if l.strip()), "")
+        answer = answer.replace("**", "")[:120]
+        line = f"- User: {human} -> Assistant: {answer}"
+
+        # PO numbers are the facts most often referred back to
+        po_numbers = sorted(set(PO_NUMBER_PATTERN.findall(turn["human"] + " " + turn["ai"])))
+        if po_numbers:
+            line += f" (POs: {', '.join(po_numbers[:5])})"
+        return line
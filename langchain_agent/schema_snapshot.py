@@ -0,0 +1,117 @@
+"""
+Snapshotted table info for the SQL chain
+
+SQLDatabase normally reflects every table and runs sample-row queries before
+the first question can be answered. SnapshotSQLDatabase serves the table info
+(DDL + sample rows) from a file on disk, refreshes it in a background thread,
+and only re-reflects when the schema fingerprint changes.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from langchain_community.utilities import SQLDatabase
+from sqlalchemy import bindparam, inspect, text
+
+DEFAULT_SNAPSHOT_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", ".cache", "table_info.json")
+)
+
+
+def schema_fingerprint(engine, tables: List[str]) -> str:
+    """Hash of table/column definitions, cheap enough to run on every start"""
+    try:
+        with engine.connect() as conn:
+            query = text("""
+                SELECT table_name, column_name, column_type
+                FROM information_schema.columns
+                WHERE table_schema = DATABASE() AND table_name IN :tables
+                ORDER BY table_name, ordinal_position
+            """).bindparams(bindparam("tables", expanding=True))
+            result = conn.execute(query, {"tables": list(tables)})
+            rows = [tuple(str(v) for v in row) for row in result]
+    except Exception:
+        # Non-MySQL engines: fall back to the SQLAlchemy inspector
+        inspector = inspect(engine)
+        rows = [
+            (t, c["name"], str(c["type"]))
+            for t in sorted(tables)
+            for c in inspector.get_columns(t)
+        ]
+    return hashlib.sha256(json.dumps(rows).encode("utf-8")).hexdigest()
+
+
+def load_snapshot(path: str) -> Optional[Dict]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_snapshot(path: str, snapshot: Dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    # Atomic replace so concurrent workers never read a half-written file
+    os.replace(tmp_path, path)
+
+
+class SnapshotSQLDatabase(SQLDatabase):
+    """SQLDatabase whose full table info comes from an on-disk snapshot"""
+
+    def __init__(self, *args, snapshot_path: Optional[str] = None, **kwargs):
+        # Reflection is deferred to the (background) refresh
+        kwargs["lazy_table_reflection"] = True
+        super().__init__(*args, **kwargs)
+        self._snapshot_path = snapshot_path or os.getenv("SCHEMA_SNAPSHOT_PATH", DEFAULT_SNAPSHOT_PATH)
+        self._snapshot = load_snapshot(self._snapshot_path)
+        self._refresh_lock = threading.Lock()
+
+    def get_table_info(self, table_names: Optional[List[str]] = None, get_col_comments: bool = False) -> str:
+        if table_names is not None or get_col_comments:
+            return super().get_table_info(table_names, get_col_comments)
+
+        if self._snapshot is None:
+            # No snapshot yet: build it now (or wait for the background refresh)
+            self.refresh_snapshot()
+        return self._snapshot["table_info"] if self._snapshot else super().get_table_info()
+
+    def refresh_snapshot(self, force: bool = False) -> bool:
+        """Re-reflect if the schema changed since the snapshot, returns True if rebuilt"""
+        with self._refresh_lock:
+            tables = sorted(self.get_usable_table_names())
+            fingerprint = schema_fingerprint(self._engine, tables)
+            if not force and self._snapshot and self._snapshot.get("fingerprint") == fingerprint:
+                return False
+
+            start = time.perf_counter()
+            table_info = super().get_table_info()
+            self._snapshot = {
+                "fingerprint": fingerprint,
+                "tables": tables,
+                "table_info": table_info,
+                "created_at": time.time()
+            }
+            try:
+                save_snapshot(self._snapshot_path, self._snapshot)
+            except OSError as e:
+                print(f"[WARN] Could not save schema snapshot: {e}")
+            print(f"[DEBUG] Schema snapshot rebuilt in {time.perf_counter() - start:.2f}s")
+            return True
+
+    def start_background_refresh(self) -> threading.Thread:
+        """Check the fingerprint (and rebuild if needed) without blocking startup"""
+        def _refresh():
+            try:
+                self.refresh_snapshot()
+            except Exception as e:
+                print(f"[WARN] Background schema refresh failed: {e}")
+
+        thread = threading.Thread(target=_refresh, name="schema-snapshot-refresh", daemon=True)
+        thread.start()
+        return thread
@@ -3,19 +3,27 @@ LangChain SQL Chain for Text-to-SQL queries
 """
 import os
 from dotenv import load_dotenv
-from langchain_community.utilities import SQLDatabase
 from langchain.chains import create_sql_query_chain
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough
 
+from langchain_agent.answer_formatter import format_answer, needs_narrative, result_shape, summarize_rows
 from langchain_agent.llm import get_llm_with_credentials
+from langchain_agent.schema_snapshot import SnapshotSQLDatabase
+from backend.sql_guard import QueryRejected, get_sql_guard
+from backend.database import get_read_engine, has_replicas
+from backend.spend_summary import SUMMARY_TABLES
 
 load_dotenv()
 
 
 def get_database():
-    """Create SQLDatabase connection"""
+    """Create SQLDatabase connection (table info served from the on-disk snapshot)
+
+    With read replicas configured, introspection and generated SQL go to a
+    replica instead of a dedicated connection.
+    """
     db_user = os.getenv("DB_USER", "root")
     db_password = os.getenv("DB_PASSWORD", "1234567890")
     db_host = os.getenv("DB_HOST", "localhost")
@@ -33,11 +41,24 @@ def get_database():
         "independent_purchase_orders"
     ]
     
-    return SQLDatabase.from_uri(
-        connection_string,
-        include_tables=include_tables,
-        sample_rows_in_table_info=3
-    )
+    def connect(tables):
+        if has_replicas():
+            return SnapshotSQLDatabase(
+                get_read_engine(),
+                include_tables=tables,
+                sample_rows_in_table_info=3
+            )
+        return SnapshotSQLDatabase.from_uri(
+            connection_string,
+            include_tables=tables,
+            sample_rows_in_table_info=3
+        )
+    
+    # Pre-aggregated spend tables, when backfill_spend_summary.py has created them
+    try:
+        return connect(include_tables + list(SUMMARY_TABLES))
+    except ValueError:
+        return connect(include_tables)
 
 
 class SQLChain:
@@ -46,6 +67,8 @@ class SQLChain:
     def __init__(self):
         self.llm = get_llm_with_credentials()
         self.db = get_database()
+        # Usable immediately from the snapshot; re-reflects only if the schema changed
+        self.db.start_background_refresh()
         
         # Create the SQL query chain
         self.query_chain = create_sql_query_chain(self.llm, self.db)
@@ -56,7 +79,7 @@ class SQLChain:
 Given the following SQL query and its results, provide a natural language answer.
 
 SQL Query: {query}
-Results: {result}
+Results (summary and sample rows): {result}
 
 Provide a clear, concise answer to the original question."""),
             ("human", "{question}")
@@ -82,7 +105,7 @@ Provide a clear, concise answer to the original question."""),
             
             # Extract SQL using regex (SELECT, INSERT, UPDATE, DELETE, SHOW, DESCRIBE)
             import re
-            sql_pattern = r'(SELECT|INSERT|UPDATE|DELETE|SHOW|DESCRIBE|EXPLAIN)[\s\S]*?(?:;|$)'
+            sql_pattern = r'(SELECT|INSERT|UPDATE|DELETE|SHOW|DESCRIBE)[\s\S]*?(?:;|$)'
             matches = re.findall(sql_pattern, sql_query, re.IGNORECASE)
             
             if matches:
@@ -106,14 +129,22 @@ Provide a clear, concise answer to the original question."""),
             
             print(f"[DEBUG] Cleaned SQL: {sql_query}")
             
-            # Execute the query
-            result = self.db.run(sql_query)
+            # Execute the query through the cost guard (LIMIT, EXPLAIN budget, timeout)
+            try:
+                engine = get_read_engine() if has_replicas() else self.db._engine
+                rows, decision = get_sql_guard().execute(engine, sql_query)
+            except QueryRejected as e:
+                return f"**Query:** `{sql_query}`\n\n⚠️ Query not run: {e}. Try narrowing it down, e.g. by supplier, plant or date."
+            # Lists, counts and lookups are rendered locally; the LLM only writes
+            # narrative answers, from a summary and a sample of the rows
+            if not needs_narrative(question):
+                print(f"[DEBUG] Answer formatted locally ({result_shape(rows)})")
+                return f"**Query:** `{sql_query}`\n\n{format_answer(rows, truncated=decision.get('truncated', False))}"
             
-            # Format the answer
             answer_chain = self.answer_prompt | self.llm | StrOutputParser()
             answer = answer_chain.invoke({
                 "query": sql_query,
-                "result": result,
+                "result": summarize_rows(rows, truncated=decision.get("truncated", False)),
                 "question": question
             })
             
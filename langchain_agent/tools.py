@@ -3,17 +3,84 @@ LangChain Tools for PO Agent
 Wraps the existing POTools as LangChain Tools
 """
 from langchain_core.tools import tool
-from typing import List, Dict
+from collections import OrderedDict
+from typing import List, Dict, Optional
 import sys
 import os
+import threading
+import uuid
 
 # Add parent directory to path to import existing tools
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from backend.po_reader import get_po_reader
 from backend.tools import POTools
+from langchain_agent.history import estimate_tokens
 
 # Initialize the existing tools
 po_tools = POTools()
 
+# Search results are cut to this many tokens; the rest is kept behind a
+# handle the model can page through with more_results. Handles live in this
+# process only: behind several API workers, more_results works when the
+# turn lands on the worker that ran the search (see README, Headless API)
+TOOL_OUTPUT_MAX_TOKENS = int(os.getenv("TOOL_OUTPUT_MAX_TOKENS", "200"))
+RESULT_HANDLES_MAX = 256
+
+_result_handles: "OrderedDict[str, List[str]]" = OrderedDict()
+_handles_lock = threading.Lock()
+
+
+def _render(kind: str, results: List[Dict], fields: List[str]) -> str:
+    """Compress fields shared by every row and cut to the token budget
+
+    Rows arrive ranked by POTools (exact, then prefix matches first, in SQL before the LIMIT).
+    """
+    # A field with the same value on every row is stated once in the header
+    shared = {}
+    if len(results) > 1:
+        for field in fields:
+            values = {str(r.get(field, "N/A")) for r in results}
+            if len(values) == 1:
+                shared[field] = values.pop()
+    varying = [f for f in fields if f not in shared]
+
+    lines = []
+    for r in results:
+        extra = ", ".join(f"{f.title()}: {r.get(f, 'N/A')}" for f in varying)
+        lines.append(f"- {r['name']} (ID: {r['id']}{', ' + extra if extra else ''})")
+
+    header = f"{len(results)} {kind} found" + (f" (all {', '.join(f'{k.title()}: {v}' for k, v in shared.items())})" if shared else "")
+    return _page(header, lines, 0)
+
+
+def _page(header: str, lines: List[str], offset: int, handle: Optional[str] = None) -> str:
+    """Lines from offset that fit the budget, plus a handle for the rest"""
+    budget = TOOL_OUTPUT_MAX_TOKENS - estimate_tokens(header)
+    shown = []
+    for line in lines[offset:]:
+        cost = estimate_tokens(line)
+        if shown and cost > budget:
+            break
+        shown.append(line)
+        budget -= cost
+
+    output = header + ":\n" + "\n".join(shown)
+    remaining = len(lines) - offset - len(shown)
+    if remaining > 0:
+        handle = handle or _store_handle(lines)
+        output += (f"\n... {remaining} more. Refine the search, or call "
+                   f"more_results(handle=\"{handle}\", offset={offset + len(shown)}).")
+    return output
+
+
+def _store_handle(lines: List[str]) -> str:
+    handle = uuid.uuid4().hex[:8]
+    with _handles_lock:
+        _result_handles[handle] = lines
+        while len(_result_handles) > RESULT_HANDLES_MAX:
+            _result_handles.popitem(last=False)
+    return handle
+
 
 @tool
 def search_suppliers(query: str) -> str:
@@ -21,7 +88,7 @@ def search_suppliers(query: str) -> str:
     results = po_tools.search_suppliers(query)
     if not results:
         return f"No suppliers found matching '{query}'"
-    return "\n".join([f"- {r['name']} (ID: {r['id']})" for r in results])
+    return _render("suppliers", results, [])
 
 
 @tool
@@ -30,7 +97,7 @@ def search_plants(query: str) -> str:
     results = po_tools.search_plants(query)
     if not results:
         return f"No plants found matching '{query}'"
-    return "\n".join([f"- {r['name']} (ID: {r['id']}, Code: {r.get('code', 'N/A')})" for r in results])
+    return _render("plants", results, ["code"])
 
 
 @tool
@@ -39,7 +106,7 @@ def search_materials(query: str) -> str:
     results = po_tools.search_materials(query)
     if not results:
         return f"No materials found matching '{query}'"
-    return "\n".join([f"- {r['name']} (ID: {r['id']}, Code: {r['code']}, Price: {r['price']})" for r in results])
+    return _render("materials", results, ["code", "price"])
 
 
 @tool
@@ -48,7 +115,7 @@ def search_purchase_orgs(query: str = "") -> str:
     results = po_tools.search_purchase_orgs(query)
     if not results:
         return f"No purchase organizations found"
-    return "\n".join([f"- {r['name']} (ID: {r['id']}, Code: {r.get('code', 'N/A')})" for r in results])
+    return _render("purchase organizations", results, ["code"])
 
 
 @tool
@@ -57,7 +124,19 @@ def search_purchase_groups(query: str = "") -> str:
     results = po_tools.search_purchase_groups(query)
     if not results:
         return f"No purchase groups found"
-    return "\n".join([f"- {r['name']} (ID: {r['id']}, Code: {r.get('code', 'N/A')})" for r in results])
+    return _render("purchase groups", results, ["code"])
+
+
+@tool
+def more_results(handle: str, offset: int) -> str:
+    """Get more rows of an earlier search result that was cut short. Use the handle and offset given at the end of that result."""
+    with _handles_lock:
+        lines = _result_handles.get(handle)
+    if lines is None:
+        return f"Result handle '{handle}' has expired (or belongs to another server worker). Run the search again."
+    if offset >= len(lines):
+        return "No more rows."
+    return _page(f"Rows {offset + 1}+ of {len(lines)}", lines, offset, handle)
 
 
 @tool
@@ -76,66 +155,68 @@ def get_po_types() -> str:
     return "Available PO Types:\n" + "\n".join([f"- {t}" for t in types])
 
 
+def _format_po(po: Dict) -> str:
+    items = "\n".join(
+        f"{i['line_no']}. {i['material_name'] or 'N/A'}"
+        f"{' (' + str(i['material_code']) + ')' if i['material_code'] else ''}: "
+        f"{i['quantity']} x {i['price']} = {i['total']}"
+        for i in po["line_items"]
+    ) or "None"
+    return f"""
+📋 **Purchase Order Details**
+
+**PO Number:** {po['po_number']}
+**PO Date:** {po['po_date']}
+**Validity Date:** {po['validity_date']}
+**PO Type:** {po['po_type']}
+
+**Supplier:** {po['supplier_name']}
+**Currency:** {po['currency']}
+
+**Organization:**
+- Plant Code: {po['plant_code']}
+- Purchase Org Code: {po['purchase_org_code']}
+- Purchase Group Code: {po['purchase_group_code']}
+
+**Line Items:**
+{items}
+
+**Total Amount:** {po['total_amount']} {po['currency']}
+**Status:** {po['status'] or 'Active'}
+**Remarks:** {po['remarks'] or 'None'}
+"""
+
+
 @tool
 def get_po_details(po_number: str) -> str:
     """
     Get the details of a specific Purchase Order by PO number.
-    Returns all information about the PO including supplier, items, amounts, etc.
+    Returns all information about the PO including supplier, line items, amounts, etc.
     """
-    from backend.database import engine
-    from sqlalchemy import text
-    
     try:
-        query = """
-        SELECT 
-            po_number,
-            po_date,
-            validity_date,
-            po_type,
-            supplier_name,
-            currency,
-            plant_code,
-            purchase_org_code,
-            purchase_group_code,
-            total_amount,
-            remarks,
-            status
-        FROM independent_purchase_orders
-        WHERE po_number = :po_number
-        """
-        
-        with engine.connect() as conn:
-            result = conn.execute(text(query), {"po_number": po_number})
-            row = result.fetchone()
-            
-            if not row:
-                return f"❌ No purchase order found with PO Number: {po_number}"
-            
-            # Format the response
-            details = f"""
-📋 **Purchase Order Details**
-
-**PO Number:** {row[0]}
-**PO Date:** {row[1]}
-**Validity Date:** {row[2]}
-**PO Type:** {row[3]}
+        po = get_po_reader().get(po_number)
+    except Exception as e:
+        return f"❌ Error retrieving PO details: {str(e)}"
+    if po is None:
+        return f"❌ No purchase order found with PO Number: {po_number}"
+    return _format_po(po)
 
-**Supplier:** {row[4]}
-**Currency:** {row[5]}
 
-**Organization:**
-- Plant Code: {row[6]}
-- Purchase Org Code: {row[7]}
-- Purchase Group Code: {row[8]}
-
-**Total Amount:** {row[9]} {row[5]}
-**Status:** {row[11] or 'Active'}
-**Remarks:** {row[10] or 'None'}
-"""
-            return details
-            
+@tool
+def get_po_details_batch(po_numbers: List[str]) -> str:
+    """
+    Get the details of several Purchase Orders at once. Use this instead of
+    calling get_po_details repeatedly when more than one PO number is involved.
+    """
+    try:
+        pos = get_po_reader().get_many(po_numbers)
     except Exception as e:
         return f"❌ Error retrieving PO details: {str(e)}"
+    missing = [n for n, po in pos.items() if po is None]
+    parts = [_format_po(po) for po in pos.values() if po is not None]
+    if missing:
+        parts.append(f"❌ No purchase order found with PO Number: {', '.join(missing)}")
+    return "\n---\n".join(parts) or "No PO numbers given."
 
 
 @tool
@@ -196,7 +277,9 @@ ALL_TOOLS = [
     search_materials,
     search_purchase_orgs,
     search_purchase_groups,
+    more_results,
     get_po_types,
     get_po_details,
+    get_po_details_batch,
     create_purchase_order
 ]
@@ -2,8 +2,17 @@
 Streamlit App for LangChain PO Agent
 Run with: streamlit run langchain_app.py
 """
+import uuid
 import streamlit as st
 from langchain_agent.agent import LangChainPOAgent
+from langchain_agent.dispatcher import dispatch_stats
+from backend.state_store import get_state_store
+from backend.tracing import start_span
+from backend.warmup import readiness_label, start_warmup
+
+state_store = get_state_store()
+# Agent executor, schema snapshot and master data load in the background (once per process)
+start_warmup("langchain")
 
 # Page config
 st.set_page_config(
@@ -43,9 +52,7 @@ with st.sidebar:
     st.header("🛠️ Settings")
     
     if st.button("🔄 Reset Conversation", use_container_width=True):
-        st.session_state.messages = []
-        if "agent" in st.session_state:
-            st.session_state.agent.reset()
+        state_store.delete(st.query_params.get("cid", ""))
         st.rerun()
     
     st.divider()
@@ -65,26 +72,39 @@ with st.sidebar:
     - **Memory**: Conversation history
     - **SQL**: SQLDatabaseChain
     """)
+    
+    stats = dispatch_stats()
+    st.caption(f"⚡ {stats['direct']}/{stats['turns']} turns answered without an LLM call")
+    st.caption(readiness_label())
+
+# Conversation state lives in the state store, keyed by the id in the URL,
+# so any worker can resume it after a restart or re-balance
+if "cid" not in st.query_params:
+    st.query_params["cid"] = uuid.uuid4().hex
+conversation_id = st.query_params["cid"]
+
+# One trace per script run (TRACE_FILE); the turn, queries and LLM calls nest under it
+rerun_span = start_span("streamlit.rerun", new_trace=True, app="langchain", conversation_id=conversation_id)
+saved = state_store.load(conversation_id) or {}
 
 # Initialize agent
-if "agent" not in st.session_state:
-    try:
-        st.session_state.agent = LangChainPOAgent()
-    except Exception as e:
-        st.error(f"Failed to initialize agent: {e}")
-        st.stop()
+try:
+    agent = LangChainPOAgent(state=saved.get("history"))
+except Exception as e:
+    st.error(f"Failed to initialize agent: {e}")
+    rerun_span.end(error=e)
+    st.stop()
 
 # Initialize chat history
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+messages = saved.get("messages", [])
 
 # Display chat history
-for message in st.session_state.messages:
+for message in messages:
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
 # Welcome message
-if not st.session_state.messages:
+if not messages:
     welcome = """👋 **Welcome to the LangChain PO Agent!**
 
 I can help you:
@@ -100,7 +120,7 @@ I can help you:
 # Chat input
 if prompt := st.chat_input("Type your message..."):
     # Add user message
-    st.session_state.messages.append({"role": "user", "content": prompt})
+    messages.append({"role": "user", "content": prompt})
     with st.chat_message("user"):
         st.markdown(prompt)
     
@@ -108,10 +128,14 @@ if prompt := st.chat_input("Type your message..."):
     with st.chat_message("assistant"):
         with st.spinner("Thinking..."):
             try:
-                response = st.session_state.agent.process_message(prompt)
+                response = agent.process_message(prompt)
                 st.markdown(response)
-                st.session_state.messages.append({"role": "assistant", "content": response})
+                messages.append({"role": "assistant", "content": response})
             except Exception as e:
                 error_msg = f"❌ Error: {str(e)}"
                 st.error(error_msg)
-                st.session_state.messages.append({"role": "assistant", "content": error_msg})
+                messages.append({"role": "assistant", "content": error_msg})
+    
+    state_store.save(conversation_id, {"history": agent.export_state(), "messages": messages})
+
+rerun_span.end()
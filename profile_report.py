@@ -0,0 +1,102 @@
+"""
+Summarize the per-turn sampling profiles written to PROFILE_DIR
+
+    python profile_report.py                           # per step: runs, sampled time, time per module
+    python profile_report.py profiles --step org_plant --top 20
+    python profile_report.py --folded all.folded       # one folded file, steps as the root frames
+    flamegraph.pl all.folded > all.svg                 # or open all.folded in speedscope.app
+
+Time is attributed to the innermost frame from this repo (frontend/app.py,
+backend/agent.py, backend/tools.py, ...), so the library work a module
+calls (Streamlit rendering, JSON parsing, SQLAlchemy) counts towards it.
+"Self" lists the hottest leaf functions wherever they live.
+"""
+import argparse
+import glob
+import os
+import sys
+from collections import Counter, defaultdict
+
+from backend.profiler import PROFILE_DIR
+
+REPO_PREFIXES = ("frontend/", "backend/", "smart_frontend/", "smart_backend/", "langchain_agent/", "api/", "langchain_app.py")
+
+
+def load_profiles(directory: str, step: str = None):
+    """{step: [(kind, {stack: microseconds})]}"""
+    profiles = defaultdict(list)
+    for path in sorted(glob.glob(os.path.join(directory, step or "*", "*.folded"))):
+        stacks = Counter()
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                stack, _, weight = line.rstrip("\n").rpartition(" ")
+                if stack:
+                    stacks[stack] += int(weight)
+        kind = os.path.basename(path).rsplit("_", 1)[-1].split(".", 1)[0]
+        profiles[os.path.basename(os.path.dirname(path))].append((kind, stacks))
+    return profiles
+
+
+def owner(stack: str) -> str:
+    """Innermost repo module on the stack ("other" when there is none)"""
+    for frame in reversed(stack.split(";")):
+        if frame.startswith(REPO_PREFIXES):
+            return frame.split(":", 1)[0]
+    return "other"
+
+
+def print_step(step: str, runs, top: int):
+    modules, functions, leaves = Counter(), Counter(), Counter()
+    kinds = Counter(kind for kind, _ in runs)
+    for _, stacks in runs:
+        for stack, weight in stacks.items():
+            modules[owner(stack)] += weight
+            frames = stack.split(";")
+            leaves[frames[-1]] += weight
+            repo_frames = [f for f in frames if f.startswith(REPO_PREFIXES)]
+            if repo_frames:
+                functions[repo_frames[-1]] += weight
+    total = sum(modules.values()) or 1
+
+    runs_label = ", ".join(f"{count} {kind}" for kind, count in kinds.most_common())
+    print(f"\n{step}: {total / 1000:.1f} ms sampled over {runs_label}")
+    for title, counter in (("module", modules), ("repo function", functions), ("self", leaves)):
+        print(f"  by {title}:")
+        for name, weight in counter.most_common(top):
+            print(f"  {weight / 1000:10.1f} ms {weight / total * 100:5.1f}%  {name}")
+
+
+def write_folded(profiles, path: str):
+    """All profiles in one file, each stack under its step"""
+    merged = Counter()
+    for step, runs in profiles.items():
+        for _, stacks in runs:
+            for stack, weight in stacks.items():
+                merged[f"step {step};{stack}"] += weight
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, weight in merged.most_common():
+            f.write(f"{stack} {weight}\n")
+    print(f"✅ {len(merged)} stacks written to {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-step summary of turn profiles")
+    parser.add_argument("dir", nargs="?", default=PROFILE_DIR, help="Profile directory (default PROFILE_DIR)")
+    parser.add_argument("--step", help="Only this conversation step")
+    parser.add_argument("--top", type=int, default=10, help="Entries per breakdown")
+    parser.add_argument("--folded", help="Write one merged folded file for a flamegraph")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.dir, args.step)
+    if not profiles:
+        print(f"❌ No profiles in {args.dir} (switch on 'Profile turns' or set PROFILE_TURNS=true)")
+        sys.exit(1)
+    if args.folded:
+        write_folded(profiles, args.folded)
+        return
+    for step, runs in sorted(profiles.items(), key=lambda item: -sum(sum(s.values()) for _, s in item[1])):
+        print_step(step, runs, args.top)
+
+
+if __name__ == "__main__":
+    main()
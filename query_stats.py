@@ -0,0 +1,84 @@
+"""
+Dump per-statement query stats, the slow-query log and index candidates
+
+    python query_stats.py                                  # snapshots in QUERY_STATS_DIR (all processes)
+    python query_stats.py --dir /tmp/qs --top 20 --sort max_ms
+    python query_stats.py --url http://localhost:8000      # a running API server
+    python query_stats.py --source generated               # LLM-generated SQL only
+    python query_stats.py --json > stats.json
+
+Processes write their snapshots to QUERY_STATS_DIR (every
+QUERY_STATS_FLUSH_SECONDS and at exit); this merges them. Index candidates
+are the filter/sort columns of the statements that took the most total time;
+confirm them with EXPLAIN before adding an index.
+"""
+import argparse
+import glob
+import json
+import os
+import sys
+
+from backend.query_stats import QUERY_STATS_DIR, index_candidates, merge_snapshots
+
+
+def load(args) -> dict:
+    if args.url:
+        import requests
+
+        response = requests.get(f"{args.url.rstrip('/')}/query-stats", params={"limit": 10000}, timeout=10)
+        response.raise_for_status()
+        data = response.json()
+        return {"stats": data["statements"], "slow": data["slow"]}
+
+    snapshots = []
+    for path in sorted(glob.glob(os.path.join(args.dir, "query_stats_*.json"))):
+        with open(path, encoding="utf-8") as f:
+            snapshots.append(json.load(f))
+    if not snapshots:
+        print(f"❌ No snapshots in {args.dir} (set QUERY_STATS_DIR for the app processes)")
+        sys.exit(1)
+    return merge_snapshots(snapshots)
+
+
+def print_report(stats, slow, candidates, top: int):
+    print(f"{'calls':>7} {'total ms':>10} {'mean ms':>8} {'max ms':>8} {'rows':>7} {'err':>4} {'slow':>4} "
+          f"{'source':9} statement")
+    for row in stats[:top]:
+        rows = "-" if row["mean_rows"] is None else f"{row['mean_rows']:g}"
+        print(f"{row['calls']:7} {row['total_ms']:10.1f} {row['mean_ms']:8.1f} {row['max_ms']:8.1f} {rows:>7} "
+              f"{row['errors']:4} {row['slow']:4} {row['source']:9} {row['statement'][:110]}")
+
+    print(f"\nSlow queries ({len(slow)}, newest first):")
+    for entry in slow[:top]:
+        print(f"  {entry['at']} {entry['ms']:8.1f} ms {entry['source']:9} {entry['statement'][:100]}  params={entry['params']}")
+
+    print("\nIndex candidates (by total time):")
+    for candidate in candidates:
+        print(f"  {candidate['table']}({', '.join(candidate['columns'])})  {candidate['total_ms']:.1f} ms "
+              f"over {candidate['calls']} calls, {candidate['statements']} statement(s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-statement query stats")
+    parser.add_argument("--dir", default=QUERY_STATS_DIR or ".", help="Snapshot directory (default QUERY_STATS_DIR)")
+    parser.add_argument("--url", help="Read from a running API server instead")
+    parser.add_argument("--top", type=int, default=25, help="Statements and slow queries shown")
+    parser.add_argument("--sort", default="total_ms", choices=("total_ms", "mean_ms", "max_ms", "calls", "errors"))
+    parser.add_argument("--source", choices=("app", "generated"), help="Only app or LLM-generated statements")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of tables")
+    args = parser.parse_args()
+
+    data = load(args)
+    stats = [row for row in data["stats"] if not args.source or row["source"] == args.source]
+    stats.sort(key=lambda r: r[args.sort], reverse=True)
+    slow = [entry for entry in data["slow"] if not args.source or entry["source"] == args.source]
+    candidates = index_candidates(stats)
+
+    if args.json:
+        json.dump({"statements": stats, "slow": slow, "index_candidates": candidates}, sys.stdout, indent=2)
+        return
+    print_report(stats, slow, candidates, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -6,6 +6,7 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '.'))
 
 from backend.tools import POTools
 from backend.sql_agent import SQLAgent
+from backend.line_items import parse_line_items
 
 def test_search_limits():
     print("Testing search limits...")
@@ -62,7 +63,38 @@ def test_currency_limits():
     else:
         print("FAILURE: Currency limit is still small.")
 
+def test_line_item_parsing():
+    print("\nTesting line item parsing...")
+    # Single material names and codes must reach the material search whole
+    for text in ["Box 10", "M-100", "RM-2001", "Duplex 304", "Cable 2x1.5", "M:100",
+                 "304 Stainless Steel", "3M Tape", "12 mm TMT Bar", "2 inch MS Pipe"]:
+        items = parse_line_items(text)
+        if items:
+            print(f"FAILURE: '{text}' was split into {items}")
+        else:
+            print(f"SUCCESS: '{text}' kept as a material")
+
+    expected = {
+        "MS Pipe x 20 @ 100": [("MS Pipe", 20.0, 100.0)],
+        "MS Pipe - 20 - 100": [("MS Pipe", 20.0, 100.0)],
+        "MS Pipe: 20": [("MS Pipe", 20.0, None)],
+        "Bolts × 100": [("Bolts", 100.0, None)],
+        "20 units of MS Pipe": [("MS Pipe", 20.0, None)],
+        "12 m TMT Bar": [("TMT Bar", 12.0, None)],
+        "5 x Steel Rod": [("Steel Rod", 5.0, None)],
+        "20 MS Pipe at 100, 5 x Steel Rod @ 250 and Bolts x 100": [
+            ("MS Pipe", 20.0, 100.0), ("Steel Rod", 5.0, 250.0), ("Bolts", 100.0, None)
+        ],
+    }
+    for text, items in expected.items():
+        parsed = [(i["material"], i["quantity"], i["price"]) for i in parse_line_items(text)]
+        if parsed == items:
+            print(f"SUCCESS: '{text}' -> {parsed}")
+        else:
+            print(f"FAILURE: '{text}' -> {parsed}, expected {items}")
+
 if __name__ == "__main__":
+    test_line_item_parsing()
     test_search_limits()
     test_table_formatting()
     test_currency_limits()
@@ -3,8 +3,9 @@ import os
 import random
 import json
 from datetime import datetime, timedelta
-from sqlalchemy import text
-from backend.database import engine
+from backend.database import get_engine, record_write, text
+from backend.spend_summary import record_po
+from backend.po_defaults import record_defaults
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
@@ -175,11 +176,13 @@ class SmartPOAgent:
                 "Internal Order Service", "Network", "Network Service", "Cost Center Material"]
 
     def get_org_options(self):
-        """Fetches available Org and Group options"""
-        return {
-            "orgs": self.tools.search_purchase_orgs(""),
-            "groups": self.tools.search_purchase_groups("")
-        }
+        """Fetches available Org and Group options (one round trip)"""
+        try:
+            options = self.tools.batch().add("orgs", "purchase_orgs").add("groups", "purchase_groups").run()
+        except Exception as e:
+            print(f"[ERROR] get_org_options: {e}")
+            options = {"orgs": [], "groups": []}
+        return options
 
     def create_po(self, recommendation, quantity, po_type="Standard", purch_org=None, purch_group=None):
         """
@@ -190,23 +193,31 @@ class SmartPOAgent:
         
         # Get default Org Data if not provided
         try:
-            with engine.connect() as conn:
-                # Fetch first available Plant if needed (we still default plant for now as user didn't ask to change it)
-                plant = conn.execute(text("SELECT id, code FROM plants LIMIT 1")).fetchone()
-                plant_id, plant_code = (None, plant[1]) if plant else (None, "PL01")
+            with get_engine().connect() as conn:
+                # Defaults not given by the caller, in one round trip on the insert's connection
+                # (we still default plant for now as user didn't ask to change it)
+                batch = self.tools.batch().add("plant", "plants", limit=1)
+                if not purch_org:
+                    batch.add("org", "purchase_orgs", limit=1)
+                if not purch_group:
+                    batch.add("group", "purchase_groups", limit=1)
+                defaults = batch.run(conn)
+
+                plant = (defaults["plant"] or [None])[0]
+                plant_id, plant_code = (None, plant["code"]) if plant else (None, "PL01")
                 
                 # Handle Org and Group
                 if purch_org:
                     org_id, org_code = purch_org['id'], purch_org['code']
                 else:
-                    p_org = conn.execute(text("SELECT id, code FROM purchase_organization LIMIT 1")).fetchone()
-                    org_id, org_code = (p_org[0], p_org[1]) if p_org else (None, "1000")
+                    p_org = (defaults["org"] or [None])[0]
+                    org_id, org_code = (p_org["id"], p_org["code"]) if p_org else (None, "1000")
                 
                 if purch_group:
                     group_id, group_code = purch_group['id'], purch_group['code']
                 else:
-                    p_group = conn.execute(text("SELECT id, code FROM purchase_groups LIMIT 1")).fetchone()
-                    group_id, group_code = (p_group[0], p_group[1]) if p_group else (None, "001")
+                    p_group = (defaults["group"] or [None])[0]
+                    group_id, group_code = (p_group["id"], p_group["code"]) if p_group else (None, "001")
                 
                 # Prepare Line Items JSON
                 line_items = [
@@ -257,7 +268,25 @@ class SmartPOAgent:
                     "status": "Created"
                 })
                 conn.commit()
-                
+                record_write(po_number)
+
+            created = {
+                "po_date": datetime.now().strftime("%Y-%m-%d"),
+                "supplier_id": recommendation['supplier']['id'],
+                "supplier_name": recommendation['supplier']['name'],
+                "currency": recommendation['currency'],
+                "plant_id": plant_id,
+                "plant_code": plant_code,
+                "purchase_org_id": org_id,
+                "purchase_org_code": org_code,
+                "purchase_group_id": group_id,
+                "purchase_group_code": group_code,
+                "line_items": line_items,
+                "total_amount": total_value
+            }
+            record_po(created)
+            record_defaults([created])
+
         except Exception as e:
             print(f"Error saving PO to DB: {e}")
             # Fallback for demo if DB fails
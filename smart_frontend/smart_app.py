@@ -1,12 +1,18 @@
 import streamlit as st
 import sys
 import os
+import uuid
 from datetime import datetime, timedelta
 
 # Add parent directory to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from smart_backend.smart_agent import SmartPOAgent
+from backend.tracing import start_span
+from backend.warmup import readiness_label, start_warmup
+
+# Connections, LLM client and master data load in the background (once per process)
+start_warmup("smart")
 
 # Page config
 st.set_page_config(
@@ -61,6 +67,15 @@ st.markdown("""
 # Initialize Agent
 if "smart_agent" not in st.session_state:
     st.session_state.smart_agent = SmartPOAgent()
+    st.session_state.session_id = uuid.uuid4().hex
+
+# One trace per script run (TRACE_FILE); queries and LLM calls nest under it
+rerun_span = start_span("streamlit.rerun", new_trace=True, app="smart", conversation_id=st.session_state.session_id)
+
+def rerun():
+    """End this run's span, then rerun the script"""
+    rerun_span.end()
+    st.rerun()
 
 # Header
 st.markdown("""
@@ -69,6 +84,7 @@ st.markdown("""
     <p>Describe what you need, and I'll find the best options.</p>
 </div>
 """, unsafe_allow_html=True)
+st.caption(readiness_label())
 
 # Main Input
 query = st.text_input("What do you need?", placeholder="e.g., I need 10 laptops for the Noida office, fastest delivery")
@@ -118,7 +134,7 @@ if query:
                     # Enter Review Mode
                     st.session_state.selected_rec = rec
                     st.session_state.review_mode = True
-                    st.rerun()
+                    rerun()
 
     # Review & Edit Mode
     if st.session_state.get("review_mode") and st.session_state.get("selected_rec"):
@@ -201,12 +217,12 @@ if query:
                     )
                     st.session_state.po_result = result
                     st.session_state.review_mode = False
-                    st.rerun()
+                    rerun()
             
             if cancelled:
                 st.session_state.review_mode = False
                 del st.session_state.selected_rec
-                st.rerun()
+                rerun()
 
 # Success Modal / Result
 if "po_result" in st.session_state:
@@ -252,4 +268,6 @@ if "po_result" in st.session_state:
         del st.session_state.po_result
         del st.session_state.last_query
         del st.session_state.recommendations
-        st.rerun()
+        rerun()
+
+rerun_span.end()
@@ -0,0 +1,207 @@
+"""
+Show where a turn's time went, from the spans written with TRACE_FILE
+
+    python trace_viewer.py traces.jsonl                         # conversations, then the slowest trace
+    python trace_viewer.py traces.jsonl --conversation <cid>    # critical path of every run/turn of it
+    python trace_viewer.py traces.jsonl --trace <trace id>
+    python trace_viewer.py traces.jsonl --slowest 5
+    python trace_viewer.py traces.jsonl --otlp traces.otlp.json # OTLP/JSON export request for a collector
+
+The critical path follows, from the root down, the children that the
+parent's end actually waited for; "self" is the time a span spent outside
+them. Statements run more than once with the same parameters in one trace
+are listed as duplicates.
+"""
+import argparse
+import json
+import sys
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+
+def load_spans(path: str) -> List[Dict]:
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                span = json.loads(line)
+                span["start"] = int(span["startTimeUnixNano"])
+                span["end"] = int(span["endTimeUnixNano"])
+                spans.append(span)
+    return spans
+
+
+def group_traces(spans: List[Dict]) -> Dict[str, Dict]:
+    """{trace id: {"root", "spans", "children"}}; traces whose root span is missing are skipped"""
+    traces = defaultdict(list)
+    for span in spans:
+        traces[span["traceId"]].append(span)
+
+    grouped = {}
+    for trace_id, members in traces.items():
+        ids = {s["spanId"] for s in members}
+        roots = [s for s in members if not s["parentSpanId"] or s["parentSpanId"] not in ids]
+        root = next((s for s in roots if not s["parentSpanId"]), None)
+        if root is None:
+            continue
+        children = defaultdict(list)
+        for s in members:
+            if s["parentSpanId"]:
+                children[s["parentSpanId"]].append(s)
+        grouped[trace_id] = {"root": root, "spans": members, "children": children}
+    return grouped
+
+
+def critical_path(span: Dict, children: Dict[str, List[Dict]], depth: int = 0) -> List[tuple]:
+    """[(span, depth, self ns)] along the chain of children the span's end waited for"""
+    chosen, until = [], span["end"]
+    for child in sorted(children.get(span["spanId"], []), key=lambda c: c["end"], reverse=True):
+        if child["end"] <= until:
+            chosen.append(child)
+            until = child["start"]
+    chosen.reverse()
+
+    self_ns = (span["end"] - span["start"]) - sum(c["end"] - c["start"] for c in chosen)
+    path = [(span, depth, max(self_ns, 0))]
+    for child in chosen:
+        path.extend(critical_path(child, children, depth + 1))
+    return path
+
+
+def label(span: Dict) -> str:
+    attributes = span.get("attributes") or {}
+    if span["name"] == "db.query":
+        statement = attributes.get("db.statement") or ""
+        return f"db.query {statement[:70]}{'...' if len(statement) > 70 else ''}"
+    if span["name"] == "llm.bedrock":
+        return f"llm.bedrock {attributes.get('llm.operation') or ''} {attributes.get('llm.model') or ''}".rstrip()
+    details = [f"{k}={attributes[k]}" for k in ("app", "route", "next_step", "tool") if attributes.get(k)]
+    return f"{span['name']} {' '.join(details)}".rstrip()
+
+
+def ms(ns: int) -> float:
+    return ns / 1e6
+
+
+def breakdown(trace: Dict) -> Dict:
+    """Time and count per kind of leaf work, plus repeated statements"""
+    totals = {"db": [0, 0], "llm": [0, 0]}
+    fingerprints = Counter()
+    statements = {}
+    for span in trace["spans"]:
+        kind = "db" if span["name"] == "db.query" else "llm" if span["name"] == "llm.bedrock" else None
+        if kind:
+            totals[kind][0] += 1
+            totals[kind][1] += span["end"] - span["start"]
+        fingerprint = (span.get("attributes") or {}).get("db.fingerprint")
+        if fingerprint:
+            fingerprints[fingerprint] += 1
+            statements[fingerprint] = span["attributes"].get("db.statement", "")
+    duplicates = [(count, statements[fp]) for fp, count in fingerprints.most_common() if count > 1]
+    return {"db": totals["db"], "llm": totals["llm"], "duplicates": duplicates}
+
+
+def print_trace(trace_id: str, trace: Dict):
+    root = trace["root"]
+    total = root["end"] - root["start"]
+    info = breakdown(trace)
+    conversation = (root.get("attributes") or {}).get("conversation_id", "-")
+    print(f"\ntrace {trace_id}  {label(root)}  conversation={conversation}  {ms(total):.1f} ms")
+    print(f"  db {info['db'][0]} queries {ms(info['db'][1]):.1f} ms | llm {info['llm'][0]} calls {ms(info['llm'][1]):.1f} ms")
+    print("  critical path:")
+    for span, depth, self_ns in critical_path(root, trace["children"]):
+        duration = span["end"] - span["start"]
+        share = duration / total * 100 if total else 100.0
+        error = "  ERROR" if (span.get("status") or {}).get("code") == "ERROR" else ""
+        print(f"  {ms(duration):9.1f} ms {share:5.1f}%  self {ms(self_ns):8.1f} ms  {'  ' * depth}{label(span)}{error}")
+    for count, statement in info["duplicates"]:
+        print(f"  duplicate: {count}x {statement[:100]}")
+
+
+def print_conversations(traces: Dict[str, Dict]):
+    conversations = defaultdict(list)
+    for trace in traces.values():
+        conversations[(trace["root"].get("attributes") or {}).get("conversation_id", "-")].append(trace)
+
+    print(f"{'conversation':34} {'traces':>6} {'total ms':>10} {'db ms':>9} {'llm ms':>9} {'slowest ms':>11}")
+    for cid, members in sorted(conversations.items(), key=lambda item: -max(t["root"]["end"] for t in item[1])):
+        durations = [t["root"]["end"] - t["root"]["start"] for t in members]
+        infos = [breakdown(t) for t in members]
+        print(f"{cid:34} {len(members):6} {ms(sum(durations)):10.1f} {ms(sum(i['db'][1] for i in infos)):9.1f} "
+              f"{ms(sum(i['llm'][1] for i in infos)):9.1f} {ms(max(durations)):11.1f}")
+
+
+def to_otlp(spans: List[Dict]) -> Dict:
+    """OTLP/JSON ExportTraceServiceRequest"""
+    def value(v):
+        if isinstance(v, bool):
+            return {"boolValue": v}
+        if isinstance(v, int):
+            return {"intValue": str(v)}
+        if isinstance(v, float):
+            return {"doubleValue": v}
+        return {"stringValue": "" if v is None else str(v)}
+
+    otlp_spans = []
+    for span in spans:
+        attributes = dict(span.get("attributes") or {}, **{"thread.name": span.get("thread")})
+        status = span.get("status") or {}
+        otlp_spans.append({
+            "traceId": span["traceId"],
+            "spanId": span["spanId"],
+            "parentSpanId": span["parentSpanId"],
+            "name": span["name"],
+            # CLIENT for calls out of the process, INTERNAL otherwise
+            "kind": 3 if span["name"] in ("db.query", "llm.bedrock") else 1,
+            "startTimeUnixNano": str(span["start"]),
+            "endTimeUnixNano": str(span["end"]),
+            "attributes": [{"key": k, "value": value(v)} for k, v in attributes.items()],
+            "status": {"code": 2, "message": status.get("message", "")} if status.get("code") == "ERROR" else {"code": 1},
+        })
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": "supplier-po-agent"}}]},
+        "scopeSpans": [{"scope": {"name": "backend.tracing"}, "spans": otlp_spans}],
+    }]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Critical path of traced turns")
+    parser.add_argument("file", help="JSONL written with TRACE_FILE")
+    parser.add_argument("--conversation", help="Show every trace of this conversation id")
+    parser.add_argument("--trace", help="Show one trace")
+    parser.add_argument("--slowest", type=int, default=1, help="Show the N slowest traces (default 1)")
+    parser.add_argument("--otlp", help="Write the spans as an OTLP/JSON export request to this path")
+    args = parser.parse_args()
+
+    spans = load_spans(args.file)
+    if args.otlp:
+        with open(args.otlp, "w", encoding="utf-8") as f:
+            json.dump(to_otlp(spans), f)
+        print(f"✅ {len(spans)} spans written to {args.otlp}")
+        return
+
+    traces = group_traces(spans)
+    if not traces:
+        print("No complete traces in the file")
+        sys.exit(1)
+
+    if args.trace:
+        selected = [args.trace] if args.trace in traces else []
+    elif args.conversation:
+        selected = sorted(
+            (tid for tid, t in traces.items() if (t["root"].get("attributes") or {}).get("conversation_id") == args.conversation),
+            key=lambda tid: traces[tid]["root"]["start"]
+        )
+    else:
+        print_conversations(traces)
+        selected = sorted(traces, key=lambda tid: traces[tid]["root"]["start"] - traces[tid]["root"]["end"])[:args.slowest]
+
+    if not selected:
+        print("No matching traces")
+        sys.exit(1)
+    for trace_id in selected:
+        print_trace(trace_id, traces[trace_id])
+
+
+if __name__ == "__main__":
+    main()